@@ -0,0 +1,91 @@
+"""
+Бенчмарк холодного старта: импорт main в новом процессе под -X importtime.
+
+Импорт идет без BOT_TOKEN и настроек БД в окружении: он не должен ни
+читать окружение, ни создавать Bot, ни подключаться к базе - всё это
+делает контейнер при первом обращении.
+
+Бюджет проверяется по собственному времени импорта модулей проекта
+(медиана прогонов): сторонние пакеты (aiogram, aiohttp, pydantic) от кода
+бота не зависят, и их время сильно плавает между машинами. Общее время
+можно ограничить отдельно через --total-budget-ms.
+
+Запуск: python benchmarks/bench_cold_start.py [--runs 5] [--budget-ms 150] [--total-budget-ms N]
+Код выхода 1 - бюджет превышен или импорт создает зависимости.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.startup_profiler import (  # noqa: E402
+    PROJECT_ROOT, group_imports, measure_imports, project_import_time
+)
+
+# После импорта не должно быть ни бота, ни прочитанных настроек БД
+SIDE_EFFECTS_CHECK = """
+import main
+from src.config.BotSingleton import BotSingleton
+created = [name for name, value in (("Bot", BotSingleton._bot), ("DatabaseConfig", main.db._config)) if value]
+print(",".join(created))
+"""
+
+
+def clean_env():
+    """Окружение без токена и настроек БД"""
+    return {
+        name: value for name, value in os.environ.items()
+        if name != "BOT_TOKEN" and not name.startswith("DB_")
+    }
+
+
+def check_side_effects(env) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", SIDE_EFFECTS_CHECK], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return f"импорт main упал без окружения:\n{result.stderr[-2000:]}"
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта (импорт main)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="Бюджет на собственное время импорта модулей проекта, мс")
+    parser.add_argument("--total-budget-ms", type=float, help="Бюджет на весь импорт main, мс")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = clean_env()
+    runs = [measure_imports("main", env=env) for _ in range(args.runs)]
+    totals = [max(cost.cumulative for cost in costs if cost.depth == 0) * 1000 for costs in runs]
+    project = [project_import_time(costs) * 1000 for costs in runs]
+    total_ms, project_ms = statistics.median(totals), statistics.median(project)
+
+    print(f"{args.runs} прогонов, медиана")
+    print(f"импорт main: {total_ms:.1f} мс, из них код проекта: {project_ms:.1f} мс (бюджет {args.budget_ms:.0f} мс)")
+    print(f"{'мс':>9}  самые дорогие модули проекта")
+    slowest = [(name, seconds) for name, seconds in group_imports(runs[-1]) if name.split(".")[0] in ("main", "src")]
+    for name, seconds in slowest[:args.top]:
+        print(f"{seconds * 1000:9.1f}  {name}")
+
+    failures = []
+    if project_ms > args.budget_ms:
+        failures.append(f"код проекта импортируется {project_ms:.1f} мс при бюджете {args.budget_ms:.0f} мс")
+    if args.total_budget_ms is not None and total_ms > args.total_budget_ms:
+        failures.append(f"импорт main занимает {total_ms:.1f} мс при бюджете {args.total_budget_ms:.0f} мс")
+    side_effects = check_side_effects(env)
+    if side_effects:
+        failures.append(f"импорт создает зависимости: {side_effects}")
+
+    for failure in failures:
+        print(f"ПРЕВЫШЕНИЕ: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Бенчмарк преобразования строк asyncpg в модели: время CPU и память на 10 тыс. строк.
+
+Сравниваются:
+  legacy  - прежний _row_to_* (доступ по имени колонки, Decimal(str(...)), strftime)
+            в обычный dataclass без __slots__;
+  mapper  - RowMapper (доступ по позиции, код конструктора генерируется один раз)
+            в dataclass со __slots__;
+  views   - RowMapper.views: ленивые представления, читаются два поля.
+
+Запуск: python benchmarks/bench_row_mapping.py [--rows 10000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from datetime import datetime, time as dtime, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asyncpg.protocol.protocol import _create_record  # noqa: E402
+
+from src.models.Order import Order, OrderStatus  # noqa: E402
+from src.models.users.Master import Master  # noqa: E402
+from src.utils.mapping import RowMapper, format_hhmm  # noqa: E402
+
+ORDER_COLUMNS = [field.name for field in fields(Order)]
+MASTER_COLUMNS = [field.name for field in fields(Master)]
+
+# Те же модели, но без __slots__ - как было до перехода
+LegacyOrder = make_dataclass("LegacyOrder", [(field.name, field.type, field) for field in fields(Order)])
+LegacyMaster = make_dataclass("LegacyMaster", [(field.name, field.type, field) for field in fields(Master)])
+
+
+def make_order_rows(count: int):
+    now = datetime.now(timezone.utc)
+    mapping = {name: index for index, name in enumerate(ORDER_COLUMNS)}
+    return [
+        _create_record(mapping, (
+            i, i % 500, i % 40, i % 120, now, 60, Decimal("1500.00"), "confirmed",
+            None, f"Клиент {i}", "+79990000000", now, now
+        ))
+        for i in range(count)
+    ]
+
+
+def make_master_rows(count: int):
+    now = datetime.now(timezone.utc)
+    mapping = {name: index for index, name in enumerate(MASTER_COLUMNS)}
+    return [
+        _create_record(mapping, (
+            i, 100000 + i, f"master{i}", now, f"Мастер {i}", "+79990000000", None, "hair_services",
+            5, Decimal("4.8"), True, dtime(9, 0), dtime(18, 0), "1,2,3,4,5", [1, 2, 3], now
+        ))
+        for i in range(count)
+    ]
+
+
+def legacy_order(row):
+    return LegacyOrder(
+        id=row['id'],
+        user_id=row['user_id'],
+        master_id=row['master_id'],
+        service_id=row['service_id'],
+        appointment_datetime=row['appointment_datetime'],
+        duration_minutes=row['duration_minutes'],
+        total_price=Decimal(str(row['total_price'])),
+        status=OrderStatus(row['status']),
+        notes=row['notes'],
+        client_name=row['client_name'],
+        client_phone=row['client_phone'],
+        created_at=row['created_at'],
+        updated_at=row['updated_at']
+    )
+
+
+def legacy_master(row):
+    master = LegacyMaster(
+        id=row['id'],
+        telegram_id=row['telegram_id'],
+        username=row['username'],
+        name=row['name'],
+        phone=row['phone'],
+        email=row['email'],
+        specialization=row['specialization'],
+        experience_years=row['experience_years'],
+        rating=float(row['rating']) if row['rating'] else 0.0,
+        is_active=row['is_active'],
+        working_hours_start=row['working_hours_start'].strftime('%H:%M') if row['working_hours_start'] else None,
+        working_hours_end=row['working_hours_end'].strftime('%H:%M') if row['working_hours_end'] else None,
+        working_days=row['working_days'],
+        created_at=row['created_at'],
+        updated_at=row['updated_at']
+    )
+    master.service_ids = list(row['service_ids'])
+    return master
+
+
+order_mapper = RowMapper(Order, {"status": OrderStatus})
+master_mapper = RowMapper(Master, {
+    "rating": lambda value: float(value) if value else 0.0,
+    "working_hours_start": format_hhmm,
+    "working_hours_end": format_hhmm,
+})
+
+
+def read_fields(views, second: str):
+    """Типичное использование представлений: из строки читаются id и ещё одно поле"""
+    for view in views:
+        view.id
+        getattr(view, second)
+    return views
+
+
+def measure(convert, rows, repeat: int):
+    convert(rows)  # прогрев (и генерация конструктора для mapper)
+
+    started = time.process_time()
+    for _ in range(repeat):
+        convert(rows)
+    cpu_ms = (time.process_time() - started) / repeat * 1000
+
+    tracemalloc.start()
+    result = convert(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return cpu_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк преобразования строк в модели")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = {
+        "orders": (make_order_rows(args.rows), {
+            "legacy": lambda rows: [legacy_order(row) for row in rows],
+            "mapper": order_mapper.many,
+            "views": lambda rows: read_fields(order_mapper.views(rows), "status"),
+        }),
+        "masters": (make_master_rows(args.rows), {
+            "legacy": lambda rows: [legacy_master(row) for row in rows],
+            "mapper": master_mapper.many,
+            "views": lambda rows: read_fields(master_mapper.views(rows), "name"),
+        }),
+    }
+
+    print(f"{args.rows} строк, среднее из {args.repeat} прогонов")
+    print(f"{'модель':<10}{'способ':<10}{'CPU, мс':>10}{'память, КБ':>14}")
+    for model_name, (rows, variants) in cases.items():
+        for variant, convert in variants.items():
+            cpu_ms, memory_kb = measure(convert, rows, args.repeat)
+            print(f"{model_name:<10}{variant:<10}{cpu_ms:>10.2f}{memory_kb:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
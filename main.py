@@ -1,19 +1,42 @@
 import asyncio
 import logging
+import os
 import sys
+from contextlib import suppress
+from datetime import timedelta
 from aiogram import Dispatcher
-from src.config.BotSingleton import BotSingleton
+from dotenv import load_dotenv
+from src.config.Container import container
 from src.config.Database import db
-from src.handlers.mainHandler import router
+from src.handlers.adminHandler import admin_router
+from src.handlers.errorsHandler import errors_router
+from src.handlers.mainHandler import router, SearchStates
 from src.handlers.masterHandler import router_master
 from src.handlers.servicesHandler import services_router
-from src.repository.CustomerRepository import CustomerRepository
-from src.repository.UserRepository import UserRepository
-from src.repository.MasterRepository import  MasterRepository
-from src.repository.ServiceRepository import ServiceRepository
-from src.repository.OrderRepository import OrderRepository
+from src.middlewares.CallbackDedupMiddleware import CallbackDedupMiddleware
+from src.middlewares.ConnectionAffinityMiddleware import ConnectionAffinityMiddleware
+from src.middlewares.DataLoaderMiddleware import DataLoaderMiddleware
+from src.middlewares.MetricsMiddleware import HandlerLabelMiddleware, MetricsMiddleware
+from src.middlewares.ReadYourWritesMiddleware import ReadYourWritesMiddleware
+from src.middlewares.ThrottlingMiddleware import ThrottlingMiddleware
+from src.repository.AvailabilityRepository import AvailabilityRepository
+from src.repository.CatalogSnapshotRepository import catalog_snapshot_repo
+from src.repository.ReminderRepository import ReminderRepository
+from src.repository.ScheduleRepository import ScheduleRepository
+from src.services.BroadcastService import BroadcastService
+from src.services.CatalogSnapshotService import CatalogSnapshotService
+from src.services.CustomerCache import customer_cache
+from src.services.MetricsServer import MetricsServer
 from src.services.MasterDataSeeder import MastersDataSeeder
+from src.services.OutboundDispatcher import outbound_dispatcher
+from src.services.OrderStatusSweeper import OrderStatusSweeper
+from src.services.PartitionMaintainer import PartitionMaintainer
+from src.services.ReminderScheduler import ReminderScheduler
 from src.services.ServicesDataSeeder import ServicesDataSeeder
+from src.utils.loop_watchdog import LoopWatchdog
+from src.utils.throttling import RedisThrottleStorage
+from src.utils.profiler import slow_update_profiler
+from src.utils.startup_profiler import format_report, measure_imports
 
 '''Logger config'''
 logging.basicConfig(
@@ -22,49 +45,193 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-'''Create bot'''
-bot = BotSingleton().get_bot()
-
 dp = Dispatcher()
 
 
+def include_all_middlewares(dp: Dispatcher) -> ThrottlingMiddleware:
+    # Задержка, запросы к БД и ошибки по хендлерам; профилирование медленных апдейтов
+    dp.update.outer_middleware(MetricsMiddleware(slow_update_profiler))
+    dp.message.middleware(HandlerLabelMiddleware())
+    dp.callback_query.middleware(HandlerLabelMiddleware())
+    # Чтения с реплик; после своей записи пользователь читает с основной базы
+    dp.update.outer_middleware(ReadYourWritesMiddleware())
+    # Повторные нажатия той же кнопки, пока первое не обработано, отбрасываются
+    dp.callback_query.outer_middleware(CallbackDedupMiddleware())
+
+    # Лимит частоты на пользователя; с THROTTLE_REDIS_URL лимит общий для всех процессов
+    redis_url = os.getenv('THROTTLE_REDIS_URL')
+    throttling = ThrottlingMiddleware(
+        storage=RedisThrottleStorage(redis_url) if redis_url else None,
+        state_actions={SearchStates.waiting_for_search_query.state: "search"}
+    )
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+
+    # Одно соединение на апдейт вместо acquire перед каждым запросом (по желанию)
+    if os.getenv('DB_CONNECTION_AFFINITY'):
+        dp.update.outer_middleware(ConnectionAffinityMiddleware(
+            max_hold=int(os.getenv('DB_CONNECTION_MAX_HOLD_MS', 1000)) / 1000
+        ))
+
+    # Загрузчики с пакетной выборкой и кэшем на время одного апдейта
+    dp.update.outer_middleware(DataLoaderMiddleware())
+    return throttling
+
 def include_all_routes(dp: Dispatcher):
+    # Вежливый отказ, если база недоступна, а снимка каталога недостаточно
+    dp.include_router(errors_router)
+    dp.include_router(admin_router)
     dp.include_router(router)
     dp.include_router(services_router)
     dp.include_router(router_master)
 
 async def init_db():
-    await db.connect()
-
-    user_repo = UserRepository()
-    master_repo = MasterRepository()
-    order_repo = OrderRepository()
-    service_repo = ServiceRepository()
-    customer_repo = CustomerRepository()
+    with container.measure("db.connect"):
+        await db.connect()
 
-    await user_repo.create_table()
-    await service_repo.create_table()
-    await master_repo.create_table()
-    await order_repo.create_table()
-    await customer_repo.create_table()
+    # Порядок важен: внешние ключи и триггеры ссылаются на уже созданные таблицы
+    repositories = [
+        container.user_repo,
+        container.service_repo,
+        container.master_repo,
+        ScheduleRepository(),
+        container.order_repo,
+        AvailabilityRepository(),
+        container.customer_repo,
+        ReminderRepository(),
+        container.broadcast_repo,
+    ]
+    for repository in repositories:
+        with container.measure(f"{type(repository).__name__}.create_table"):
+            await repository.create_table()
 
     # # Заполненеие услуг
-    # seeder = ServicesDataSeeder(service_repo)
+    # seeder = ServicesDataSeeder(container.service_repo)
     # await seeder.seed_all_services()
     #
     # # Заполнение мастеров
-    # seederM = MastersDataSeeder(master_repo)
+    # seederM = MastersDataSeeder(container.master_repo)
     # await seederM.seed_all_masters()
 
 
 '''main function'''
 async def main():
-    await init_db()
+    # Все настройки ниже (и в контейнере) читаются из окружения уже после загрузки .env
+    load_dotenv()
+    bot = container.bot
+
+    # Теплый старт: снимок каталога читается с диска синхронно, и просмотр
+    # услуг и мастеров работает сразу, пока база подключается в фоне
+    warm_start = catalog_snapshot_repo.load() is not None
+    catalog_snapshot_repo.serving = warm_start
+
+    throttling = include_all_middlewares(dp)
     include_all_routes(dp)
 
+    # Сторож цикла событий: опоздания в метриках, стек блокирующего кода в логе
+    loop_watchdog = LoopWatchdog(threshold=int(os.getenv('LOOP_STALL_THRESHOLD_MS', 250)) / 1000)
+    loop_watchdog.start()
+
+    # Эндпоинт /metrics для Prometheus
+    metrics_server = None
+    if os.getenv('METRICS_PORT'):
+        metrics_server = MetricsServer(port=int(os.getenv('METRICS_PORT')))
+        await metrics_server.start()
+
+    # Сэмплирующий профилировщик самого медленного 1% апдейтов (только по запросу)
+    if os.getenv('PROFILE_SLOW_UPDATES'):
+        slow_update_profiler.output_dir = os.getenv('PROFILE_DIR', 'profiles')
+        slow_update_profiler.start()
+
+    # Снимок каталога на диске: при недоступной базе услуги и мастера читаются из него.
+    # Синхронизируется с базой по updated_at - читаются только изменения
+    catalog_snapshot_service = CatalogSnapshotService(
+        interval_seconds=int(os.getenv('CATALOG_SYNC_INTERVAL_SECONDS', 30))
+    )
+    customer_cache.interval_seconds = int(os.getenv('CUSTOMER_SYNC_INTERVAL_SECONDS', 30))
+
+    # Фоновое создание будущих секций заказов (и архивация старых, если включена)
+    partition_maintainer = PartitionMaintainer(
+        archive_after_months=int(os.getenv('ORDERS_ARCHIVE_AFTER_MONTHS', 0)) or None,
+        archive_dir=os.getenv('ORDERS_ARCHIVE_DIR', 'archive')
+    )
+
+    # Перевод прошедших заказов в in_progress / completed (неявки отмечает администратор)
+    order_status_sweeper = OrderStatusSweeper(
+        interval_seconds=int(os.getenv('ORDER_SWEEP_INTERVAL_SECONDS', 300)),
+        grace=timedelta(minutes=int(os.getenv('ORDER_SWEEP_GRACE_MINUTES', 30)))
+    )
+
+    # Напоминания клиентам за 24 и за 2 часа до записи
+    reminder_scheduler = ReminderScheduler(bot)
+
+    # Массовые рассылки; прерванные рестартом продолжаются с сохраненного места
+    broadcast_service = BroadcastService(bot)
+    dp["broadcast_service"] = broadcast_service
+
+    async def start_database():
+        while True:
+            try:
+                await init_db()
+                break
+            except Exception as e:
+                if not warm_start:
+                    raise
+                logger.error(f"База данных недоступна при запуске, каталог читается из снимка: {e}")
+                await asyncio.sleep(db.config.breaker_probe_interval)
+
+        # Проверка реплик и их отставания (только если заданы DB_REPLICA_DSNS)
+        db.start_replica_monitor()
+
+        # Снимок догоняет базу по updated_at, дальше каталог читается из базы
+        try:
+            await catalog_snapshot_service.sync()
+        except Exception as e:
+            logger.error(f"Ошибка при сверке снимка каталога с базой: {e}")
+        catalog_snapshot_repo.serving = False
+        catalog_snapshot_service.start()
+        customer_cache.start()
+
+        partition_maintainer.start()
+        order_status_sweeper.start()
+        reminder_scheduler.start()
+        await broadcast_service.resume_unfinished()
+
+        # Отчет о стоимости запуска: импорты (в отдельном процессе) и шаги инициализации
+        if os.getenv('PROFILE_STARTUP'):
+            import_costs = await asyncio.to_thread(measure_imports, "main")
+            logger.info("Стоимость запуска:\n" + format_report(import_costs, container.init_costs))
+
+    def report_startup_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Ошибка при запуске фоновых сервисов: {task.exception()}")
+
+    startup = asyncio.create_task(start_database())
+    if warm_start:
+        startup.add_done_callback(report_startup_failure)
+    else:
+        await startup
+
     try:
         await dp.start_polling(bot)
     finally:
+        startup.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            # Ошибка запуска при теплом старте уже записана в лог
+            await startup
+        await broadcast_service.stop()
+        await reminder_scheduler.stop()
+        await order_status_sweeper.stop()
+        await partition_maintainer.stop()
+        await catalog_snapshot_service.stop()
+        await customer_cache.stop()
+        await outbound_dispatcher.close()
+        await throttling.close()
+        slow_update_profiler.stop()
+        await loop_watchdog.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        await db.stop_replica_monitor()
         await bot.session.close()
 
 
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import date, datetime
+
+from dotenv import load_dotenv
+
+'''Logger config'''
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def export_orders(args):
+    from src.config.Database import db
+    from src.models.Order import OrderStatus
+    from src.services.OrderExporter import OrderExporter
+
+    await db.connect()
+    try:
+        exporter = OrderExporter(fetch_size=args.fetch_size)
+        await exporter.export(
+            output=args.output,
+            export_format=args.format,
+            start_date=args.date_from,
+            end_date=args.date_to,
+            master_id=args.master,
+            status=OrderStatus(args.status) if args.status else None
+        )
+    finally:
+        await db.disconnect()
+
+
+async def rebuild_order_stats(args):
+    from src.config.Database import db
+    from src.repository.OrderRepository import OrderRepository
+
+    await db.connect()
+    try:
+        await OrderRepository().rebuild_stats()
+    finally:
+        await db.disconnect()
+
+
+async def rebuild_availability(args):
+    from src.config.Database import db
+    from src.repository.AvailabilityRepository import AvailabilityRepository
+
+    await db.connect()
+    try:
+        await AvailabilityRepository().rebuild(since=args.date_from)
+    finally:
+        await db.disconnect()
+
+
+async def check_availability(args):
+    from src.config.Database import db
+    from src.repository.AvailabilityRepository import AvailabilityRepository
+
+    await db.connect()
+    try:
+        mismatches = await AvailabilityRepository().find_inconsistencies(since=args.date_from)
+    finally:
+        await db.disconnect()
+
+    for master_id, day in mismatches:
+        logger.warning(f"Расхождение занятости: мастер {master_id}, {day}")
+    if mismatches:
+        sys.exit(1)
+    logger.info("Занятость мастеров совпадает с заказами")
+
+
+async def archive_orders(args):
+    from datetime import timezone
+    from src.config.Database import db
+    from src.repository.OrderRepository import OrderRepository
+    from src.utils.dates import add_months, month_start
+
+    await db.connect()
+    try:
+        cutoff = add_months(month_start(datetime.now(timezone.utc)), -args.older_than_months)
+        await OrderRepository().archive_partitions(cutoff, args.dir)
+    finally:
+        await db.disconnect()
+
+
+async def profile_startup(args):
+    from src.config.Container import container
+    from src.utils.startup_profiler import format_report, measure_imports
+
+    import_costs = measure_imports(args.module)
+    # Сборка зависимостей контейнера (без сети), с --with-db - еще подключение и DDL
+    for component in ("bot", "db", "user_repo", "service_repo", "master_repo",
+                      "order_repo", "customer_repo", "broadcast_repo"):
+        getattr(container, component)
+    if args.with_db:
+        from main import init_db
+
+        try:
+            await init_db()
+        finally:
+            await container.db.disconnect()
+    print(format_report(import_costs, container.init_costs, top=args.top))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Служебные команды бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export-orders", help="Потоковая выгрузка заказов в файл")
+    export.add_argument("--output", required=True, help="Путь к файлу выгрузки")
+    export.add_argument("--format", choices=["csv", "jsonl", "raw"], default="csv",
+                        help="raw - сырой CSV-дамп через COPY")
+    export.add_argument("--from", dest="date_from", type=datetime.fromisoformat,
+                        help="Начало периода по дате записи (ISO)")
+    export.add_argument("--to", dest="date_to", type=datetime.fromisoformat,
+                        help="Конец периода по дате записи (ISO)")
+    export.add_argument("--master", type=int, help="ID мастера")
+    export.add_argument("--status", help="Статус заказа (pending, confirmed, ...)")
+    export.add_argument("--fetch-size", type=int, default=1000, help="Размер порции курсора")
+    export.set_defaults(handler=export_orders)
+
+    stats = commands.add_parser("rebuild-order-stats", help="Пересчет дневного агрегата order_stats_daily")
+    stats.set_defaults(handler=rebuild_order_stats)
+
+    availability = commands.add_parser("rebuild-availability", help="Пересчет масок занятости мастеров по заказам")
+    availability.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                              help="Пересчитать только дни начиная с даты (ISO)")
+    availability.set_defaults(handler=rebuild_availability)
+
+    check = commands.add_parser("check-availability", help="Сверка масок занятости мастеров с заказами")
+    check.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                       help="Проверять только дни начиная с даты (ISO)")
+    check.set_defaults(handler=check_availability)
+
+    archive = commands.add_parser("archive-orders", help="Архивация старых месячных секций заказов в .csv.gz")
+    archive.add_argument("--older-than-months", type=int, required=True,
+                         help="Архивировать секции старше указанного числа месяцев")
+    archive.add_argument("--dir", default="archive", help="Каталог для архивов")
+    archive.set_defaults(handler=archive_orders)
+
+    startup = commands.add_parser("profile-startup", help="Стоимость запуска: импорт по модулям и инициализация")
+    startup.add_argument("--module", default="main", help="Модуль, импорт которого измеряется")
+    startup.add_argument("--with-db", action="store_true", help="Измерить также подключение к БД и создание таблиц")
+    startup.add_argument("--top", type=int, default=20, help="Сколько самых дорогих модулей показать")
+    startup.set_defaults(handler=profile_startup)
+
+    return parser
+
+
+'''start'''
+if __name__ == '__main__':
+    load_dotenv()
+    arguments = build_parser().parse_args()
+    try:
+        asyncio.run(arguments.handler(arguments))
+    except Exception as e:
+        logger.error(f"Command failed: {e}")
+        sys.exit(1)
@@ -5,6 +5,8 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from dotenv import load_dotenv
 
+from src.services.OutboundDispatcher import outbound_dispatcher
+
 class BotSingleton:
     _instance: Optional['BotSingleton'] = None
     _bot: Optional[Bot] = None
@@ -26,6 +28,8 @@ class BotSingleton:
                 token=token,
                 default=DefaultBotProperties(parse_mode=ParseMode.HTML)
             )
+            # Все исходящие сообщения проходят через очередь с лимитами Telegram
+            self._bot.session.middleware(outbound_dispatcher)
 
     @property
     def bot(self) -> Bot:
@@ -44,7 +48,4 @@ class BotSingleton:
     def get_bot(cls) -> Bot:
         """Статический метод для получения бота"""
         instance = cls()
-        return instance.bot
-
-
-bot_instance = BotSingleton()
\ No newline at end of file
+        return instance.bot
\ No newline at end of file
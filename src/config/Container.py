@@ -0,0 +1,81 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+def component(factory):
+    """Зависимость контейнера: создается при первом обращении, время создания пишется в init_costs"""
+    @functools.wraps(factory)
+    def build(self):
+        with self.measure(factory.__name__):
+            return factory(self)
+    return functools.cached_property(build)
+
+
+class Container:
+    """
+    Зависимости приложения: бот, база и общие репозитории.
+
+    Ничего не создается при импорте - каждая зависимость собирается при
+    первом обращении (модули импортируются тут же), поэтому импорт
+    хендлеров не читает окружение и не создает Bot, а порядок импорта
+    модулей ни на что не влияет.
+    """
+
+    def __init__(self):
+        # Имя шага запуска -> длительность, с (отчет PROFILE_STARTUP)
+        self.init_costs: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        """Засекает шаг запуска (создание зависимости, подключение, DDL)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.init_costs[name] = self.init_costs.get(name, 0.0) + time.perf_counter() - started
+
+    @component
+    def bot(self):
+        from src.config.BotSingleton import BotSingleton
+        return BotSingleton.get_bot()
+
+    @component
+    def db(self):
+        from src.config.Database import db
+        return db
+
+    @component
+    def user_repo(self):
+        from src.repository.UserRepository import UserRepository
+        return UserRepository(self.db)
+
+    @component
+    def service_repo(self):
+        from src.repository.ServiceRepository import ServiceRepository
+        return ServiceRepository(self.db)
+
+    @component
+    def master_repo(self):
+        from src.repository.MasterRepository import MasterRepository
+        return MasterRepository(self.db)
+
+    @component
+    def order_repo(self):
+        from src.repository.OrderRepository import OrderRepository
+        return OrderRepository(self.db)
+
+    @component
+    def customer_repo(self):
+        from src.repository.CustomerRepository import CustomerRepository
+        return CustomerRepository(self.db)
+
+    @component
+    def broadcast_repo(self):
+        from src.repository.BroadcastRepository import BroadcastRepository
+        return BroadcastRepository(self.db)
+
+
+# Глобальный экземпляр
+container = Container()
@@ -1,19 +1,164 @@
 import asyncio
 import asyncpg
+import functools
+import itertools
 import logging
-from typing import Optional
-from contextlib import asynccontextmanager
-from src.config.DatabaseConfig import DatabaseConfig, db_config
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager, suppress
+from src.config.DatabaseConfig import DatabaseConfig
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.metrics import metrics
+from src.utils.request_stats import track_query
 
 logger = logging.getLogger(__name__)
 
+# Ошибки, означающие недоступность базы, а не ошибку в запросе.
+# AdminShutdownError (57P01) и CrashShutdownError (57P02) получают запросы,
+# выполнявшиеся во время перезапуска или падения PostgreSQL
+CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError,
+)
+
+
+# Первые слова запросов, меняющих данные или схему
+WRITE_KEYWORDS = frozenset({
+    "INSERT", "UPDATE", "DELETE", "MERGE", "CREATE", "ALTER", "DROP", "COPY", "TRUNCATE",
+    "LOCK", "DO", "REFRESH",
+})
+# WITH ... с изменяющим подзапросом (writable CTE)
+WRITABLE_CTE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+class DatabaseUnavailableError(Exception):
+    """База данных недоступна: нет соединения или автомат разомкнут"""
+
+
+@dataclass
+class ConnectionScope:
+    """Соединение, закрепленное за задачей на время единицы работы"""
+    connection: asyncpg.Connection
+    task: Optional[asyncio.Task]
+
+
+@dataclass
+class PinnedConnection:
+    """
+    Соединение апдейта: берется из пула при первом запросе и держится
+    до конца апдейта. Через max_hold после взятия срабатывает таймер:
+    свободное соединение сразу отдается в пул, занятое - по окончании
+    текущего запроса, и дальше апдейт работает через пул. Так хендлер,
+    ждущий Telegram между запросами, не держит простаивающее соединение.
+    """
+    task: Optional[asyncio.Task]
+    max_hold: float
+    connection: Optional[asyncpg.Connection] = None
+    acquired_at: float = 0.0
+    in_use: int = 0
+    capped: bool = False
+    timer: Optional[asyncio.TimerHandle] = None
+    release_task: Optional[asyncio.Task] = None
+
+
+# Соединение текущей транзакции; все запросы задачи внутри db.transaction() идут через него
+current_connection_scope: ContextVar[Optional[ConnectionScope]] = ContextVar(
+    "current_connection_scope", default=None
+)
+# Соединение, закрепленное за апдейтом (ConnectionAffinityMiddleware)
+current_pinned_connection: ContextVar[Optional[PinnedConnection]] = ContextVar(
+    "current_pinned_connection", default=None
+)
+
+# Чтение помечено как допустимое с реплики (декоратор replica_read)
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+# Пользователь текущего апдейта - для гарантии "читаю свои записи"
+current_db_actor: ContextVar[Optional[int]] = ContextVar("current_db_actor", default=None)
+
+connection_hold = metrics.histogram(
+    "db_pinned_connection_hold_seconds", "Время удержания закрепленного за апдейтом соединения, с"
+)
+connection_hold_capped = metrics.counter(
+    "db_pinned_connection_capped_total", "Закрепленных соединений, отданных досрочно из-за долгого удержания"
+)
+
+
+replica_reads_total = metrics.counter("db_replica_reads_total", "Чтений, отправленных на реплику", ("replica",))
+primary_reads_total = metrics.counter(
+    "db_primary_reads_total", "Помеченных чтений, выполненных на основной базе", ("reason",)
+)
+replica_lag = metrics.gauge("db_replica_lag_seconds", "Отставание реплики, с", ("replica",))
+
+
+def replica_read(method):
+    """
+    Помечает метод репозитория как чтение, допустимое с реплики.
+    Запросы внутри метода уходят на здоровую реплику, если у пользователя
+    нет недавних записей и нет открытой транзакции.
+    """
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = read_from_replica.set(True)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            read_from_replica.reset(token)
+    return wrapper
+
+
+@dataclass
+class ReplicaPool:
+    """Пул соединений реплики и её состояние по последней проверке"""
+    name: str
+    dsn: str
+    pool: Optional[asyncpg.Pool] = None
+    healthy: bool = False
+    lag: Optional[float] = None
+
+
 class Database:
-    def __init__(self, config: DatabaseConfig):
-        self.config = config
+    def __init__(self, config: Optional[DatabaseConfig] = None):
+        self._config = config
         self.pool: Optional[asyncpg.Pool] = None
+        # Пользователь -> момент (monotonic), до которого он читает с основной базы
+        self._recent_writers: Dict[int, float] = {}
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        # При теплом старте первый запрос хендлера может прийти, пока init_db еще подключается
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def config(self) -> DatabaseConfig:
+        """Настройки из окружения читаются при первом обращении, а не при импорте модуля"""
+        if self._config is None:
+            self._config = DatabaseConfig.from_env()
+        return self._config
+
+    @functools.cached_property
+    def replicas(self) -> List[ReplicaPool]:
+        return [ReplicaPool(name=f"replica{index}", dsn=dsn) for index, dsn in enumerate(self.config.replica_dsns)]
+
+    @functools.cached_property
+    def _replica_cycle(self):
+        return itertools.cycle(range(max(len(self.replicas), 1)))
+
+    @functools.cached_property
+    def breaker(self) -> CircuitBreaker:
+        return CircuitBreaker("postgres", self.config.breaker_failure_threshold)
 
     async def connect(self):
         """Создает пул соединений с обработкой ошибок"""
+        async with self._connect_lock:
+            await self._connect()
+
+    async def _connect(self):
         if self.pool is None:
             # Список хостов для попытки подключения
             hosts_to_try = [
@@ -53,48 +198,350 @@ class Database:
                     continue
 
             # Если все попытки провалились
-            raise Exception("Не удалось подключиться ни к одному из хостов PostgreSQL")
+            raise DatabaseUnavailableError("Не удалось подключиться ни к одному из хостов PostgreSQL")
 
     async def disconnect(self):
         """Закрывает пул соединений"""
+        await self.stop_replica_monitor()
+        if self._probe_task:
+            self._probe_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._probe_task
+            self._probe_task = None
+        for replica in self.replicas:
+            if replica.pool:
+                await replica.pool.close()
+                replica.pool = None
+                replica.healthy = False
         if self.pool:
             await self.pool.close()
             self.pool = None
             logger.info("Подключение к базе данных закрыто")
 
+    def start_replica_monitor(self, interval: float = 5.0):
+        """Периодически проверяет реплики и их отставание; без реплик ничего не делает"""
+        if self.replicas and self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor_replicas(interval))
+
+    async def stop_replica_monitor(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._monitor_task
+            self._monitor_task = None
+
+    async def _monitor_replicas(self, interval: float):
+        while True:
+            await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+            await asyncio.sleep(interval)
+
+    async def check_replica(self, replica: ReplicaPool) -> bool:
+        """Подключает реплику при необходимости и обновляет её отставание"""
+        # Без входящих WAL-изменений replay_timestamp стареет сам по себе - тогда отставание 0.
+        # Но равные LSN бывают и у реплики, потерявшей основную базу, поэтому она считается
+        # здоровой, только пока работает приемник WAL (status виден только с pg_read_all_stats)
+        query = """
+        SELECT
+            NOT pg_is_in_recovery() OR EXISTS (
+                SELECT 1 FROM pg_stat_wal_receiver
+                WHERE pid IS NOT NULL AND (status IS NULL OR status = 'streaming')
+            ) AS streaming,
+            CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END AS lag
+        """
+        try:
+            if replica.pool is None:
+                replica.pool = await asyncpg.create_pool(
+                    dsn=replica.dsn,
+                    min_size=self.config.min_size,
+                    max_size=self.config.max_size,
+                    max_queries=self.config.max_queries,
+                    max_inactive_connection_lifetime=self.config.max_inactive_connection_lifetime,
+                    command_timeout=60
+                )
+            async with replica.pool.acquire() as connection:
+                row = await connection.fetchrow(query)
+            replica.lag = float(row['lag'])
+            replica_lag.set(replica.lag, replica=replica.name)
+            healthy = row['streaming'] and replica.lag <= self.config.replica_max_lag
+            if not row['streaming'] and replica.healthy:
+                logger.warning(f"Реплика {replica.name} не получает WAL с основной базы")
+        except Exception as e:
+            logger.warning(f"Реплика {replica.name} недоступна: {e}")
+            healthy = False
+
+        if healthy != replica.healthy:
+            logger.info(f"Реплика {replica.name} {'включена в' if healthy else 'исключена из'} чтение"
+                        f" (отставание: {replica.lag})")
+        replica.healthy = healthy
+        return healthy
+
+    def _record_failure(self, error: Exception):
+        """Сбой соединения; разомкнувшийся автомат запускает фоновую проверку восстановления"""
+        logger.warning(f"Сбой соединения с базой данных: {error}")
+        if self.breaker.record_failure() and self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_recovery())
+
+    async def _probe_recovery(self):
+        """Пока автомат разомкнут, периодически пробует выполнить запрос; успех замыкает автомат"""
+        while True:
+            await asyncio.sleep(self.config.breaker_probe_interval)
+            try:
+                if not self.pool:
+                    await self.connect()
+                async with self.pool.acquire() as connection:
+                    await connection.fetchval("SELECT 1")
+            except Exception as e:
+                logger.warning(f"База данных по-прежнему недоступна: {e}")
+                continue
+            self.breaker.reset()
+            logger.info("База данных снова доступна")
+            self._probe_task = None
+            return
+
+    async def _acquire(self) -> asyncpg.Connection:
+        """Соединение из пула; при разомкнутом автомате - отказ без ожидания"""
+        if self.breaker.is_open:
+            raise DatabaseUnavailableError("База данных недоступна, запрос отклонен")
+        try:
+            if not self.pool:
+                await self.connect()
+            return await self.pool.acquire()
+        except (DatabaseUnavailableError, *CONNECTION_ERRORS) as e:
+            self._record_failure(e)
+            raise DatabaseUnavailableError(f"Нет соединения с базой данных: {e}") from e
+
+    @asynccontextmanager
+    async def _watch_connection(self):
+        """Разрыв соединения во время запроса учитывается автоматом"""
+        try:
+            yield
+        except CONNECTION_ERRORS as e:
+            self._record_failure(e)
+            raise DatabaseUnavailableError(f"Соединение с базой данных потеряно: {e}") from e
+        self.breaker.record_success()
+
+    def _tracks_writes(self) -> bool:
+        """Записи нужно запоминать: есть реплики и известен пользователь апдейта"""
+        return bool(self.replicas) and current_db_actor.get() is not None
+
+    def record_write(self):
+        """Запоминает запись пользователя: его чтения какое-то время идут на основную базу"""
+        if not self._tracks_writes():
+            return
+        actor = current_db_actor.get()
+        now = time.monotonic()
+        self._recent_writers[actor] = now + self.config.read_your_writes_window
+        if len(self._recent_writers) > 10000:
+            self._recent_writers = {
+                user: deadline for user, deadline in self._recent_writers.items() if deadline > now
+            }
+
+    def _pick_replica(self) -> Optional[ReplicaPool]:
+        """Реплика для помеченного чтения или None - читать с основной базы"""
+        if not self.replicas or not read_from_replica.get():
+            return None
+        if self._current_scope() is not None or self._current_pinned() is not None:
+            # Внутри транзакции / апдейта с закрепленным соединением читаем через него
+            primary_reads_total.inc(reason="connection_scope")
+            return None
+        actor = current_db_actor.get()
+        if actor is not None and self._recent_writers.get(actor, 0) > time.monotonic():
+            primary_reads_total.inc(reason="read_your_writes")
+            return None
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._replica_cycle)]
+            if replica.healthy and replica.pool is not None:
+                return replica
+        primary_reads_total.inc(reason="no_healthy_replica")
+        return None
+
+    async def _run(self, method: str, query: str, args):
+        """Помеченное чтение - с реплики (при ошибке соединения с ней - с основной базы), остальное - с основной"""
+        if self._is_write(query):
+            self.record_write()
+            replica = None
+        else:
+            replica = self._pick_replica()
+        if replica is not None:
+            try:
+                async with replica.pool.acquire() as conn:
+                    result = await getattr(conn, method)(query, *args)
+                replica_reads_total.inc(replica=replica.name)
+                return result
+            except (*CONNECTION_ERRORS, asyncpg.InterfaceError) as e:
+                logger.warning(f"Реплика {replica.name} исключена из чтения: {e}")
+                replica.healthy = False
+
+        async with self.get_connection() as conn:
+            return await getattr(conn, method)(query, *args)
+
+    @staticmethod
+    def _current_scope() -> Optional[ConnectionScope]:
+        """
+        Закрепленное соединение, если оно принадлежит текущей задаче.
+        Задачи, порожденные внутри транзакции (asyncio.gather), наследуют
+        контекст, но одно соединение не выполняет запросы параллельно -
+        такие задачи берут свое соединение из пула.
+        """
+        scope = current_connection_scope.get()
+        if scope is not None and scope.task is asyncio.current_task():
+            return scope
+        return None
+
+    @staticmethod
+    def _current_pinned() -> Optional[PinnedConnection]:
+        """Закрепленное соединение апдейта, если оно принадлежит текущей задаче и не отдано"""
+        pinned = current_pinned_connection.get()
+        if pinned is not None and not pinned.capped and pinned.task is asyncio.current_task():
+            return pinned
+        return None
+
     @asynccontextmanager
     async def get_connection(self):
-        """Получает соединение из пула"""
-        if not self.pool:
-            await self.connect()
+        """Получает соединение из пула (или соединение текущей транзакции / апдейта)"""
+        scope = self._current_scope()
+        if scope is not None:
+            yield scope.connection
+            return
+
+        pinned = self._current_pinned()
+        if pinned is not None:
+            async with self._use_pinned(pinned) as connection:
+                yield connection
+            return
+
+        connection = await self._acquire()
+        try:
+            async with self._watch_connection():
+                yield connection
+        finally:
+            await self.pool.release(connection)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Единица работы: одно соединение и одна транзакция на весь блок.
+        Репозитории внутри блока автоматически используют это соединение,
+        вложенный db.transaction() становится точкой сохранения.
+        Запись пользователя запоминается, только если транзакция действительно
+        что-то изменила: PostgreSQL выдает ей номер (txid) при первой записи.
+        """
+        scope = self._current_scope()
+        if scope is not None:
+            async with scope.connection.transaction():
+                yield scope.connection
+            return
 
-        async with self.pool.acquire() as connection:
-            yield connection
+        wrote = False
+        async with self.get_connection() as connection:
+            async with connection.transaction():
+                token = current_connection_scope.set(ConnectionScope(connection, asyncio.current_task()))
+                try:
+                    yield connection
+                    if self._tracks_writes():
+                        wrote = await connection.fetchval("SELECT txid_current_if_assigned() IS NOT NULL")
+                finally:
+                    current_connection_scope.reset(token)
+        if wrote:
+            self.record_write()
+
+    @asynccontextmanager
+    async def pinned_connection(self, max_hold: float = 1.0):
+        """
+        Закрепляет соединение за блоком (апдейтом): первое обращение к БД
+        берет соединение из пула, остальные используют его же.
+        """
+        pinned = PinnedConnection(task=asyncio.current_task(), max_hold=max_hold)
+        token = current_pinned_connection.set(pinned)
+        try:
+            yield pinned
+        finally:
+            current_pinned_connection.reset(token)
+            await self._release_pinned(pinned)
+
+    @asynccontextmanager
+    async def _use_pinned(self, pinned: PinnedConnection):
+        if pinned.connection is None:
+            pinned.connection = await self._acquire()
+            pinned.acquired_at = time.perf_counter()
+            pinned.timer = asyncio.get_running_loop().call_later(
+                pinned.max_hold, self._expire_pinned, pinned
+            )
+
+        pinned.in_use += 1
+        try:
+            async with self._watch_connection():
+                yield pinned.connection
+        finally:
+            pinned.in_use -= 1
+            if pinned.in_use == 0 and pinned.capped:
+                await self._release_pinned(pinned)
+
+    def _expire_pinned(self, pinned: PinnedConnection):
+        """Таймер max_hold: свободное соединение отдается сразу, занятое - после текущего запроса"""
+        pinned.timer = None
+        pinned.capped = True
+        if pinned.in_use == 0 and pinned.connection is not None:
+            pinned.release_task = asyncio.create_task(self._release_pinned(pinned))
+
+    async def _release_pinned(self, pinned: PinnedConnection):
+        if pinned.timer is not None:
+            pinned.timer.cancel()
+            pinned.timer = None
+        if pinned.connection is None:
+            return
+        connection, pinned.connection = pinned.connection, None
+        connection_hold.observe(time.perf_counter() - pinned.acquired_at)
+        if pinned.capped:
+            connection_hold_capped.inc()
+        await self.pool.release(connection)
+
+    @staticmethod
+    def _is_write(query: str) -> bool:
+        """Запрос, меняющий данные (INSERT ... RETURNING и т.п. идут через fetch*), - по первому слову"""
+        words = query.lstrip(" \t\n(").split(None, 1)
+        if not words:
+            return False
+        keyword = words[0].upper()
+        if keyword == "WITH":
+            return WRITABLE_CTE.search(query) is not None
+        return keyword in WRITE_KEYWORDS
 
     async def execute(self, query: str, *args):
         """Выполняет запрос без возврата данных"""
-        async with self.get_connection() as conn:
-            return await conn.execute(query, *args)
+        if self._is_write(query):
+            self.record_write()
+        with track_query():
+            async with self.get_connection() as conn:
+                return await conn.execute(query, *args)
 
     async def fetch(self, query: str, *args):
         """Выполняет запрос и возвращает все строки"""
-        async with self.get_connection() as conn:
-            return await conn.fetch(query, *args)
+        with track_query():
+            return await self._run("fetch", query, args)
 
     async def fetchrow(self, query: str, *args):
         """Выполняет запрос и возвращает одну строку"""
-        async with self.get_connection() as conn:
-            return await conn.fetchrow(query, *args)
+        with track_query():
+            return await self._run("fetchrow", query, args)
 
     async def fetchval(self, query: str, *args):
         """Выполняет запрос и возвращает одно значение"""
-        async with self.get_connection() as conn:
-            return await conn.fetchval(query, *args)
+        with track_query():
+            return await self._run("fetchval", query, args)
 
     async def executemany(self, query: str, args_list):
         """Выполняет множественные запросы"""
-        async with self.get_connection() as conn:
-            return await conn.executemany(query, args_list)
+        if self._is_write(query):
+            self.record_write()
+        with track_query():
+            async with self.get_connection() as conn:
+                return await conn.executemany(query, args_list)
 
     async def wait_for_connection(self, max_attempts: int = 30, delay: int = 2):
         """Ожидает доступности базы данных"""
@@ -122,5 +569,5 @@ class Database:
             return False
 
 
-# Глобальный экземпляр
-db = Database(db_config)
\ No newline at end of file
+# Глобальный экземпляр; настройки читаются при первом подключении
+db = Database()
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List
+
+from dotenv import load_dotenv
 
 @dataclass
 class DatabaseConfig:
@@ -12,6 +15,16 @@ class DatabaseConfig:
     max_size: int = 10
     max_queries: int = 50000
     max_inactive_connection_lifetime: float = 300.0
+    # Реплики только для чтения: полные DSN, пул на каждую
+    replica_dsns: List[str] = field(default_factory=list)
+    # Реплика с отставанием больше этого (с) не получает чтения
+    replica_max_lag: float = 5.0
+    # Сколько секунд после своей записи пользователь читает с основной базы
+    read_your_writes_window: float = 5.0
+    # Столько сбоев соединения подряд размыкают автомат: запросы сразу получают отказ
+    breaker_failure_threshold: int = 5
+    # Как часто (с) при разомкнутом автомате проверять, не вернулась ли база
+    breaker_probe_interval: float = 5.0
 
     @property
     def dsn(self) -> str:
@@ -19,6 +32,7 @@ class DatabaseConfig:
 
     @classmethod
     def from_env(cls) -> 'DatabaseConfig':
+        load_dotenv()
         return cls(
             host=os.getenv('DB_HOST'),
             port=int(os.getenv('DB_PORT')),
@@ -28,7 +42,10 @@ class DatabaseConfig:
             min_size=int(os.getenv('DB_MIN_SIZE', 1)),
             max_size=int(os.getenv('DB_MAX_SIZE', 10)),
             max_queries=int(os.getenv('DB_MAX_QUERIES', 50000)),
-            max_inactive_connection_lifetime=float(os.getenv('DB_MAX_INACTIVE_TIME', 300.0))
-        )
-
-db_config = DatabaseConfig.from_env()
\ No newline at end of file
+            max_inactive_connection_lifetime=float(os.getenv('DB_MAX_INACTIVE_TIME', 300.0)),
+            replica_dsns=[dsn.strip() for dsn in os.getenv('DB_REPLICA_DSNS', '').split(',') if dsn.strip()],
+            replica_max_lag=float(os.getenv('DB_REPLICA_MAX_LAG', 5.0)),
+            read_your_writes_window=float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5.0)),
+            breaker_failure_threshold=int(os.getenv('DB_BREAKER_FAILURES', 5)),
+            breaker_probe_interval=float(os.getenv('DB_BREAKER_PROBE_SECONDS', 5.0))
+        )
\ No newline at end of file
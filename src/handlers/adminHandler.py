@@ -0,0 +1,107 @@
+import logging
+import os
+from typing import Set
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from src.config.Container import container
+from src.models.Order import OrderStatus
+from src.services.BroadcastService import BroadcastService
+
+logger = logging.getLogger(__name__)
+
+admin_router = Router()
+
+# id заказов - integer в PostgreSQL; большее число запрос не примет
+INT4_MAX = 2 ** 31 - 1
+
+
+def get_admin_ids() -> Set[int]:
+    """telegram_id администраторов из переменной окружения ADMIN_IDS (через запятую)"""
+    raw = os.getenv('ADMIN_IDS', '')
+    return {int(value) for value in raw.split(',') if value.strip().isdigit()}
+
+
+def is_admin(message: Message) -> bool:
+    return message.from_user is not None and message.from_user.id in get_admin_ids()
+
+
+@admin_router.message(Command("broadcast"))
+async def broadcast_command(message: Message, command: CommandObject, broadcast_service: BroadcastService):
+    """Запуск рассылки: /broadcast <текст>"""
+    if not is_admin(message):
+        return
+
+    if not command.args:
+        await message.answer("Использование: /broadcast &lt;текст рассылки&gt;")
+        return
+
+    broadcast = await broadcast_service.create(command.args)
+    logger.info(f"Администратор {message.from_user.id} запустил рассылку {broadcast.id}")
+    await message.answer(
+        f"📣 Рассылка #{broadcast.id} запущена.\n"
+        f"Прогресс: /broadcast_status {broadcast.id}"
+    )
+
+
+@admin_router.message(Command("broadcast_status"))
+async def broadcast_status_command(message: Message, command: CommandObject):
+    """Прогресс рассылки: /broadcast_status <id>"""
+    if not is_admin(message):
+        return
+
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /broadcast_status &lt;id&gt;")
+        return
+
+    broadcast = await container.broadcast_repo.get_by_id(int(command.args))
+    if not broadcast:
+        await message.answer("Рассылка не найдена")
+        return
+
+    await message.answer(
+        f"📣 Рассылка #{broadcast.id}: {broadcast.status.value}\n"
+        f"Отправлено: {broadcast.sent_count}\n"
+        f"Ошибок: {broadcast.failed_count}\n"
+        f"Заблокировали бота: {broadcast.blocked_count}"
+    )
+
+
+@admin_router.message(Command("broadcast_cancel"))
+async def broadcast_cancel_command(message: Message, command: CommandObject, broadcast_service: BroadcastService):
+    """Отмена рассылки: /broadcast_cancel <id>"""
+    if not is_admin(message):
+        return
+
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /broadcast_cancel &lt;id&gt;")
+        return
+
+    if await broadcast_service.cancel(int(command.args)):
+        await message.answer("Рассылка отменена")
+    else:
+        await message.answer("Рассылка не найдена")
+
+
+@admin_router.message(Command("no_show"))
+async def no_show_command(message: Message, command: CommandObject):
+    """Отметка неявки клиентов: /no_show <id> [<id> ...]"""
+    if not is_admin(message):
+        return
+
+    order_ids = command.args.split() if command.args else []
+    if not order_ids or not all(order_id.isdecimal() and int(order_id) <= INT4_MAX for order_id in order_ids):
+        await message.answer("Использование: /no_show &lt;id заказа&gt; [&lt;id&gt; ...]")
+        return
+
+    # Неявка - только для наступивших записей, которые не отменены и не отмечены раньше
+    updated = await container.order_repo.update_status_many(
+        [int(order_id) for order_id in order_ids],
+        OrderStatus.NO_SHOW,
+        from_statuses=[OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS],
+        started=True
+    )
+    logger.info(f"Администратор {message.from_user.id} отметил неявку по заказам {order_ids}: {updated}")
+    await message.answer(f"Отмечено неявок: {updated} из {len(order_ids)}")
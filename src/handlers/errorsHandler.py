@@ -0,0 +1,38 @@
+import logging
+from contextlib import suppress
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import ExceptionTypeFilter
+from aiogram.types import ErrorEvent
+
+from src.config.Database import DatabaseUnavailableError
+from src.utils.messages import DATABASE_UNAVAILABLE_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+errors_router = Router()
+
+
+@errors_router.error(ExceptionTypeFilter(DatabaseUnavailableError))
+async def database_unavailable(event: ErrorEvent):
+    """
+    База недоступна и снимка каталога не хватило (запись, клиент, заказы):
+    вежливо отказываем. Состояние FSM не сбрасывается - пользователь
+    повторит шаг, когда база вернется.
+    """
+    logger.warning(f"Апдейт {event.update.update_id} не обработан, база недоступна: {event.exception}")
+    callback = event.update.callback_query
+    if callback:
+        if callback.message is None:
+            # Сообщение с кнопкой недоступно (старое или из inline-режима) - отвечаем всплывающим окном
+            with suppress(TelegramBadRequest):
+                await callback.answer(DATABASE_UNAVAILABLE_MESSAGE, show_alert=True)
+            return True
+        # На нажатие мог уже ответить сам хендлер
+        with suppress(TelegramBadRequest):
+            await callback.answer()
+        await callback.message.answer(DATABASE_UNAVAILABLE_MESSAGE)
+    elif event.update.message:
+        await event.update.message.answer(DATABASE_UNAVAILABLE_MESSAGE)
+    return True
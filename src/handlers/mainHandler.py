@@ -5,22 +5,16 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 
-from src.handlers.masterHandler import master_repo
+from src.config.Container import container
 from src.keyboards.mainKeyboards import get_main_keyboard, get_back_to_main_keyboard
 from src.keyboards.masterKeyboard import create_masters_paginated_keyboard
 from src.keyboards.servicesKeyboards import get_category_keyboard, get_services_keyboard, create_search_results_keyboard
-from src.repository.ServiceRepository import ServiceRepository
-from src.repository.UserRepository import UserRepository
 from src.utils.messages import MAIN, MENU, ALL_SERVICES
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
-# Создание репозиториев
-user_repo = UserRepository()
-service_repo = ServiceRepository()
-
 class SearchStates(StatesGroup):
     waiting_for_search_query = State()
 
@@ -31,10 +25,13 @@ async def start_command(message: Message):
     telegram_id = message.from_user.id
 
     # Создание пользователя
-    user, created = await user_repo.get_or_create(
+    user, created = await container.user_repo.get_or_create(
         telegram_id=telegram_id,
         username=username
     )
+    if not created:
+        # Пользователь мог раньше заблокировать бота - раз пишет, снова получает рассылки
+        await container.user_repo.mark_unblocked(telegram_id)
 
     #Отправка приветственного сообщения
     await message.answer(
@@ -83,7 +80,7 @@ async def process_back(callback: CallbackQuery):
     menu = callback.data.split(":")[1]
     keyboards = {
         "CHOOSE_SERVICE": get_category_keyboard(),
-        "masters_list": create_masters_paginated_keyboard(masters = await master_repo.get_all()),
+        "masters_list": create_masters_paginated_keyboard(masters = await container.master_repo.get_all()),
         "main_menu": get_main_keyboard()
     }
 
@@ -120,9 +117,9 @@ async def process_search_query(message: Message, state: FSMContext):
     try:
 
         # Поиск по названию
-        # services_by_name = await service_repo.search_by_name(search_query)
+        # services_by_name = await container.service_repo.search_by_name(search_query)
 
-        services_by_description = await service_repo.search_by_description(search_query)
+        services_by_description = await container.service_repo.search_by_description(search_query)
 
         all_services = services_by_description
         unique_services = []
@@ -180,8 +177,8 @@ async def handle_search_pagination(callback: CallbackQuery):
         page = int(page_str)
 
         # Повторяем поиск
-        # services_by_name = await service_repo.search_by_name(search_query)
-        services_by_description = await service_repo.search_by_description(search_query)
+        # services_by_name = await container.service_repo.search_by_name(search_query)
+        services_by_description = await container.service_repo.search_by_description(search_query)
 
         all_services = services_by_description
         unique_services = []
@@ -215,7 +212,7 @@ async def process_search_service_selection(callback: CallbackQuery):
     """Обработка выбора услуги из результатов поиска"""
     service_name = callback.data.split(":", 2)[2]
 
-    service_db = await service_repo.get_by_name(service_name)
+    service_db = await container.service_repo.get_by_name(service_name)
 
     if service_db:
         # Форматируем время
@@ -1,24 +1,27 @@
+import asyncio
 import logging
 import os
+from functools import lru_cache
+from typing import Dict, Optional, Union
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 
-from src.config.BotSingleton import BotSingleton
-from src.keyboards.masterKeyboard import create_masters_paginated_keyboard, create_master_services_keyboard
-from src.repository.MasterRepository import MasterRepository
-from src.repository.ServiceRepository import ServiceRepository
+from src.config.Container import container
+from src.keyboards.masterKeyboard import create_masters_paginated_keyboard, create_master_services_keyboard, \
+    order_callback_data
+from src.models.MasterSchedule import WEEKDAY_NAMES
+from src.services.Loaders import Loaders
 from src.utils.messages import ALL_SERVICES
+from src.utils.timing import log_duration
 
 logger = logging.getLogger(__name__)
 
 router_master = Router()
 
-master_repo: MasterRepository = MasterRepository()
-service_repo: ServiceRepository = ServiceRepository()
-
-bot = BotSingleton().get_bot()
+# file_id фото мастеров, уже загруженных в Telegram
+master_photo_ids: Dict[str, str] = {}
 
 
 @router_master.callback_query(F.data.startswith("MASTERS"))
@@ -28,7 +31,7 @@ async def show_masters_handler(callback: CallbackQuery, state: FSMContext):
     """
     await state.set_state("masters_list")
 
-    masters = await master_repo.get_all()
+    masters = await container.master_repo.get_all()
     keyboard = create_masters_paginated_keyboard(masters=masters, page=0)
 
     message_text = "Выберите мастера, чтобы увидеть его информацию и услуги:"
@@ -47,7 +50,7 @@ async def masters_pagination_handler(callback: CallbackQuery, state: FSMContext)
     """
     page = int(callback.data.split(":")[1])
 
-    masters = await master_repo.get_all()
+    masters = await container.master_repo.get_all()
     keyboard = create_masters_paginated_keyboard(masters=masters, page=page)
 
     message_text = "Выберите мастера, чтобы увидеть его информацию и услуги:"
@@ -59,15 +62,21 @@ async def masters_pagination_handler(callback: CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
+@lru_cache(maxsize=128)
+def format_working_days(working_days: Optional[str]) -> str:
+    """"1,2,3" -> "ПН, ВТ, СР"; разных графиков немного, разбор кешируется"""
+    if not working_days:
+        return "-"
+    return ", ".join(
+        WEEKDAY_NAMES[int(day)] for day in working_days.split(',') if day.strip().isdigit()
+    )
+
+
 def get_master_info_message(master):
     """
     Форматирует информацию о мастере  сообщение.
     """
-    working_days_map = {
-        1: "ПН", 2: "ВТ", 3: "СР", 4: "ЧТ", 5: "ПТ", 6: "СБ", 7: "ВС"
-    }
-    days = [working_days_map[int(day)] for day in master.working_days.split(',')]
-    working_days_str = ", ".join(days)
+    working_days_str = format_working_days(master.working_days)
 
     message = (
         f"<b>Мастер: {master.name}</b>\n"
@@ -89,43 +98,64 @@ def get_master_info_message(master):
 
 
 
+@lru_cache(maxsize=64)
+def read_photo(photo_path: str) -> Optional[bytes]:
+    """Читает фото с диска один раз; None, если файла нет"""
+    if not os.path.exists(photo_path):
+        return None
+    with open(photo_path, 'rb') as photo_file:
+        return photo_file.read()
+
+
+async def get_master_photo(photo_path: str) -> Optional[Union[str, BufferedInputFile]]:
+    """
+    file_id уже загруженного фото или файл для первой загрузки.
+    Чтение с диска выполняется в потоке, чтобы не блокировать цикл событий.
+    """
+    file_id = master_photo_ids.get(photo_path)
+    if file_id:
+        return file_id
+
+    photo_bytes = await asyncio.to_thread(read_photo, photo_path)
+    if photo_bytes is None:
+        return None
+    return BufferedInputFile(photo_bytes, filename=os.path.basename(photo_path))
+
+
 @router_master.callback_query(F.data.startswith("master_info:"))
-async def master_info_handler(callback: CallbackQuery, state: FSMContext):
+async def master_info_handler(callback: CallbackQuery, state: FSMContext, loaders: Loaders):
     """
     Показывает информацию о мастере и список его услуг.
     """
     master_id = int(callback.data.split(":")[1])
 
-    master = await master_repo.get_by_id(master_id)
+    master = await loaders.masters.load(master_id)
     if not master:
         await callback.answer("Мастер не найден.", show_alert=True)
         return
 
-    # Получаем услуги мастера
-    master_services_list = await master_repo.get_master_services(master_id)
+    # Получаем услуги мастера одним пакетом по уже известным service_ids
+    master_services_list = await loaders.load_master_services(master)
 
     message_text = get_master_info_message(master)
     keyboard = create_master_services_keyboard(master_id=master_id, services=master_services_list)
     #TODO как то сохранять фото мастеров
     # photo_path = f"../images/{master.username}.jpg"
     photo_path = f"src/images/master_1.jpg"
-    with open(photo_path, 'rb') as photo_file:
-        photo_bytes = photo_file.read()
+    photo = await get_master_photo(photo_path)
 
-    if os.path.exists(photo_path):
-        with open(photo_path, 'rb') as photo_file:
-            photo_bytes = photo_file.read()
+    if photo:
         logger.info("с фото")
-        # Создаем объект BufferedInputFile из байтов
-        photo_input = BufferedInputFile(photo_bytes, filename=f"master_1.jpg")
-
-        await bot.send_photo(
+        sent = await callback.bot.send_photo(
             chat_id=callback.message.chat.id,
-            photo=photo_input,
+            photo=photo,
             caption=message_text,
             reply_markup=keyboard,
             parse_mode="HTML"
         )
+        if isinstance(photo, BufferedInputFile) and sent.photo:
+            # Дальше отправляем по file_id - без повторной загрузки файла
+            master_photo_ids[photo_path] = sent.photo[-1].file_id
         # Удаляем предыдущее сообщение, чтобы избежать дублирования
         # await callback.message.delete()
 
@@ -141,7 +171,7 @@ async def master_info_handler(callback: CallbackQuery, state: FSMContext):
 
 
 @router_master.callback_query(F.data.startswith("master_service:"))
-async def master_service_handler(callback: CallbackQuery, state: FSMContext):
+async def master_service_handler(callback: CallbackQuery, state: FSMContext, loaders: Loaders):
     """
     Показывает детальную информацию о выбранной услуге мастера.
     """
@@ -149,8 +179,8 @@ async def master_service_handler(callback: CallbackQuery, state: FSMContext):
     master_id = int(master_id)
     service_id = int(service_id)
 
-    master = await master_repo.get_by_id(master_id)
-    service = await service_repo.get_by_id(service_id)
+    with log_duration("master_service: загрузка данных"):
+        master, service = await loaders.load_master_service(master_id, service_id)
 
     if not master or not service:
         await callback.answer("Услуга или мастер не найдены.", show_alert=True)
@@ -167,7 +197,7 @@ async def master_service_handler(callback: CallbackQuery, state: FSMContext):
             text=message_text,
             # Здесь можно добавить клавиатуру для бронирования
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="🗓️ Записаться", callback_data=f"ORDER:{master_id}:{service_id}")],
+                [InlineKeyboardButton(text="🗓️ Записаться", callback_data=order_callback_data(master_id, service_id))],
                 [InlineKeyboardButton(text="🔙 К услугам мастера", callback_data=f"master_info:{master_id}")]
             ]),
             parse_mode="HTML"
@@ -178,7 +208,7 @@ async def master_service_handler(callback: CallbackQuery, state: FSMContext):
             text=message_text,
             # Здесь можно добавить клавиатуру для бронирования
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="🗓️ Записаться", callback_data=f"ORDER:{master_id}:{service_id}")],
+                [InlineKeyboardButton(text="🗓️ Записаться", callback_data=order_callback_data(master_id, service_id))],
                 [InlineKeyboardButton(text="🔙 К услугам мастера", callback_data=f"master_info:{master_id}")]
             ]),
             parse_mode="HTML"
@@ -202,7 +232,7 @@ async def show_masters_handler(callback: CallbackQuery, state: FSMContext):
     """
     await state.set_state("masters_list")
 
-    masters = await master_repo.get_by_service()
+    masters = await container.master_repo.get_by_service()
     keyboard = create_masters_paginated_keyboard(masters=masters, page=0)
 
     message_text = "Выберите мастера, чтобы увидеть его информацию и услуги:"
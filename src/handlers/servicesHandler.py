@@ -1,38 +1,33 @@
 import logging
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from src.handlers.masterHandler import master_repo
+from src.config.Container import container
 from src.keyboards.mainKeyboards import get_back_to_main_keyboard
-from src.keyboards.masterKeyboard import create_masters_paginated_keyboard
+from src.keyboards.masterKeyboard import create_masters_paginated_keyboard, order_callback_data, SLOT_TIME_FORMAT
 from src.keyboards.servicesKeyboards import get_nails_services_keyboard, get_hair_services_keyboard, \
     get_cosmetology_keyboard, get_hardware_services_keyboard, get_services_keyboard, get_makeup_services_keyboard, \
     get_brows_lashes_services_keyboard, get_spa_services_keyboard, get_kids_services_keyboard, get_category_keyboard
 from src.models.Order import Order, OrderStatus
 from src.models.users.Customer import Customer
 from src.models.users.Master import Master
-from src.repository.CustomerRepository import CustomerRepository
-from src.repository.OrderRepository import OrderRepository
-from src.repository.ServiceRepository import ServiceRepository
-from src.repository.UserRepository import UserRepository
+from src.repository.OrderRepository import SlotTakenError
+from src.services.CustomerCache import customer_cache
+from src.services.Loaders import Loaders
+from src.services.SlotFinder import Slot, slot_finder
 from src.states.BookingState import BookingState
-from src.utils.messages import MENU, ORDER_CONFIRMATION_MESSAGE, ALL_SERVICES
+from src.utils.messages import MENU, ORDER_CONFIRMATION_MESSAGE, ALL_SERVICES, SLOT_TAKEN_MESSAGE
+from src.utils.timing import log_duration
 
 logger = logging.getLogger(__name__)
 
 services_router = Router()
 
-# Создание репозиториев
-user_repo = UserRepository()
-service_repo = ServiceRepository()
-order_repo = OrderRepository()
-customer_repo = CustomerRepository()
-
 
 @services_router.callback_query(F.data.startswith("category:"))
 async def process_category(callback: CallbackQuery):
@@ -130,7 +125,7 @@ async def process_service(callback: CallbackQuery):
             service = parts[2]
 
             # получения услуги из базы данных
-            service_db = await service_repo.get_by_name(service)
+            service_db = await container.service_repo.get_by_name(service)
 
             if service_db:
                 # Форматируем время
@@ -177,7 +172,25 @@ async def create_master_select_keyboard(masters: List[Master], service_id: int):
         button_text = f"👤 {master.name} - {ALL_SERVICES[master.specialization]}"
         builder.add(InlineKeyboardButton(
             text=button_text,
-            callback_data=f"ORDER:{master.id}:{service_id}"
+            callback_data=order_callback_data(master.id, service_id)
+        ))
+
+    builder.row(InlineKeyboardButton(
+        text="🔙 Назад",
+        callback_data=f"back:main_menu"
+    ))
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+def create_slot_select_keyboard(slots: List[Slot], service_id: int):
+    """Клавиатура ближайших свободных окон: кнопка сразу ведет к записи на это время"""
+    builder = InlineKeyboardBuilder()
+
+    for slot in slots:
+        builder.add(InlineKeyboardButton(
+            text=f"🕒 {slot.start.strftime('%d.%m %H:%M')} - {slot.master.name} ⭐{slot.master.rating:.1f}",
+            callback_data=order_callback_data(slot.master.id, service_id, slot.start)
         ))
 
     builder.row(InlineKeyboardButton(
@@ -188,8 +201,31 @@ async def create_master_select_keyboard(masters: List[Master], service_id: int):
     return builder.as_markup()
 
 
+def get_appointment_datetime(slot_time: Optional[str]) -> datetime:
+    """Время выбранного окна; без окна - как раньше, текущее время"""
+    # TODO: Здесь по-прежнему нужна реализация выбора даты и времени
+    if slot_time:
+        return datetime.strptime(slot_time, SLOT_TIME_FORMAT)
+    return datetime.now()
+
+
+async def create_order(order: Order, slot_time: Optional[str], client_token: Optional[str]) -> Optional[Order]:
+    """
+    Создает заказ. Окно, выбранное по кнопке, за время оформления могли
+    занять - тогда оно перепроверяется под блокировкой мастера, и при
+    конфликте возвращается None.
+    """
+    if not slot_time:
+        return await container.order_repo.create(order, client_token=client_token)
+    try:
+        return await container.order_repo.create_in_slot(order, client_token=client_token)
+    except SlotTakenError as e:
+        logger.info(f"Запись не создана: {e}")
+        return None
+
+
 @services_router.callback_query(F.data.startswith("ORDER:"))
-async def start_order_process(callback: CallbackQuery, state: FSMContext):
+async def start_order_process(callback: CallbackQuery, state: FSMContext, loaders: Loaders):
     """
     Инициирует процесс бронирования: сохраняет данные и запрашивает имя.
     """
@@ -203,18 +239,28 @@ async def start_order_process(callback: CallbackQuery, state: FSMContext):
         return
 
     telegram_user_id = callback.from_user.id
+    # Токен кнопки: повторные нажатия одной кнопки дают тот же заказ, а не новый
+    order_token = f"{telegram_user_id}:{parts[3]}" if len(parts) > 3 else None
+    slot_time = parts[4] if len(parts) > 4 else None
 
     # Сохраняем данные в FSM-состоянии
     await state.update_data(
         master_id=master_id,
         service_id=service_id,
-        telegram_user_id=telegram_user_id
+        telegram_user_id=telegram_user_id,
+        order_token=order_token,
+        slot_time=slot_time
     )
 
-    customer = await customer_repo.get_by_telegram_id(telegram_user_id)
-    master = await master_repo.get_by_id(master_id)
-    service = await service_repo.get_by_id(service_id)
-    appointment_datetime = datetime.now()
+    with log_duration("ORDER: загрузка данных"):
+        booking = await loaders.load_booking(telegram_user_id, master_id, service_id)
+    customer, master, service = booking.customer, booking.master, booking.service
+    appointment_datetime = get_appointment_datetime(slot_time)
+
+    if not master or not service:
+        await callback.answer("Мастер или услуга не найдены.", show_alert=True)
+        await state.clear()
+        return
 
     if customer and customer.name and customer.phone:
         new_order = Order(
@@ -229,7 +275,12 @@ async def start_order_process(callback: CallbackQuery, state: FSMContext):
             client_phone=customer.phone
         )
 
-        created_order = await order_repo.create(new_order)
+        created_order = await create_order(new_order, slot_time, order_token)
+        if created_order is None:
+            await callback.message.edit_text(SLOT_TAKEN_MESSAGE, reply_markup=get_back_to_main_keyboard())
+            await state.clear()
+            await callback.answer()
+            return
 
         # Отправляем подтверждение
         await  callback.message.edit_text(
@@ -286,7 +337,7 @@ async def process_name(message: Message, state: FSMContext):
 
 
 @services_router.message(BookingState.waiting_for_phone)
-async def process_phone(message: Message, state: FSMContext):
+async def process_phone(message: Message, state: FSMContext, loaders: Loaders):
     """
     Обрабатывает номер телефона и создает заказ.
     """
@@ -305,46 +356,56 @@ async def process_phone(message: Message, state: FSMContext):
     # Получаем все данные из FSM
     data = await state.get_data()
 
-    master = await master_repo.get_by_id(data['master_id'])
-    service = await service_repo.get_by_id(data['service_id'])
+    with log_duration("process_phone: загрузка данных"):
+        booking = await loaders.load_booking(data['telegram_user_id'], data['master_id'], data['service_id'])
+    customer, master, service = booking.customer, booking.master, booking.service
 
     if not master or not service:
         await message.answer("Произошла ошибка при поиске мастера или услуги.")
         await state.clear()
         return
 
-    # TODO: Здесь по-прежнему нужна реализация выбора даты и времени
-    appointment_datetime = datetime.now()
-
-    # Ищем клиента по telegram_id. Если его нет, создаем.
-    customer = await customer_repo.get_by_telegram_id(data['telegram_user_id'])
-    if not customer:
-        customer = Customer(
-            telegram_id=data['telegram_user_id'],
-            username=message.from_user.username,
-            name=data.get('client_name'),
-            phone=data.get('client_phone')
+    appointment_datetime = get_appointment_datetime(data.get('slot_time'))
+
+    # Клиент и заказ записываются одной транзакцией на одном соединении
+    async with container.db.transaction():
+        # Если клиента нет, создаем.
+        if not customer:
+            customer = Customer(
+                telegram_id=data['telegram_user_id'],
+                username=message.from_user.username,
+                name=data.get('client_name'),
+                phone=data.get('client_phone')
+            )
+            customer = await container.customer_repo.create(customer)
+        else:
+            # Обновляем данные существующего клиента
+            customer.name = data.get('client_name') or customer.name
+            customer.phone = data.get('client_phone') or customer.phone
+            customer = await container.customer_repo.update(customer)
+
+        new_order = Order(
+            user_id=customer.id,  # Используем ID клиента из БД
+            master_id=master.id,
+            service_id=service.id,
+            appointment_datetime=appointment_datetime,
+            duration_minutes=service.duration_minutes,
+            total_price=service.price,
+            status=OrderStatus.PENDING,
+            client_name=customer.name,
+            client_phone=customer.phone
         )
-        customer = await customer_repo.create(customer)
-    else:
-        # Обновляем данные существующего клиента
-        customer.name = data.get('client_name') or customer.name
-        customer.phone = data.get('client_phone') or customer.phone
-        await customer_repo.update(customer)
-
-    new_order = Order(
-        user_id=customer.id,  # Используем ID клиента из БД
-        master_id=master.id,
-        service_id=service.id,
-        appointment_datetime=appointment_datetime,
-        duration_minutes=service.duration_minutes,
-        total_price=service.price,
-        status=OrderStatus.PENDING,
-        client_name=customer.name,
-        client_phone=customer.phone
-    )
 
-    created_order = await order_repo.create(new_order)
+        # Клиент сохраняется, даже если окно успели занять
+        created_order = await create_order(new_order, data.get('slot_time'), data.get('order_token'))
+
+    # Кэш клиентов обновляется только после фиксации транзакции
+    customer_cache.put(customer)
+
+    if created_order is None:
+        await message.answer(SLOT_TAKEN_MESSAGE, reply_markup=get_back_to_main_keyboard())
+        await state.clear()
+        return
 
     # Отправляем подтверждение
     await message.answer(
@@ -373,13 +434,13 @@ async def process_service(callback: CallbackQuery):
 
         service_id_str = parts[1]
         if not service_id_str.isdigit():
-            service_from_db = await service_repo.get_by_name(service_id_str)
+            service_from_db = await container.service_repo.get_by_name(service_id_str)
             service = service_from_db.id
         else:
             service = int(service_id_str)
 
         if (select == "MASTERS"):
-            masters = await master_repo.get_by_service(service)
+            masters = await container.master_repo.get_by_service(service)
             logger.info(masters)
             keyboard = await create_master_select_keyboard(masters=masters, service_id=service)
             message_text = "Выберите мастера, чтобы увидеть его информацию и услуги:"
@@ -389,6 +450,19 @@ async def process_service(callback: CallbackQuery):
                 reply_markup=keyboard
             )
 
+        elif select == "EARLIEST":
+            # Ближайшие свободные окна сразу у всех мастеров услуги
+            with log_duration("service_select: поиск ближайших окон"):
+                slots = await slot_finder.find_earliest(service, limit=5)
+
+            if slots:
+                message_text = "Ближайшее свободное время:"
+            else:
+                message_text = "В ближайшие две недели свободного времени нет."
+            await callback.message.edit_text(
+                text=message_text,
+                reply_markup=create_slot_select_keyboard(slots=slots, service_id=service)
+            )
 
         logger.info(f"Service select {service}:{select}")
 
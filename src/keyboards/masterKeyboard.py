@@ -1,8 +1,11 @@
 # src/keyboards/masterKeyboard.py
 
+import secrets
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 from src.models.users.Master import Master
 from src.models.Service import Service
@@ -11,6 +14,23 @@ from src.utils.messages import ALL_SERVICES
 # Количество мастеров на одной странице
 ITEMS_PER_PAGE = 8
 
+
+# Формат времени записи в данных кнопки
+SLOT_TIME_FORMAT = "%Y%m%d%H%M"
+
+
+def order_callback_data(master_id: int, service_id: int, appointment_at: Optional[datetime] = None) -> str:
+    """
+    Данные кнопки записи. Случайный токен общий для всех нажатий одной
+    отрисованной кнопки - по нему повторное нажатие не создает второй заказ.
+    Для кнопок свободных окон добавляется время записи.
+    """
+    data = f"ORDER:{master_id}:{service_id}:{secrets.token_hex(4)}"
+    if appointment_at:
+        data += f":{appointment_at.strftime(SLOT_TIME_FORMAT)}"
+    return data
+
+
 def create_masters_paginated_keyboard(
     masters: List[Master],
     page: int = 0
@@ -0,0 +1,69 @@
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery
+
+from src.utils.metrics import metrics
+
+CallbackKey = Tuple[int, str]
+
+duplicates_total = metrics.counter(
+    "callback_duplicates_total", "Отброшенных повторных нажатий кнопок", ("kind",)
+)
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторные нажатия одной и той же кнопки одним пользователем:
+    пока обработка первого нажатия не закончилась (single-flight) и ещё window
+    секунд после неё. Повтору только гасится индикатор загрузки на кнопке.
+    """
+
+    # Как часто чистить отметки о завершенных нажатиях, с
+    EVICT_INTERVAL = 60.0
+
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        self._in_flight: Set[CallbackKey] = set()
+        self._finished: Dict[CallbackKey, float] = {}
+        self._evicted_at = time.monotonic()
+
+    async def __call__(
+            self,
+            handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+            event: CallbackQuery,
+            data: Dict[str, Any]
+    ) -> Any:
+        key = (event.from_user.id, event.data or "")
+        now = time.monotonic()
+        self._evict(now)
+
+        if key in self._in_flight:
+            return await self._drop(event, "in_flight")
+        finished_at = self._finished.get(key)
+        if finished_at is not None and now - finished_at < self.window:
+            return await self._drop(event, "debounced")
+
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+            self._finished[key] = time.monotonic()
+
+    @staticmethod
+    async def _drop(event: CallbackQuery, kind: str):
+        duplicates_total.inc(kind=kind)
+        with suppress(TelegramBadRequest):
+            await event.answer()
+
+    def _evict(self, now: float):
+        if now - self._evicted_at < self.EVICT_INTERVAL:
+            return
+        self._evicted_at = now
+        expired = [key for key, finished_at in self._finished.items() if now - finished_at >= self.window]
+        for key in expired:
+            del self._finished[key]
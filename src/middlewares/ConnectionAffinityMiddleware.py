@@ -0,0 +1,44 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.config.Database import db
+from src.utils.metrics import metrics
+
+pinned_connections = metrics.gauge("db_pinned_connections", "Апдейтов с закрепленным соединением")
+
+
+class ConnectionAffinityMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware апдейтов: все запросы одного апдейта идут через одно
+    соединение, взятое из пула при первом обращении к БД. Апдейт ждет пул
+    один раз, а не перед каждым запросом.
+    Закреплять соединения одновременно могут не больше max_pinned апдейтов -
+    остальные работают через пул как обычно, чтобы пул не выбирали целиком.
+    """
+
+    def __init__(self, database=None, max_hold: float = 1.0, max_pinned: int = None):
+        self.db = database or db
+        self.max_hold = max_hold
+        # По умолчанию половина пула: остальное - фоновым сервисам и апдейтам без закрепления
+        self.max_pinned = max_pinned or max(1, self.db.config.max_size // 2)
+        self._pinned = 0
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        if self._pinned >= self.max_pinned:
+            return await handler(event, data)
+
+        self._pinned += 1
+        pinned_connections.set(self._pinned)
+        try:
+            async with self.db.pinned_connection(self.max_hold):
+                return await handler(event, data)
+        finally:
+            self._pinned -= 1
+            pinned_connections.set(self._pinned)
@@ -0,0 +1,37 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.repository.CustomerRepository import CustomerRepository
+from src.repository.MasterRepository import MasterRepository
+from src.repository.OrderRepository import OrderRepository
+from src.repository.ServiceRepository import ServiceRepository
+from src.services.Loaders import Loaders
+
+
+class DataLoaderMiddleware(BaseMiddleware):
+    """
+    Создает новый набор загрузчиков на каждый апдейт и передает его в хендлеры
+    аргументом `loaders`. Кэш загрузчиков живет ровно один апдейт.
+    """
+
+    def __init__(self):
+        self.master_repo = MasterRepository()
+        self.service_repo = ServiceRepository()
+        self.customer_repo = CustomerRepository()
+        self.order_repo = OrderRepository()
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        data['loaders'] = Loaders(
+            master_repo=self.master_repo,
+            service_repo=self.service_repo,
+            customer_repo=self.customer_repo,
+            order_repo=self.order_repo
+        )
+        return await handler(event, data)
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.utils.loop_watchdog import HANDLER_TASK_PREFIX
+from src.utils.metrics import metrics
+from src.utils.profiler import SlowUpdateProfiler
+from src.utils.request_stats import UpdateStats, current_update_stats
+
+HANDLER_LABELS = ("router", "handler")
+
+update_duration = metrics.histogram(
+    "bot_update_duration_seconds", "Время обработки апдейта, с", HANDLER_LABELS
+)
+update_db_queries = metrics.histogram(
+    "bot_update_db_queries", "Запросов к БД на апдейт", HANDLER_LABELS,
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34)
+)
+update_db_seconds = metrics.histogram(
+    "bot_update_db_seconds", "Время запросов к БД на апдейт, с", HANDLER_LABELS
+)
+updates_total = metrics.counter("bot_updates_total", "Обработанных апдейтов", HANDLER_LABELS)
+update_errors_total = metrics.counter(
+    "bot_update_errors_total", "Апдейтов, завершившихся исключением", HANDLER_LABELS + ("error",)
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware апдейтов: время обработки, число и время запросов к БД,
+    ошибки - с метками роутера и хендлера (их проставляет HandlerLabelMiddleware).
+    Если профилировщик включен, медленные апдейты профилируются.
+    """
+
+    def __init__(self, profiler: SlowUpdateProfiler = None):
+        self.profiler = profiler
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = current_update_stats.set(stats)
+
+        task = asyncio.current_task()
+        profiling = self.profiler is not None and self.profiler.enabled
+        if profiling:
+            self.profiler.begin(task)
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            update_errors_total.inc(router=stats.router, handler=stats.handler, error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            current_update_stats.reset(token)
+
+            labels = {"router": stats.router, "handler": stats.handler}
+            update_duration.observe(elapsed, **labels)
+            update_db_queries.observe(stats.queries, **labels)
+            update_db_seconds.observe(stats.db_seconds, **labels)
+            updates_total.inc(**labels)
+
+            if profiling:
+                self.profiler.end(task, elapsed, f"{stats.router}.{stats.handler}")
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """
+    Внутренняя middleware: вызывается после фильтров, когда хендлер уже выбран,
+    и записывает его имя и модуль-роутер в статистику апдейта, а также в имя
+    задачи - так сторож цикла событий видит, какой хендлер блокирует цикл
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        stats = current_update_stats.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            callback = handler_object.callback
+            stats.router = callback.__module__.rsplit(".", 1)[-1]
+            stats.handler = callback.__name__
+            task = asyncio.current_task()
+            if task is not None:
+                task.set_name(f"{HANDLER_TASK_PREFIX}{stats.router}.{stats.handler}")
+        return await handler(event, data)
@@ -0,0 +1,27 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from src.config.Database import current_db_actor
+
+
+class ReadYourWritesMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware апдейтов: связывает запросы к БД с пользователем апдейта.
+    После записи пользователь на короткое время читает с основной базы,
+    поэтому не видит на реплике состояние до своего же изменения.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get('event_from_user')
+        token = current_db_actor.set(user.id if user else None)
+        try:
+            return await handler(event, data)
+        finally:
+            current_db_actor.reset(token)
@@ -0,0 +1,98 @@
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from src.utils.metrics import metrics
+from src.utils.throttling import MemoryThrottleStorage
+
+throttled_total = metrics.counter("throttled_updates_total", "Апдейтов, отклоненных лимитом частоты", ("action",))
+
+TOO_FAST_MESSAGE = "⏳ Слишком часто. Подождите пару секунд и попробуйте снова."
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту действий каждого пользователя ведрами токенов
+    (rate в секунду, capacity - запас для коротких всплесков).
+    Лишние апдейты не доходят до хендлеров и репозиториев: пользователь
+    получает мягкий ответ "слишком часто".
+
+    Действие определяется типом апдейта, а для сообщений - ещё и состоянием FSM
+    (state_actions: состояние -> действие), например, поиск ограничивается строже.
+    """
+
+    DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+        "search": (0.5, 3),
+        "message": (1, 5),
+        "callback": (3, 10),
+    }
+
+    # Не чаще одного предупреждения пользователю за столько секунд
+    WARN_INTERVAL = 5.0
+
+    def __init__(
+            self,
+            limits: Dict[str, Tuple[float, float]] = None,
+            storage=None,
+            state_actions: Dict[str, str] = None
+    ):
+        self.limits = limits or self.DEFAULT_LIMITS
+        self.storage = storage or MemoryThrottleStorage()
+        self.state_actions = state_actions or {}
+        self._warned_at: Dict[str, float] = {}
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        action = self._action(event, data)
+        limit = self.limits.get(action)
+        if limit is None:
+            return await handler(event, data)
+
+        key = f"{user.id}:{action}"
+        wait = await self.storage.hit(key, *limit)
+        if wait == 0:
+            return await handler(event, data)
+
+        throttled_total.inc(action=action)
+        await self._reply_too_fast(event, key)
+        return None
+
+    async def close(self):
+        """Закрывает хранилище ведер (соединение с Redis)"""
+        await self.storage.close()
+
+    def _action(self, event: TelegramObject, data: Dict[str, Any]) -> str:
+        if isinstance(event, CallbackQuery):
+            return "callback"
+        return self.state_actions.get(data.get("raw_state"), "message")
+
+    async def _reply_too_fast(self, event: TelegramObject, key: str):
+        with suppress(TelegramBadRequest):
+            if isinstance(event, CallbackQuery):
+                # Ответ на callback все равно нужен, чтобы погасить индикатор на кнопке
+                await event.answer(TOO_FAST_MESSAGE)
+                return
+
+            now = time.monotonic()
+            if now - self._warned_at.get(key, 0) < self.WARN_INTERVAL:
+                return
+            if len(self._warned_at) > 10000:
+                self._warned_at = {
+                    warned_key: warned_at for warned_key, warned_at in self._warned_at.items()
+                    if now - warned_at < self.WARN_INTERVAL
+                }
+            self._warned_at[key] = now
+            if isinstance(event, Message):
+                await event.answer(TOO_FAST_MESSAGE)
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+
+class BroadcastStatus(Enum):
+    PENDING = "pending"           # Создана, еще не запускалась
+    RUNNING = "running"           # Идет отправка
+    COMPLETED = "completed"       # Все получатели обработаны
+    CANCELLED = "cancelled"       # Остановлена администратором
+
+@dataclass(slots=True)
+class Broadcast:
+    id: Optional[int] = None
+    text: str = ""
+    status: BroadcastStatus = BroadcastStatus.PENDING
+    last_user_id: int = 0         # Курсор keyset-обхода users.id
+    sent_count: int = 0
+    failed_count: int = 0
+    blocked_count: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
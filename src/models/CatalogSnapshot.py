@@ -0,0 +1,111 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.models.Service import Service
+from src.models.users.Master import Master
+
+
+@dataclass(slots=True)
+class CatalogSnapshot:
+    """
+    Копия каталога (услуги и мастера) на момент created_at.
+    Методы повторяют выборки ServiceRepository и MasterRepository,
+    чтобы отвечать вместо них, пока база недоступна.
+    """
+    services: Dict[int, Service] = field(default_factory=dict)
+    masters: Dict[int, Master] = field(default_factory=dict)
+    created_at: Optional[datetime] = None
+
+    @property
+    def services_updated_at(self) -> Optional[datetime]:
+        """Отметка синхронизации услуг: самый поздний updated_at в снимке"""
+        return max((s.updated_at for s in self.services.values() if s.updated_at), default=None)
+
+    @property
+    def masters_updated_at(self) -> Optional[datetime]:
+        """Отметка синхронизации мастеров: самый поздний updated_at в снимке"""
+        return max((m.updated_at for m in self.masters.values() if m.updated_at), default=None)
+
+    def merge(
+            self,
+            services: Iterable[Service] = (),
+            masters: Iterable[Master] = (),
+            created_at: Optional[datetime] = None
+    ) -> 'CatalogSnapshot':
+        """Новый снимок с измененными строками поверх текущих (удаление в каталоге мягкое)"""
+        merged_services = dict(self.services)
+        merged_services.update((service.id, service) for service in services)
+        merged_masters = dict(self.masters)
+        merged_masters.update((master.id, master) for master in masters)
+        return CatalogSnapshot(merged_services, merged_masters, created_at or self.created_at)
+
+    # Услуги
+
+    def service_by_id(self, service_id: int) -> Optional[Service]:
+        return self.services.get(service_id)
+
+    def services_by_ids(self, service_ids: Iterable[int]) -> Dict[int, Service]:
+        return {service_id: self.services[service_id] for service_id in service_ids if service_id in self.services}
+
+    def all_services(self) -> List[Service]:
+        return sorted(self.services.values(), key=lambda s: (s.category, s.name))
+
+    def active_services(self) -> List[Service]:
+        return [service for service in self.all_services() if service.is_active]
+
+    def services_by_category(self, category: str) -> List[Service]:
+        services = [s for s in self.services.values() if s.category == category and s.is_active]
+        return sorted(services, key=lambda s: s.name)
+
+    def service_by_name(self, name: str) -> Optional[Service]:
+        return next((service for service in self.services.values() if service.name == name), None)
+
+    def search_services_by_name(self, name: str) -> List[Service]:
+        name = name.lower()
+        return sorted((s for s in self.services.values() if name in s.name.lower()), key=lambda s: s.name)
+
+    def search_services_by_description(self, description: str) -> List[Service]:
+        description = description.lower()
+        services = [
+            s for s in self.services.values()
+            if s.is_active and s.description and description in s.description.lower()
+        ]
+        return sorted(services, key=lambda s: s.name)
+
+    def services_by_price_range(self, min_price: float, max_price: float) -> List[Service]:
+        services = [s for s in self.services.values() if s.is_active and min_price <= s.price <= max_price]
+        return sorted(services, key=lambda s: s.price)
+
+    # Мастера
+
+    def master_by_id(self, master_id: int) -> Optional[Master]:
+        return self.masters.get(master_id)
+
+    def masters_by_ids(self, master_ids: Iterable[int]) -> Dict[int, Master]:
+        return {master_id: self.masters[master_id] for master_id in master_ids if master_id in self.masters}
+
+    def all_masters(self) -> List[Master]:
+        return sorted(self.masters.values(), key=lambda m: m.name or "")
+
+    def active_masters(self) -> List[Master]:
+        masters = [m for m in self.masters.values() if m.is_active]
+        return sorted(masters, key=lambda m: (-m.rating, m.name or ""))
+
+    def masters_by_service(self, service_id: int) -> List[Master]:
+        return [master for master in self.active_masters() if service_id in master.service_ids]
+
+    def masters_by_specialization(self, specialization: str) -> List[Master]:
+        specialization = specialization.lower()
+        masters = [
+            m for m in self.masters.values()
+            if m.is_active and m.specialization and specialization in m.specialization.lower()
+        ]
+        return sorted(masters, key=lambda m: (-m.rating, -m.experience_years))
+
+    def master_services(self, master_id: int) -> List[Service]:
+        master = self.masters.get(master_id)
+        if master is None:
+            return []
+        services = [self.services[i] for i in master.service_ids if i in self.services and self.services[i].is_active]
+        return sorted(services, key=lambda s: (s.category, s.name))
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Интервал в минутах от начала дня: [start, end)
+TimeRange = Tuple[int, int]
+
+WEEKDAY_NAMES = {1: "ПН", 2: "ВТ", 3: "СР", 4: "ЧТ", 5: "ПТ", 6: "СБ", 7: "ВС"}
+
+
+def weekday_bit(weekday: int) -> int:
+    """Бит дня недели в маске (1 - понедельник ... 7 - воскресенье)"""
+    return 1 << (weekday - 1)
+
+
+@dataclass(slots=True)
+class MasterSchedule:
+    """
+    Рабочий график мастера.
+    weekly_hours - интервалы по дням недели (ISO: 1 - понедельник),
+    exceptions - переопределения на конкретные даты: пустой список - выходной.
+    """
+    master_id: int
+    weekly_hours: Dict[int, List[TimeRange]] = field(default_factory=dict)
+    exceptions: Dict[date, List[TimeRange]] = field(default_factory=dict)
+
+    @property
+    def weekday_mask(self) -> int:
+        """Битовая маска рабочих дней недели"""
+        mask = 0
+        for weekday, ranges in self.weekly_hours.items():
+            if ranges:
+                mask |= weekday_bit(weekday)
+        return mask
+
+    def works_on_weekday(self, weekday: int) -> bool:
+        return bool(self.weekday_mask & weekday_bit(weekday))
+
+    def intervals_for(self, day: date) -> List[TimeRange]:
+        """Рабочие интервалы на дату с учетом исключений"""
+        if day in self.exceptions:
+            return self.exceptions[day]
+        return self.weekly_hours.get(day.isoweekday(), [])
+
+    def is_working(self, start: datetime, duration_minutes: int) -> bool:
+        """Попадает ли [start, start + duration) целиком в рабочий интервал"""
+        start_minute = start.hour * 60 + start.minute
+        end_minute = start_minute + duration_minutes
+        return any(
+            range_start <= start_minute and end_minute <= range_end
+            for range_start, range_end in self.intervals_for(start.date())
+        )
+
+    def working_days(self, start: date, days: int) -> Iterator[Tuple[date, List[TimeRange]]]:
+        """Даты периода, в которые мастер работает, с интервалами"""
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            intervals = self.intervals_for(day)
+            if intervals:
+                yield day, intervals
+
+    def weekly_summary(self) -> Optional[str]:
+        """Краткое описание недельного графика: "ПН, ВТ, СР 09:00-18:00" """
+        by_hours: Dict[Tuple[TimeRange, ...], List[int]] = {}
+        for weekday in sorted(self.weekly_hours):
+            ranges = tuple(self.weekly_hours[weekday])
+            if ranges:
+                by_hours.setdefault(ranges, []).append(weekday)
+        if not by_hours:
+            return None
+
+        parts = []
+        for ranges, weekdays in by_hours.items():
+            days = ", ".join(WEEKDAY_NAMES[weekday] for weekday in weekdays)
+            hours = ", ".join(f"{_hhmm(start)}-{_hhmm(end)}" for start, end in ranges)
+            parts.append(f"{days} {hours}")
+        return "; ".join(parts)
+
+
+def _hhmm(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
@@ -12,7 +12,7 @@ class OrderStatus(Enum):
     CANCELLED = "cancelled"       # Отменён
     NO_SHOW = "no_show"          # Клиент не пришёл
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     id: Optional[int] = None
     user_id: int = 0
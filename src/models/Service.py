@@ -3,7 +3,7 @@ from typing import Optional
 from datetime import datetime
 from decimal import Decimal
 
-@dataclass
+@dataclass(slots=True)
 class Service:
     id: Optional[int] = None
     name: str = ""
@@ -5,7 +5,7 @@ from datetime import datetime
 from src.models.users.User import User
 
 
-@dataclass
+@dataclass(slots=True)
 class Admin(User):
     id: Optional[int] = None
     telegram_id: Optional[int] = None
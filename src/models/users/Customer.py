@@ -5,7 +5,7 @@ from datetime import datetime
 from src.models.users.User import User
 
 
-@dataclass
+@dataclass(slots=True)
 class Customer(User):
     id: Optional[int] = None
     telegram_id: Optional[int] = None
@@ -15,3 +15,4 @@ class Customer(User):
     address: Optional[str] = None
     phone: Optional[str] = None
     email: Optional[str] = None
+    updated_at: Optional[datetime] = None
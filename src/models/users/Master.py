@@ -4,7 +4,7 @@ from datetime import datetime
 
 from src.models.users.User import User
 
-@dataclass
+@dataclass(slots=True)
 class Master(User):
     id: Optional[int] = None
     telegram_id: Optional[int] = None
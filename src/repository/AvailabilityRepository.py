@@ -0,0 +1,264 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.config.Database import db
+from src.utils.availability import CELLS_PER_DAY, CELL_MINUTES, interval_masks
+from src.utils.dates import host_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityRepository:
+    """
+    Занятость мастеров по дням: битовая строка ячеек по CELL_MINUTES минут.
+    Строки поддерживаются триггером на orders в той же транзакции, что и
+    создание, отмена или перенос записи, поэтому проверка свободного времени -
+    чтение одной строки по ключу и битовая операция.
+    Сутки и ячейки считаются по часам салона (пояс хоста, как wall_clock),
+    поэтому маски сходятся с графиками мастеров и проверкой в боте.
+    """
+
+    def __init__(self, database=None):
+        self.db = database or db
+
+    async def create_table(self):
+        """Создает таблицу занятости, функции пересчета и триггер на orders"""
+        zone = host_timezone()
+        query = f"""
+        CREATE TABLE IF NOT EXISTS master_availability (
+            master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            busy BIT({CELLS_PER_DAY}) NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (master_id, day)
+        );
+
+        -- Пояс, по часам которого построены маски (при смене маски пересчитываются)
+        CREATE OR REPLACE FUNCTION master_availability_zone()
+        RETURNS TEXT AS $$
+            SELECT '{zone}'::text
+        $$ LANGUAGE sql IMMUTABLE;
+
+        -- Занятые ячейки мастера за день по активным записям.
+        -- Бот пишет наивное время салона: сутки и ячейки считаются по его часам,
+        -- конец записи - начало по часам плюс длительность, как в interval_masks
+        CREATE OR REPLACE FUNCTION master_availability_cells(p_master_id INTEGER, p_day DATE)
+        RETURNS BIT({CELLS_PER_DAY}) AS $$
+            SELECT COALESCE(
+                bit_or((repeat('0', c.first_cell) || repeat('1', c.last_cell - c.first_cell)
+                        || repeat('0', {CELLS_PER_DAY} - c.last_cell))::bit({CELLS_PER_DAY})),
+                repeat('0', {CELLS_PER_DAY})::bit({CELLS_PER_DAY})
+            )
+            FROM (
+                SELECT GREATEST(0, floor(EXTRACT(EPOCH FROM r.local_start - d.midnight) / {CELL_MINUTES * 60}))::int AS first_cell,
+                       LEAST({CELLS_PER_DAY}, ceil(EXTRACT(EPOCH FROM r.local_start
+                           + INTERVAL '1 minute' * r.duration_minutes - d.midnight) / {CELL_MINUTES * 60}))::int AS last_cell
+                FROM (
+                    SELECT p_day::timestamp AS midnight,
+                           p_day::timestamp AT TIME ZONE '{zone}' AS day_start,
+                           (p_day + 1)::timestamp AT TIME ZONE '{zone}' AS day_end
+                ) d
+                JOIN orders o ON o.master_id = p_master_id
+                    AND o.status NOT IN ('cancelled', 'no_show')
+                    -- Ограничение по appointment_datetime отсекает лишние секции (записи не длиннее суток)
+                    AND o.appointment_datetime < d.day_end
+                    AND o.appointment_datetime > d.day_start - INTERVAL '1 day'
+                CROSS JOIN LATERAL (
+                    SELECT o.appointment_datetime AT TIME ZONE '{zone}' AS local_start, o.duration_minutes
+                ) r
+                WHERE r.local_start + INTERVAL '1 minute' * r.duration_minutes > d.midnight
+            ) c
+            WHERE c.last_cell > c.first_cell
+        $$ LANGUAGE sql STABLE;
+
+        CREATE OR REPLACE FUNCTION master_availability_refresh(p_master_id INTEGER, p_day DATE)
+        RETURNS VOID AS $$
+        BEGIN
+            -- Блокировка строки дня сериализует пересчеты: следующий пересчет
+            -- начнется после фиксации предыдущего и увидит его запись
+            INSERT INTO master_availability (master_id, day, busy)
+            VALUES (p_master_id, p_day, repeat('0', {CELLS_PER_DAY})::bit({CELLS_PER_DAY}))
+            ON CONFLICT (master_id, day) DO NOTHING;
+            PERFORM 1 FROM master_availability
+            WHERE master_id = p_master_id AND day = p_day
+            FOR UPDATE;
+
+            UPDATE master_availability
+            SET busy = master_availability_cells(p_master_id, p_day),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE master_id = p_master_id AND day = p_day;
+        END;
+        $$ language 'plpgsql';
+
+        CREATE OR REPLACE FUNCTION master_availability_trigger()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            affected RECORD;
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND OLD.master_id = NEW.master_id
+               AND OLD.appointment_datetime = NEW.appointment_datetime
+               AND OLD.duration_minutes = NEW.duration_minutes
+               AND OLD.status = NEW.status THEN
+                RETURN NULL;
+            END IF;
+
+            -- Дни старой и новой записи по возрастанию - одинаковый порядок блокировок
+            FOR affected IN
+                SELECT DISTINCT r.master_id, g.day::date AS day
+                FROM (
+                    SELECT OLD.master_id, OLD.appointment_datetime, OLD.duration_minutes
+                    WHERE TG_OP IN ('UPDATE', 'DELETE')
+                    UNION ALL
+                    SELECT NEW.master_id, NEW.appointment_datetime, NEW.duration_minutes
+                    WHERE TG_OP IN ('INSERT', 'UPDATE')
+                ) AS r(master_id, appointment_datetime, duration_minutes)
+                CROSS JOIN LATERAL generate_series(
+                    (r.appointment_datetime AT TIME ZONE '{zone}')::date,
+                    ((r.appointment_datetime AT TIME ZONE '{zone}')
+                      + INTERVAL '1 minute' * GREATEST(r.duration_minutes, 1) - INTERVAL '1 microsecond')::date,
+                    INTERVAL '1 day'
+                ) AS g(day)
+                ORDER BY r.master_id, day
+            LOOP
+                PERFORM master_availability_refresh(affected.master_id, affected.day);
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        DROP TRIGGER IF EXISTS orders_master_availability ON orders;
+        CREATE TRIGGER orders_master_availability
+            AFTER INSERT OR UPDATE OR DELETE ON orders
+            FOR EACH ROW
+            EXECUTE FUNCTION master_availability_trigger();
+        """
+        try:
+            previous_zone = None
+            if await self.db.fetchval("SELECT to_regproc('master_availability_zone') IS NOT NULL"):
+                previous_zone = await self.db.fetchval("SELECT master_availability_zone()")
+            await self.db.execute(query)
+            logger.info(f"Таблица master_availability создана или уже существует (пояс {zone})")
+        except Exception as e:
+            logger.error(f"Ошибка при создании таблицы master_availability: {e}")
+            raise
+
+        # Первичное заполнение по уже существующим заказам; после смены пояса
+        # хоста старые маски построены по другим суткам - пересчитываем
+        if previous_zone is not None and previous_zone != zone:
+            logger.warning(f"Пояс масок занятости сменился с {previous_zone} на {zone}, пересчет")
+            await self.rebuild()
+        elif not await self.db.fetchval("SELECT EXISTS (SELECT 1 FROM master_availability)"):
+            await self.rebuild()
+
+    async def get_days(
+            self,
+            master_ids: Iterable[int],
+            start: date,
+            end: date
+    ) -> Dict[Tuple[int, date], int]:
+        """Маски занятости мастеров за период [start, end]; нет строки - день свободен"""
+        query = """
+        SELECT master_id, day, busy
+        FROM master_availability
+        WHERE master_id = ANY($1::int[]) AND day BETWEEN $2 AND $3
+        """
+        master_ids = list(master_ids)
+        if not master_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, master_ids, start, end)
+            return {(master_id, day): busy.to_int('little') for master_id, day, busy in rows}
+        except Exception as e:
+            logger.error(f"Ошибка при получении занятости мастеров ({len(master_ids)} шт.): {e}")
+            raise
+
+    async def is_free(self, master_id: int, start: datetime, duration_minutes: int) -> bool:
+        """Свободен ли мастер весь интервал: пересечение масок по затронутым дням"""
+        query = """
+        SELECT day, busy
+        FROM master_availability
+        WHERE master_id = $1 AND day = ANY($2::date[])
+        """
+        masks = interval_masks(start, duration_minutes)
+        try:
+            rows = await self.db.fetch(query, master_id, list(masks))
+            return not any(busy.to_int('little') & masks[day] for day, busy in rows)
+        except Exception as e:
+            logger.error(f"Ошибка при проверке занятости мастера {master_id} на {start}: {e}")
+            raise
+
+    async def rebuild(self, since: Optional[date] = None) -> int:
+        """Пересчитывает занятость по таблице orders (все дни или начиная с since)"""
+        days_query = """
+        SELECT DISTINCT o.master_id, g.day::date
+        FROM orders o
+        CROSS JOIN LATERAL generate_series(
+            (o.appointment_datetime AT TIME ZONE master_availability_zone())::date,
+            ((o.appointment_datetime AT TIME ZONE master_availability_zone())
+              + INTERVAL '1 minute' * GREATEST(o.duration_minutes, 1) - INTERVAL '1 microsecond')::date,
+            INTERVAL '1 day'
+        ) AS g(day)
+        WHERE o.status NOT IN ('cancelled', 'no_show')
+        AND ($1::date IS NULL
+             OR o.appointment_datetime >= $1::date::timestamp AT TIME ZONE master_availability_zone() - INTERVAL '1 day')
+        """
+        query = """
+        INSERT INTO master_availability (master_id, day, busy)
+        SELECT d.master_id, d.day, master_availability_cells(d.master_id, d.day)
+        FROM unnest($1::int[], $2::date[]) AS d(master_id, day)
+        WHERE $3::date IS NULL OR d.day >= $3
+        ON CONFLICT (master_id, day) DO UPDATE
+        SET busy = EXCLUDED.busy, updated_at = CURRENT_TIMESTAMP
+        """
+        try:
+            async with self.db.get_connection() as conn:
+                async with conn.transaction():
+                    # Записи, созданные во время пересчета, подождут и пересчитают свои дни сами
+                    await conn.execute("LOCK TABLE master_availability IN EXCLUSIVE MODE")
+                    if since is None:
+                        await conn.execute("DELETE FROM master_availability")
+                    else:
+                        await conn.execute("DELETE FROM master_availability WHERE day >= $1", since)
+                    days = await conn.fetch(days_query, since)
+                    result = await conn.execute(
+                        query, [row[0] for row in days], [row[1] for row in days], since
+                    )
+            rows = int(result.split()[-1])
+            logger.info(f"Занятость мастеров пересчитана, дней: {rows}")
+            return rows
+        except Exception as e:
+            logger.error(f"Ошибка при пересчете занятости мастеров: {e}")
+            raise
+
+    async def find_inconsistencies(self, since: Optional[date] = None) -> List[Tuple[int, date]]:
+        """Дни, где сохраненная занятость расходится с пересчетом по orders"""
+        query = """
+        SELECT a.master_id, a.day
+        FROM master_availability a
+        WHERE ($1::date IS NULL OR a.day >= $1)
+        AND a.busy <> master_availability_cells(a.master_id, a.day)
+        UNION
+        SELECT o.master_id, (o.appointment_datetime AT TIME ZONE master_availability_zone())::date
+        FROM orders o
+        WHERE o.status NOT IN ('cancelled', 'no_show')
+        AND o.duration_minutes > 0
+        AND ($1::date IS NULL
+             OR o.appointment_datetime >= $1::date::timestamp AT TIME ZONE master_availability_zone())
+        AND NOT EXISTS (
+            SELECT 1 FROM master_availability a
+            WHERE a.master_id = o.master_id
+            AND a.day = (o.appointment_datetime AT TIME ZONE master_availability_zone())::date
+        )
+        ORDER BY 2, 1
+        """
+        try:
+            rows = await self.db.fetch(query, since)
+            mismatches = [(row[0], row[1]) for row in rows]
+            if mismatches:
+                logger.warning(f"Занятость мастеров расходится с заказами, дней: {len(mismatches)}")
+            return mismatches
+        except Exception as e:
+            logger.error(f"Ошибка при проверке занятости мастеров: {e}")
+            raise
@@ -0,0 +1,134 @@
+import logging
+from typing import List, Optional
+
+from src.config.Database import db
+from src.models.Broadcast import Broadcast, BroadcastStatus
+from src.utils.mapping import RowMapper
+
+logger = logging.getLogger(__name__)
+
+broadcast_mapper = RowMapper(Broadcast, {"status": BroadcastStatus})
+
+
+class BroadcastRepository:
+    """Репозиторий рассылок и их прогресса в PostgreSQL"""
+
+    def __init__(self, database=None):
+        self.db = database or db
+
+    async def create_table(self):
+        """Создает таблицу рассылок"""
+        query = """
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id SERIAL PRIMARY KEY,
+            text TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            sent_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            blocked_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status);
+
+        -- Триггер для автоматического обновления updated_at
+        DROP TRIGGER IF EXISTS update_broadcasts_updated_at ON broadcasts;
+        CREATE TRIGGER update_broadcasts_updated_at
+            BEFORE UPDATE ON broadcasts
+            FOR EACH ROW
+            EXECUTE FUNCTION update_updated_at_column();
+        """
+        try:
+            await self.db.execute(query)
+            logger.info("Таблица broadcasts создана или уже существует")
+        except Exception as e:
+            logger.error(f"Ошибка при создании таблицы broadcasts: {e}")
+            raise
+
+    async def create(self, text: str) -> Broadcast:
+        """Создает новую рассылку"""
+        query = """
+        INSERT INTO broadcasts (text)
+        VALUES ($1)
+        RETURNING id, text, status, last_user_id, sent_count, failed_count, blocked_count, created_at, updated_at
+        """
+        try:
+            row = await self.db.fetchrow(query, text)
+            return self._row_to_broadcast(row)
+        except Exception as e:
+            logger.error(f"Ошибка при создании рассылки: {e}")
+            raise
+
+    async def get_by_id(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Получает рассылку по ID"""
+        query = """
+        SELECT id, text, status, last_user_id, sent_count, failed_count, blocked_count, created_at, updated_at
+        FROM broadcasts
+        WHERE id = $1
+        """
+        try:
+            row = await self.db.fetchrow(query, broadcast_id)
+            return self._row_to_broadcast(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении рассылки {broadcast_id}: {e}")
+            raise
+
+    async def get_unfinished(self) -> List[Broadcast]:
+        """Рассылки, которые нужно (до)отправить после рестарта"""
+        query = """
+        SELECT id, text, status, last_user_id, sent_count, failed_count, blocked_count, created_at, updated_at
+        FROM broadcasts
+        WHERE status IN ('pending', 'running')
+        ORDER BY id
+        """
+        try:
+            rows = await self.db.fetch(query)
+            return broadcast_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при получении незавершенных рассылок: {e}")
+            raise
+
+    async def checkpoint(self, broadcast_id: int, last_user_id: int, sent: int, failed: int, blocked: int) -> bool:
+        """Сохраняет курсор и прибавляет счетчики обработанной порции"""
+        query = """
+        UPDATE broadcasts
+        SET last_user_id = $2,
+            sent_count = sent_count + $3,
+            failed_count = failed_count + $4,
+            blocked_count = blocked_count + $5
+        WHERE id = $1
+        """
+        try:
+            result = await self.db.execute(query, broadcast_id, last_user_id, sent, failed, blocked)
+            return result == "UPDATE 1"
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении прогресса рассылки {broadcast_id}: {e}")
+            raise
+
+    async def update_status(
+            self,
+            broadcast_id: int,
+            status: BroadcastStatus,
+            from_statuses: Optional[List[BroadcastStatus]] = None
+    ) -> bool:
+        """
+        Обновляет статус рассылки. С from_statuses - только если текущий
+        статус один из них (отмена не перетирает завершение и наоборот).
+        """
+        query = """
+        UPDATE broadcasts SET status = $2
+        WHERE id = $1 AND ($3::varchar[] IS NULL OR status = ANY($3::varchar[]))
+        """
+        allowed = [s.value for s in from_statuses] if from_statuses is not None else None
+        try:
+            result = await self.db.execute(query, broadcast_id, status.value, allowed)
+            return result == "UPDATE 1"
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статуса рассылки {broadcast_id}: {e}")
+            raise
+
+    def _row_to_broadcast(self, row) -> Broadcast:
+        """Преобразует строку БД в объект Broadcast"""
+        return broadcast_mapper(row)
@@ -0,0 +1,159 @@
+import dataclasses
+import functools
+import logging
+import os
+import pickle
+import tempfile
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional, Tuple, Type
+
+from src.config.Database import DatabaseUnavailableError
+from src.models.CatalogSnapshot import CatalogSnapshot
+from src.models.Service import Service
+from src.models.users.Master import Master
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Сигнатура и версия формата файла снимка
+SNAPSHOT_MAGIC = b"CATSNAP\x02"
+
+snapshot_reads_total = metrics.counter(
+    "catalog_snapshot_reads_total", "Чтений каталога из локального снимка при недоступной базе", ("query",)
+)
+
+
+
+def _encode_rows(model: Type, objects) -> Tuple[List[str], List[tuple]]:
+    """Объекты модели как имена полей и строки-кортежи"""
+    names = [f.name for f in dataclasses.fields(model)]
+    return names, [tuple(getattr(obj, name) for name in names) for obj in objects]
+
+
+def _decode_rows(model: Type, names: List[str], rows: List[tuple]) -> list:
+    """Строки-кортежи обратно в объекты; поля, которых в модели уже нет, пропускаются"""
+    known = {f.name for f in dataclasses.fields(model)}
+    columns = [(index, name) for index, name in enumerate(names) if name in known]
+    return [model(**{name: row[index] for index, name in columns}) for row in rows]
+
+
+# Обновление снимка читает только из базы - иначе снимок перезаписался бы сам собой
+snapshot_reads_allowed: ContextVar[bool] = ContextVar("snapshot_reads_allowed", default=True)
+
+
+class CatalogSnapshotRepository:
+    """
+    Снимок каталога в локальном файле - запасной источник чтений
+    услуг и мастеров, пока PostgreSQL недоступен, и источник теплого
+    старта: пока serving включен, каталог читается только из снимка.
+
+    Файл - сигнатура и pickle словаря: отметки времени и строки-кортежи
+    с именами полей. Классы моделей в файл не попадают, поэтому снимок
+    компактен и читается после изменения моделей (новое поле получит
+    значение по умолчанию).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = Path(path) if path else None
+        self.serving = False
+        self._snapshot: Optional[CatalogSnapshot] = None
+
+    @staticmethod
+    def encode(snapshot: CatalogSnapshot) -> bytes:
+        payload = {
+            "created_at": snapshot.created_at,
+            "services": _encode_rows(Service, snapshot.services.values()),
+            "masters": _encode_rows(Master, snapshot.masters.values()),
+        }
+        return SNAPSHOT_MAGIC + pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def decode(data: bytes) -> CatalogSnapshot:
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("неизвестный формат снимка каталога")
+        payload = pickle.loads(memoryview(data)[len(SNAPSHOT_MAGIC):])
+        services = _decode_rows(Service, *payload["services"])
+        masters = _decode_rows(Master, *payload["masters"])
+        return CatalogSnapshot(
+            services={service.id: service for service in services},
+            masters={master.id: master for master in masters},
+            created_at=payload["created_at"]
+        )
+
+    @property
+    def path(self) -> Path:
+        """Путь из окружения читается при первом обращении, после загрузки .env, а не при импорте"""
+        if self._path is None:
+            self._path = Path(os.getenv('CATALOG_SNAPSHOT_PATH', 'data/catalog_snapshot.bin'))
+        return self._path
+
+    def save(self, snapshot: CatalogSnapshot):
+        """
+        Атомарно записывает снимок: временный файл в том же каталоге и
+        os.replace, так что читатель видит либо старый, либо новый файл целиком.
+        """
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    file.write(self.encode(snapshot))
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            self._snapshot = snapshot
+            logger.info(f"Снимок каталога сохранен: услуг {len(snapshot.services)}, мастеров {len(snapshot.masters)}")
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении снимка каталога в {self.path}: {e}")
+            raise
+
+    def load(self) -> Optional[CatalogSnapshot]:
+        """Читает снимок из файла (синхронно, годится до запуска цикла событий); нет файла или он поврежден - None"""
+        try:
+            with open(self.path, "rb") as file:
+                snapshot = self.decode(file.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка при чтении снимка каталога {self.path}: {e}")
+            return None
+        self._snapshot = snapshot
+        return snapshot
+
+    def get(self) -> Optional[CatalogSnapshot]:
+        """Последний снимок: из памяти, а при первом обращении - из файла"""
+        return self._snapshot if self._snapshot is not None else self.load()
+
+
+def snapshot_fallback(query: str):
+    """
+    Метод репозитория каталога при недоступной базе (и во время теплого
+    старта) отвечает из снимка: query - имя метода CatalogSnapshot
+    с теми же аргументами. Без снимка ошибка пробрасывается как есть.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if catalog_snapshot_repo.serving and snapshot_reads_allowed.get():
+                snapshot = catalog_snapshot_repo.get()
+                if snapshot is not None:
+                    snapshot_reads_total.inc(query=query)
+                    return getattr(snapshot, query)(*args, **kwargs)
+            try:
+                return await method(self, *args, **kwargs)
+            except DatabaseUnavailableError:
+                snapshot = catalog_snapshot_repo.get() if snapshot_reads_allowed.get() else None
+                if snapshot is None:
+                    raise
+                snapshot_reads_total.inc(query=query)
+                return getattr(snapshot, query)(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Глобальный экземпляр
+catalog_snapshot_repo = CatalogSnapshotRepository()
@@ -1,13 +1,16 @@
 
 import logging
-from typing import Optional, List
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from src.config.Database import db
 from src.models.users.Customer import Customer
+from src.utils.mapping import RowMapper
 
 logger = logging.getLogger(__name__)
 
+customer_mapper = RowMapper(Customer)
+
 
 class CustomerRepository:
     """Репозиторий для работы с клиентами в PostgreSQL"""
@@ -31,6 +34,7 @@ class CustomerRepository:
         );
 
         CREATE INDEX IF NOT EXISTS idx_customers_telegram_id ON customers(telegram_id);
+        CREATE INDEX IF NOT EXISTS idx_customers_updated_at ON customers(updated_at);
 
         -- Триггер для автоматического обновления updated_at
         DROP TRIGGER IF EXISTS update_customers_updated_at ON customers;
@@ -82,6 +86,22 @@ class CustomerRepository:
             logger.error(f"Ошибка при получении клиента по ID {customer_id}: {e}")
             raise
 
+    async def get_by_ids(self, customer_ids: List[int]) -> Dict[int, Customer]:
+        """Получает клиентов по списку ID одним запросом (отсутствующих ID в словаре нет)"""
+        query = """
+        SELECT id, telegram_id, username, name, address, phone, email, created_at, updated_at
+        FROM customers
+        WHERE id = ANY($1::int[])
+        """
+        if not customer_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(customer_ids))
+            return {customer.id: customer for customer in customer_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении клиентов по ID ({len(customer_ids)} шт.): {e}")
+            raise
+
     async def get_by_telegram_id(self, telegram_id: int) -> Optional[Customer]:
         """Получает клиента по Telegram ID"""
         query = """
@@ -96,6 +116,22 @@ class CustomerRepository:
             logger.error(f"Ошибка при получении клиента по Telegram ID {telegram_id}: {e}")
             raise
 
+    async def get_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, Customer]:
+        """Получает клиентов по списку Telegram ID (ключ словаря - telegram_id)"""
+        query = """
+        SELECT id, telegram_id, username, name, address, phone, email, created_at, updated_at
+        FROM customers
+        WHERE telegram_id = ANY($1::bigint[])
+        """
+        if not telegram_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(telegram_ids))
+            return {customer.telegram_id: customer for customer in customer_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении клиентов по Telegram ID ({len(telegram_ids)} шт.): {e}")
+            raise
+
     async def get_all(self) -> List[Customer]:
         """Получает всех клиентов"""
         query = """
@@ -105,11 +141,26 @@ class CustomerRepository:
         """
         try:
             rows = await self.db.fetch(query)
-            return [self._row_to_customer(row) for row in rows]
+            return customer_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении всех клиентов: {e}")
             raise
 
+    async def get_changed_since(self, since: Optional[datetime]) -> List[Customer]:
+        """Клиенты, созданные или измененные начиная с since (включительно); None - все"""
+        query = """
+        SELECT id, telegram_id, username, name, address, phone, email, created_at, updated_at
+        FROM customers
+        WHERE $1::timestamptz IS NULL OR updated_at >= $1
+        ORDER BY updated_at
+        """
+        try:
+            rows = await self.db.fetch(query, since)
+            return customer_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при получении клиентов, измененных с {since}: {e}")
+            raise
+
     async def update(self, customer: Customer) -> Customer:
         """Обновляет данные клиента"""
         query = """
@@ -148,14 +199,4 @@ class CustomerRepository:
         """Преобразует строку БД в объект Customer"""
         if row is None:
             return None
-
-        return Customer(
-            id=row['id'],
-            telegram_id=row['telegram_id'],
-            username=row['username'],
-            name=row['name'],
-            address=row['address'],
-            phone=row['phone'],
-            email=row['email'],
-            created_at=row['created_at']
-        )
+        return customer_mapper(row)
@@ -1,13 +1,37 @@
 import logging
-from decimal import Decimal
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from src.config.Database import db
+from src.config.Database import db, replica_read
 from src.models.users.Master import Master
 from src.models.Service import Service
+from src.repository.CatalogSnapshotRepository import snapshot_fallback
+from src.repository.ServiceRepository import service_mapper
+from src.utils.mapping import RowMapper, format_hhmm
 
 logger = logging.getLogger(__name__)
 
+# Преобразование строк по позициям колонок; service_ids заполняется, если есть в выборке
+master_mapper = RowMapper(Master, {
+    "rating": lambda value: float(value) if value else 0.0,
+    "working_hours_start": format_hhmm,
+    "working_hours_end": format_hhmm,
+})
+
+# Недельный график в master_working_hours из masters.working_* (для указанных мастеров)
+SYNC_WORKING_HOURS_QUERY = """
+INSERT INTO master_working_hours (master_id, weekday, start_minute, end_minute)
+SELECT m.id, day::smallint,
+       EXTRACT(HOUR FROM m.working_hours_start) * 60 + EXTRACT(MINUTE FROM m.working_hours_start),
+       EXTRACT(HOUR FROM m.working_hours_end) * 60 + EXTRACT(MINUTE FROM m.working_hours_end)
+FROM masters m
+CROSS JOIN LATERAL unnest(string_to_array(m.working_days, ',')) AS day
+WHERE m.id = ANY($1::int[])
+  AND m.working_hours_end > m.working_hours_start
+  AND day ~ '^[1-7]$'
+ON CONFLICT DO NOTHING
+"""
+
 
 class MasterRepository():
     """Репозиторий для работы с мастерами в PostgreSQL"""
@@ -47,6 +71,7 @@ class MasterRepository():
         CREATE INDEX IF NOT EXISTS idx_masters_telegram_id ON masters(telegram_id);
         CREATE INDEX IF NOT EXISTS idx_masters_is_active ON masters(is_active);
         CREATE INDEX IF NOT EXISTS idx_masters_specialization ON masters(specialization);
+        CREATE INDEX IF NOT EXISTS idx_masters_updated_at ON masters(updated_at);
         CREATE INDEX IF NOT EXISTS idx_master_services_master_id ON master_services(master_id);
         CREATE INDEX IF NOT EXISTS idx_master_services_service_id ON master_services(service_id);
 
@@ -56,6 +81,22 @@ class MasterRepository():
             BEFORE UPDATE ON masters
             FOR EACH ROW
             EXECUTE FUNCTION update_updated_at_column();
+
+        -- Изменение списка услуг сдвигает updated_at мастера, чтобы его увидела синхронизация
+        CREATE OR REPLACE FUNCTION touch_master_on_services_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE masters SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.master_id ELSE NEW.master_id END;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        DROP TRIGGER IF EXISTS master_services_touch_master ON master_services;
+        CREATE TRIGGER master_services_touch_master
+            AFTER INSERT OR DELETE ON master_services
+            FOR EACH ROW
+            EXECUTE FUNCTION touch_master_on_services_change();
         """
         try:
             await self.db.execute(query)
@@ -76,63 +117,88 @@ class MasterRepository():
                  working_hours_end, working_days, created_at, updated_at
         """
         try:
-            row = await self.db.fetchrow(
-                query,
-                master.telegram_id,
-                master.username,
-                master.name,
-                master.phone,
-                master.email,
-                master.specialization,
-                master.experience_years,
-                master.rating,
-                master.is_active,
-                master.working_hours_start,
-                master.working_hours_end,
-                master.working_days
-            )
-            created_master = self._row_to_master(row)
-
-            # Добавляем услуги мастеру
-            if master.service_ids:
-                for service_id in master.service_ids:
-                    await self.add_service_to_master(created_master.id, service_id)
-                created_master.service_ids = master.service_ids
+            # Мастер, его график и услуги записываются одной транзакцией
+            async with self.db.transaction() as conn:
+                row = await conn.fetchrow(
+                    query,
+                    master.telegram_id,
+                    master.username,
+                    master.name,
+                    master.phone,
+                    master.email,
+                    master.specialization,
+                    master.experience_years,
+                    master.rating,
+                    master.is_active,
+                    master.working_hours_start,
+                    master.working_hours_end,
+                    master.working_days
+                )
+                await self._sync_working_hours(conn, row['id'])
+                created_master = self._row_to_master(row)
+
+                # Добавляем услуги мастеру
+                if master.service_ids:
+                    for service_id in master.service_ids:
+                        await self.add_service_to_master(created_master.id, service_id)
+                    created_master.service_ids = master.service_ids
 
             return created_master
         except Exception as e:
             logger.error(f"Ошибка при создании мастера: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("master_by_id")
     async def get_by_id(self, master_id: int) -> Optional[Master]:
         """Получает мастера по ID"""
+        # Услуги мастера забираем тем же запросом, без второго обращения к БД
         query = """
-        SELECT id, telegram_id, username, name, phone, email, specialization, 
-               experience_years, rating, is_active, working_hours_start, 
-               working_hours_end, working_days, created_at, updated_at
-        FROM masters
-        WHERE id = $1
+        SELECT m.id, m.telegram_id, m.username, m.name, m.phone, m.email, m.specialization, 
+               m.experience_years, m.rating, m.is_active, m.working_hours_start, 
+               m.working_hours_end, m.working_days, m.created_at, m.updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = m.id) AS service_ids
+        FROM masters m
+        WHERE m.id = $1
         """
         try:
             row = await self.db.fetchrow(query, master_id)
             if not row:
                 return None
 
-            master = self._row_to_master(row)
-            # Получаем услуги мастера
-            service_ids = await self._get_master_service_ids(master_id)
-            master.service_ids = service_ids
-            return master
+            return master_mapper(row)
         except Exception as e:
             logger.error(f"Ошибка при получении мастера по ID {master_id}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("masters_by_ids")
+    async def get_by_ids(self, master_ids: List[int]) -> Dict[int, Master]:
+        """Получает мастеров по списку ID одним запросом (отсутствующих ID в словаре нет)"""
+        query = """
+        SELECT m.id, m.telegram_id, m.username, m.name, m.phone, m.email, m.specialization, 
+               m.experience_years, m.rating, m.is_active, m.working_hours_start, 
+               m.working_hours_end, m.working_days, m.created_at, m.updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = m.id) AS service_ids
+        FROM masters m
+        WHERE m.id = ANY($1::int[])
+        """
+        if not master_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(master_ids))
+            return {master.id: master for master in master_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении мастеров по ID ({len(master_ids)} шт.): {e}")
+            raise
+
     async def get_by_telegram_id(self, telegram_id: int) -> Optional[Master]:
         """Получает мастера по Telegram ID"""
         query = """
         SELECT id, telegram_id, username, name, phone, email, specialization, 
                experience_years, rating, is_active, working_hours_start, 
-               working_hours_end, working_days, created_at, updated_at
+               working_hours_end, working_days, created_at, updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = masters.id) AS service_ids
         FROM masters
         WHERE telegram_id = $1
         """
@@ -141,65 +207,78 @@ class MasterRepository():
             if not row:
                 return None
 
-            master = self._row_to_master(row)
-            service_ids = await self._get_master_service_ids(master.id)
-            master.service_ids = service_ids
-            return master
+            return master_mapper(row)
         except Exception as e:
             logger.error(f"Ошибка при получении мастера по Telegram ID {telegram_id}: {e}")
             raise
 
+    async def get_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, Master]:
+        """Получает мастеров по списку Telegram ID (ключ словаря - telegram_id)"""
+        query = """
+        SELECT m.id, m.telegram_id, m.username, m.name, m.phone, m.email, m.specialization, 
+               m.experience_years, m.rating, m.is_active, m.working_hours_start, 
+               m.working_hours_end, m.working_days, m.created_at, m.updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = m.id) AS service_ids
+        FROM masters m
+        WHERE m.telegram_id = ANY($1::bigint[])
+        """
+        if not telegram_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(telegram_ids))
+            return {master.telegram_id: master for master in master_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении мастеров по Telegram ID ({len(telegram_ids)} шт.): {e}")
+            raise
+
+    @replica_read
+    @snapshot_fallback("all_masters")
     async def get_all(self) -> List[Master]:
         """Получает всех мастеров"""
         query = """
         SELECT id, telegram_id, username, name, phone, email, specialization, 
                experience_years, rating, is_active, working_hours_start, 
-               working_hours_end, working_days, created_at, updated_at
+               working_hours_end, working_days, created_at, updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = masters.id) AS service_ids
         FROM masters
         ORDER BY name
         """
         try:
             rows = await self.db.fetch(query)
-            masters = []
-            for row in rows:
-                master = self._row_to_master(row)
-                service_ids = await self._get_master_service_ids(master.id)
-                master.service_ids = service_ids
-                masters.append(master)
-            return masters
+            return master_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении всех мастеров: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("active_masters")
     async def get_active_masters(self) -> List[Master]:
         """Получает только активных мастеров"""
         query = """
         SELECT id, telegram_id, username, name, phone, email, specialization, 
                experience_years, rating, is_active, working_hours_start, 
-               working_hours_end, working_days, created_at, updated_at
+               working_hours_end, working_days, created_at, updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = masters.id) AS service_ids
         FROM masters
         WHERE is_active = TRUE
         ORDER BY rating DESC, name
         """
         try:
             rows = await self.db.fetch(query)
-            masters = []
-            for row in rows:
-                master = self._row_to_master(row)
-                service_ids = await self._get_master_service_ids(master.id)
-                master.service_ids = service_ids
-                masters.append(master)
-            return masters
+            return master_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении активных мастеров: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("masters_by_service")
     async def get_by_service(self, service_id: int) -> List[Master]:
         """Получает мастеров, оказывающих определённую услугу"""
         query = """
         SELECT m.id, m.telegram_id, m.username, m.name, m.phone, m.email, m.specialization, 
                m.experience_years, m.rating, m.is_active, m.working_hours_start, 
-               m.working_hours_end, m.working_days, m.created_at, m.updated_at
+               m.working_hours_end, m.working_days, m.created_at, m.updated_at,
+               ARRAY(SELECT sm.service_id FROM master_services sm WHERE sm.master_id = m.id) AS service_ids
         FROM masters m
         INNER JOIN master_services ms ON m.id = ms.master_id
         WHERE ms.service_id = $1 AND m.is_active = TRUE
@@ -207,40 +286,49 @@ class MasterRepository():
         """
         try:
             rows = await self.db.fetch(query, service_id)
-            masters = []
-            for row in rows:
-                master = self._row_to_master(row)
-                service_ids = await self._get_master_service_ids(master.id)
-                master.service_ids = service_ids
-                masters.append(master)
-            return masters
+            return master_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении мастеров по услуге {service_id}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("masters_by_specialization")
     async def get_by_specialization(self, specialization: str) -> List[Master]:
         """Получает мастеров по специализации"""
         query = """
         SELECT id, telegram_id, username, name, phone, email, specialization, 
                experience_years, rating, is_active, working_hours_start, 
-               working_hours_end, working_days, created_at, updated_at
+               working_hours_end, working_days, created_at, updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = masters.id) AS service_ids
         FROM masters
         WHERE specialization ILIKE $1 AND is_active = TRUE
         ORDER BY rating DESC, experience_years DESC
         """
         try:
             rows = await self.db.fetch(query, f"%{specialization}%")
-            masters = []
-            for row in rows:
-                master = self._row_to_master(row)
-                service_ids = await self._get_master_service_ids(master.id)
-                master.service_ids = service_ids
-                masters.append(master)
-            return masters
+            return master_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении мастеров по специализации {specialization}: {e}")
             raise
 
+    async def get_changed_since(self, since: Optional[datetime]) -> List[Master]:
+        """Мастера, измененные начиная с since (включительно), вместе с услугами; None - все"""
+        query = """
+        SELECT id, telegram_id, username, name, phone, email, specialization,
+               experience_years, rating, is_active, working_hours_start,
+               working_hours_end, working_days, created_at, updated_at,
+               ARRAY(SELECT ms.service_id FROM master_services ms WHERE ms.master_id = masters.id) AS service_ids
+        FROM masters
+        WHERE $1::timestamptz IS NULL OR updated_at >= $1
+        ORDER BY updated_at
+        """
+        try:
+            rows = await self.db.fetch(query, since)
+            return master_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при получении мастеров, измененных с {since}: {e}")
+            raise
+
     async def update(self, master: Master) -> Master:
         """Обновляет данные мастера"""
         query = """
@@ -254,22 +342,25 @@ class MasterRepository():
                  working_hours_end, working_days, created_at, updated_at
         """
         try:
-            row = await self.db.fetchrow(
-                query,
-                master.id,
-                master.telegram_id,
-                master.username,
-                master.name,
-                master.phone,
-                master.email,
-                master.specialization,
-                master.experience_years,
-                master.rating,
-                master.is_active,
-                master.working_hours_start,
-                master.working_hours_end,
-                master.working_days
-            )
+            async with self.db.transaction() as conn:
+                row = await conn.fetchrow(
+                    query,
+                    master.id,
+                    master.telegram_id,
+                    master.username,
+                    master.name,
+                    master.phone,
+                    master.email,
+                    master.specialization,
+                    master.experience_years,
+                    master.rating,
+                    master.is_active,
+                    master.working_hours_start,
+                    master.working_hours_end,
+                    master.working_days
+                )
+                if row:
+                    await self._sync_working_hours(conn, master.id)
             return self._row_to_master(row) if row else master
         except Exception as e:
             logger.error(f"Ошибка при обновлении мастера {master.id}: {e}")
@@ -309,6 +400,8 @@ class MasterRepository():
             logger.error(f"Ошибка при удалении услуги {service_id} у мастера {master_id}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("master_services")
     async def get_master_services(self, master_id: int) -> List[Service]:
         """Получает все услуги мастера"""
         query = """
@@ -321,52 +414,20 @@ class MasterRepository():
         """
         try:
             rows = await self.db.fetch(query, master_id)
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении услуг мастера {master_id}: {e}")
             raise
 
-    async def _get_master_service_ids(self, master_id: int) -> List[int]:
-        """Получает ID услуг мастера"""
-        query = "SELECT service_id FROM master_services WHERE master_id = $1"
-        try:
-            rows = await self.db.fetch(query, master_id)
-            return [row['service_id'] for row in rows]
-        except Exception as e:
-            logger.error(f"Ошибка при получении ID услуг мастера {master_id}: {e}")
-            return []
+    async def _sync_working_hours(self, conn, master_id: int):
+        """Пересобирает недельный график мастера из только что записанных колонок"""
+        await conn.execute("DELETE FROM master_working_hours WHERE master_id = $1", master_id)
+        await conn.execute(SYNC_WORKING_HOURS_QUERY, [master_id])
 
     def _row_to_master(self, row) -> Master:
         """Преобразует строку БД в объект Master"""
-        return Master(
-            id=row['id'],
-            telegram_id=row['telegram_id'],
-            username=row['username'],
-            name=row['name'],
-            phone=row['phone'],
-            email=row['email'],
-            specialization=row['specialization'],
-            experience_years=row['experience_years'],
-            rating=float(row['rating']) if row['rating'] else 0.0,
-            is_active=row['is_active'],
-            working_hours_start=row['working_hours_start'].strftime('%H:%M') if row['working_hours_start'] else None,
-            working_hours_end=row['working_hours_end'].strftime('%H:%M') if row['working_hours_end'] else None,
-            working_days=row['working_days'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        )
+        return master_mapper(row)
 
     def _row_to_service(self, row) -> Service:
         """Преобразует строку БД в объект Service"""
-        return Service(
-            id=row['id'],
-            name=row['name'],
-            description=row['description'],
-            category=row['category'],
-            subcategory=row['subcategory'],
-            price=Decimal(str(row['price'])),
-            duration_minutes=row['duration_minutes'],
-            is_active=row['is_active'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        )
\ No newline at end of file
+        return service_mapper(row)
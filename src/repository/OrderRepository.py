@@ -1,25 +1,43 @@
+import gzip
 import logging
-from decimal import Decimal
-from typing import List, Optional
-from datetime import datetime, date, timedelta
+import os
+from contextlib import suppress
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from datetime import datetime, date, timedelta, timezone
 
-from src.config.Database import db
+from src.config.Database import db, replica_read
 from src.models.Order import Order, OrderStatus
+from src.repository.AvailabilityRepository import AvailabilityRepository
+from src.utils.dates import add_months, month_start
+from src.utils.mapping import RecordView, RowMapper
 
 logger = logging.getLogger(__name__)
 
+order_mapper = RowMapper(Order, {"status": OrderStatus})
+
+# Пространство ключей pg_advisory_xact_lock для блокировки расписания мастера
+MASTER_SLOT_LOCK = 1
+
+
+class SlotTakenError(Exception):
+    """Время мастера уже занято другой записью"""
+
 
 class OrderRepository:
     """Репозиторий для работы с заказами в PostgreSQL"""
 
     def __init__(self, database=None):
         self.db = database or db
+        self.availability_repo = AvailabilityRepository(self.db)
 
     async def create_table(self):
-        """Создает таблицу заказов"""
+        """
+        Создает таблицу заказов, секционированную по месяцам appointment_datetime.
+        Старая несекционированная таблица orders переносится автоматически.
+        """
         query = """
         CREATE TABLE IF NOT EXISTS orders (
-            id SERIAL PRIMARY KEY,
+            id SERIAL,
             user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
             master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
             service_id INTEGER NOT NULL REFERENCES services(id) ON DELETE CASCADE,
@@ -31,15 +49,17 @@ class OrderRepository:
             client_name VARCHAR(255),
             client_phone VARCHAR(20),
             created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        );
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, appointment_datetime)
+        ) PARTITION BY RANGE (appointment_datetime);
+
+        -- Секция для записей вне созданных месяцев, чтобы вставка никогда не падала
+        CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT;
 
-        CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);
-        CREATE INDEX IF NOT EXISTS idx_orders_master_id ON orders(master_id);
-        CREATE INDEX IF NOT EXISTS idx_orders_service_id ON orders(service_id);
-        CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
-        CREATE INDEX IF NOT EXISTS idx_orders_appointment_datetime ON orders(appointment_datetime);
-        CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+        -- Составные индексы вместо шести одиночных: каждая вставка обновляет меньше деревьев
+        CREATE INDEX IF NOT EXISTS idx_orders_master_appointment ON orders(master_id, appointment_datetime);
+        CREATE INDEX IF NOT EXISTS idx_orders_user_appointment ON orders(user_id, appointment_datetime);
+        CREATE INDEX IF NOT EXISTS idx_orders_status_appointment ON orders(status, appointment_datetime);
 
         -- Триггер для автоматического обновления updated_at
         DROP TRIGGER IF EXISTS update_orders_updated_at ON orders;
@@ -47,16 +67,301 @@ class OrderRepository:
             BEFORE UPDATE ON orders
             FOR EACH ROW
             EXECUTE FUNCTION update_updated_at_column();
+
+        -- Токены идемпотентности: уникальный индекс на секционированной orders
+        -- обязан включать appointment_datetime, поэтому токены живут отдельно
+        CREATE TABLE IF NOT EXISTS order_client_tokens (
+            client_token VARCHAR(64) PRIMARY KEY,
+            order_id INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
         """
         try:
-            await self.db.execute(query)
+            async with self.db.get_connection() as conn:
+                async with conn.transaction():
+                    relkind = await conn.fetchval(
+                        "SELECT relkind FROM pg_class WHERE oid = to_regclass('orders')"
+                    )
+                    if relkind == 'r':
+                        await conn.execute("ALTER TABLE orders RENAME TO orders_legacy")
+                    await conn.execute(query)
+                    if relkind == 'r':
+                        await self._migrate_legacy_orders(conn)
             logger.info("Таблица orders создана или уже существует")
         except Exception as e:
             logger.error(f"Ошибка при создании таблицы orders: {e}")
             raise
 
-    async def create(self, order: Order) -> Order:
-        """Создает новый заказ"""
+        await self.ensure_partitions()
+        await self.create_stats_table()
+
+    async def _migrate_legacy_orders(self, conn):
+        """Переносит заказы из старой несекционированной таблицы в секции"""
+        bounds = await conn.fetchrow(
+            "SELECT MIN(appointment_datetime) AS first, MAX(appointment_datetime) AS last FROM orders_legacy"
+        )
+        if bounds['first']:
+            month = month_start(bounds['first'])
+            while month <= bounds['last']:
+                await conn.execute(self._partition_ddl(month))
+                month = add_months(month, 1)
+
+        result = await conn.execute("""
+        INSERT INTO orders (id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+                            total_price, status, notes, client_name, client_phone, created_at, updated_at)
+        SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+               total_price, status, notes, client_name, client_phone, created_at, updated_at
+        FROM orders_legacy
+        """)
+        await conn.execute("""
+        SELECT setval(pg_get_serial_sequence('orders', 'id'), COALESCE((SELECT MAX(id) FROM orders), 0) + 1, false)
+        """)
+        await conn.execute("DROP TABLE orders_legacy")
+        logger.info(f"Заказы перенесены в секционированную таблицу: {result}")
+
+    @staticmethod
+    def _partition_name(month: datetime) -> str:
+        return f"orders_p{month.year:04d}_{month.month:02d}"
+
+    def _partition_ddl(self, month: datetime) -> str:
+        next_month = add_months(month, 1)
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self._partition_name(month)} PARTITION OF orders "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+
+    async def _create_partition(self, conn, month: datetime):
+        """
+        Создает секцию месяца. Записи этого месяца, успевшие попасть в
+        orders_default (запись дальше созданных секций), переносятся в
+        новую секцию в той же транзакции - иначе CREATE ... PARTITION OF
+        падает на ограничении секции по умолчанию.
+        """
+        name = self._partition_name(month)
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name):
+            return
+        next_month = add_months(month, 1)
+        stray = await conn.fetchval(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM orders_default
+                WHERE appointment_datetime >= $1 AND appointment_datetime < $2
+            )
+            """,
+            month, next_month
+        )
+        if not stray:
+            await conn.execute(self._partition_ddl(month))
+            return
+
+        # Новые записи в orders_default до коммита не появятся
+        await conn.execute("LOCK TABLE orders_default IN SHARE ROW EXCLUSIVE MODE")
+        await conn.execute("CREATE TEMP TABLE orders_moved (LIKE orders) ON COMMIT DROP")
+        await conn.execute(
+            """
+            WITH moved AS (
+                DELETE FROM orders_default
+                WHERE appointment_datetime >= $1 AND appointment_datetime < $2
+                RETURNING *
+            )
+            INSERT INTO orders_moved SELECT * FROM moved
+            """,
+            month, next_month
+        )
+        await conn.execute(self._partition_ddl(month))
+        result = await conn.execute("INSERT INTO orders SELECT * FROM orders_moved")
+        await conn.execute("DROP TABLE orders_moved")
+        logger.info(f"Секция {name}: перенесено из orders_default {result.split()[-1]} заказов")
+
+    async def ensure_partitions(self, months_ahead: int = 3) -> List[str]:
+        """
+        Создает месячные секции с текущего месяца на months_ahead вперед
+        и для всех месяцев, записи которых лежат в orders_default (и более
+        поздних, и прошедших - иначе их не заархивировать), перенося записи.
+        """
+        month = month_start(datetime.now(timezone.utc))
+        months = {add_months(month, offset) for offset in range(months_ahead + 1)}
+        try:
+            stray = await self.db.fetch(
+                "SELECT DISTINCT date_trunc('month', appointment_datetime AT TIME ZONE 'UTC') AS month "
+                "FROM orders_default"
+            )
+            months.update(month_start(row['month']) for row in stray)
+
+            created = []
+            for month in sorted(months):
+                async with self.db.transaction() as conn:
+                    await self._create_partition(conn, month)
+                created.append(self._partition_name(month))
+            return created
+        except Exception as e:
+            logger.error(f"Ошибка при создании секций заказов: {e}")
+            raise
+
+    async def get_partitions(self) -> List[Tuple[str, datetime]]:
+        """Возвращает месячные секции orders и начало их месяца, по возрастанию"""
+        query = """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'orders'::regclass
+        ORDER BY c.relname
+        """
+        try:
+            rows = await self.db.fetch(query)
+            partitions = []
+            for row in rows:
+                name = row['relname']
+                if name.startswith('orders_p'):
+                    year, month = name[len('orders_p'):].split('_')
+                    partitions.append((name, datetime(int(year), int(month), 1, tzinfo=timezone.utc)))
+            return partitions
+        except Exception as e:
+            logger.error(f"Ошибка при получении секций заказов: {e}")
+            raise
+
+    async def archive_partitions(self, older_than: datetime, directory: str) -> List[str]:
+        """
+        Выгружает месячные секции, целиком лежащие раньше older_than,
+        в сжатый CSV (name.csv.gz), затем отсоединяет и удаляет их.
+        Все в одной транзакции: если выгрузка не удалась, секция остается
+        на месте и архивируется при следующем проходе.
+        Дневной агрегат order_stats_daily при этом сохраняет историю.
+        """
+        os.makedirs(directory, exist_ok=True)
+        archived = []
+        for name, month in await self.get_partitions():
+            if add_months(month, 1) > older_than:
+                continue
+
+            path = os.path.join(directory, f"{name}.csv.gz")
+            tmp_path = f"{path}.tmp"
+            try:
+                async with self.db.transaction() as conn:
+                    # Запись в секцию на время выгрузки запрещена, чтение - нет
+                    await conn.execute(f"LOCK TABLE {name} IN SHARE MODE")
+                    with gzip.open(tmp_path, 'wb') as archive:
+                        async def write_chunk(chunk: bytes):
+                            archive.write(chunk)
+
+                        await conn.copy_from_table(name, output=write_chunk, format='csv', header=True)
+                    os.replace(tmp_path, path)
+
+                    # Блокировка orders на DETACH держится только до коммита
+                    await conn.execute(f"ALTER TABLE orders DETACH PARTITION {name}")
+                    await conn.execute(f"DROP TABLE {name}")
+                archived.append(path)
+                logger.info(f"Секция {name} заархивирована в {path}")
+            except Exception as e:
+                logger.error(f"Ошибка при архивации секции {name}: {e}")
+                with suppress(FileNotFoundError):
+                    os.remove(tmp_path)
+                raise
+        return archived
+
+    async def create_stats_table(self):
+        """
+        Создает дневной агрегат заказов order_stats_daily.
+        Агрегат поддерживается триггером на orders, поэтому статистика
+        за любой период читается за O(дней), а не сканированием заказов.
+        """
+        query = """
+        CREATE TABLE IF NOT EXISTS order_stats_daily (
+            day DATE NOT NULL,
+            master_id INTEGER NOT NULL,
+            service_id INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+            PRIMARY KEY (day, master_id, service_id, status)
+        );
+
+        CREATE OR REPLACE FUNCTION order_stats_daily_apply(
+            p_day DATE, p_master_id INTEGER, p_service_id INTEGER, p_status VARCHAR,
+            p_count INTEGER, p_revenue DECIMAL
+        ) RETURNS VOID AS $$
+        BEGIN
+            INSERT INTO order_stats_daily (day, master_id, service_id, status, orders_count, revenue)
+            VALUES (p_day, p_master_id, p_service_id, p_status, p_count, p_revenue)
+            ON CONFLICT (day, master_id, service_id, status) DO UPDATE
+            SET orders_count = order_stats_daily.orders_count + EXCLUDED.orders_count,
+                revenue = order_stats_daily.revenue + EXCLUDED.revenue;
+        END;
+        $$ language 'plpgsql';
+
+        CREATE OR REPLACE FUNCTION order_stats_daily_trigger()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND OLD.created_at IS NOT DISTINCT FROM NEW.created_at
+               AND OLD.master_id = NEW.master_id
+               AND OLD.service_id = NEW.service_id
+               AND OLD.status = NEW.status
+               AND OLD.total_price = NEW.total_price THEN
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM order_stats_daily_apply(
+                    OLD.created_at::date, OLD.master_id, OLD.service_id, OLD.status, -1, -OLD.total_price
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM order_stats_daily_apply(
+                    NEW.created_at::date, NEW.master_id, NEW.service_id, NEW.status, 1, NEW.total_price
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        DROP TRIGGER IF EXISTS orders_stats_daily ON orders;
+        CREATE TRIGGER orders_stats_daily
+            AFTER INSERT OR UPDATE OR DELETE ON orders
+            FOR EACH ROW
+            EXECUTE FUNCTION order_stats_daily_trigger();
+
+        -- Первичное заполнение агрегата по уже существующим заказам
+        INSERT INTO order_stats_daily (day, master_id, service_id, status, orders_count, revenue)
+        SELECT created_at::date, master_id, service_id, status, COUNT(*), SUM(total_price)
+        FROM orders
+        WHERE NOT EXISTS (SELECT 1 FROM order_stats_daily)
+        GROUP BY created_at::date, master_id, service_id, status;
+        """
+        try:
+            await self.db.execute(query)
+            logger.info("Таблица order_stats_daily создана или уже существует")
+        except Exception as e:
+            logger.error(f"Ошибка при создании таблицы order_stats_daily: {e}")
+            raise
+
+    async def rebuild_stats(self) -> int:
+        """Полностью пересчитывает дневной агрегат по таблице orders"""
+        query = """
+        INSERT INTO order_stats_daily (day, master_id, service_id, status, orders_count, revenue)
+        SELECT created_at::date, master_id, service_id, status, COUNT(*), SUM(total_price)
+        FROM orders
+        GROUP BY created_at::date, master_id, service_id, status
+        """
+        try:
+            async with self.db.transaction() as conn:
+                # Триггеры параллельных заказов подождут и применят свои дельты поверх пересчета
+                await conn.execute("LOCK TABLE order_stats_daily IN EXCLUSIVE MODE")
+                await conn.execute("DELETE FROM order_stats_daily")
+                result = await conn.execute(query)
+            rows = int(result.split()[-1])
+            logger.info(f"Агрегат order_stats_daily пересчитан, строк: {rows}")
+            return rows
+        except Exception as e:
+            logger.error(f"Ошибка при пересчете order_stats_daily: {e}")
+            raise
+
+    async def create(self, order: Order, client_token: Optional[str] = None) -> Order:
+        """
+        Создает новый заказ.
+        С client_token операция идемпотентна: повтор с тем же токеном
+        возвращает уже созданный заказ вместо нового.
+        """
         query = """
         INSERT INTO orders (user_id, master_id, service_id, appointment_datetime, 
                           duration_minutes, total_price, status, notes, client_name, client_phone)
@@ -64,25 +369,96 @@ class OrderRepository:
         RETURNING id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
                  total_price, status, notes, client_name, client_phone, created_at, updated_at
         """
+        values = (
+            order.user_id,
+            order.master_id,
+            order.service_id,
+            order.appointment_datetime,
+            order.duration_minutes,
+            order.total_price,
+            order.status.value,
+            order.notes,
+            order.client_name,
+            order.client_phone
+        )
         try:
-            row = await self.db.fetchrow(
-                query,
-                order.user_id,
-                order.master_id,
-                order.service_id,
-                order.appointment_datetime,
-                order.duration_minutes,
-                order.total_price,
-                order.status.value,
-                order.notes,
-                order.client_name,
-                order.client_phone
-            )
-            return self._row_to_order(row)
+            if client_token is None:
+                row = await self.db.fetchrow(query, *values)
+                return self._row_to_order(row)
+            return await self._create_idempotent(client_token, values)
         except Exception as e:
             logger.error(f"Ошибка при создании заказа: {e}")
             raise
 
+    async def _create_idempotent(self, client_token: str, values: tuple) -> Order:
+        # Параллельная вставка того же токена ждет на первичном ключе,
+        # пока первая транзакция не завершится, и затем получает её заказ
+        claim_query = """
+        INSERT INTO order_client_tokens (client_token, order_id)
+        VALUES ($1, nextval(pg_get_serial_sequence('orders', 'id')))
+        ON CONFLICT (client_token) DO NOTHING
+        RETURNING order_id
+        """
+        insert_query = """
+        INSERT INTO orders (id, user_id, master_id, service_id, appointment_datetime,
+                          duration_minutes, total_price, status, notes, client_name, client_phone)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        RETURNING id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+                 total_price, status, notes, client_name, client_phone, created_at, updated_at
+        """
+        existing_query = """
+        SELECT o.id, o.user_id, o.master_id, o.service_id, o.appointment_datetime, o.duration_minutes,
+               o.total_price, o.status, o.notes, o.client_name, o.client_phone, o.created_at, o.updated_at
+        FROM order_client_tokens t
+        JOIN orders o ON o.id = t.order_id
+        WHERE t.client_token = $1
+        """
+        async with self.db.transaction() as conn:
+            order_id = await conn.fetchval(claim_query, client_token)
+            if order_id is None:
+                row = await conn.fetchrow(existing_query, client_token)
+                if row is None:
+                    raise ValueError(f"Заказ для токена {client_token} не найден")
+                logger.info(f"Повторное создание заказа по токену {client_token}, возвращаем заказ {row['id']}")
+            else:
+                row = await conn.fetchrow(insert_query, order_id, *values)
+        return self._row_to_order(row)
+
+    async def create_in_slot(self, order: Order, client_token: Optional[str] = None) -> Order:
+        """
+        Создает заказ, только если время мастера свободно, иначе SlotTakenError.
+        Проверка (по маскам занятости) и вставка идут под транзакционной
+        блокировкой мастера: параллельная запись к тому же мастеру ждет
+        фиксации и видит маски, уже пересчитанные триггером под этот заказ.
+        Повтор с тем же client_token возвращает уже созданный заказ.
+        """
+        async with self.db.transaction() as conn:
+            if client_token is not None:
+                existing = await conn.fetchval(
+                    "SELECT order_id FROM order_client_tokens WHERE client_token = $1", client_token
+                )
+                if existing is not None:
+                    return await self.create(order, client_token)
+
+            await conn.execute("SELECT pg_advisory_xact_lock($1::int, $2::int)", MASTER_SLOT_LOCK, order.master_id)
+            if not await self.check_master_availability(
+                    order.master_id, order.appointment_datetime, order.duration_minutes
+            ):
+                raise SlotTakenError(
+                    f"Мастер {order.master_id} занят на {order.appointment_datetime}"
+                )
+            return await self.create(order, client_token)
+
+    async def purge_client_tokens(self, older_than: datetime) -> int:
+        """Удаляет старые токены идемпотентности"""
+        query = "DELETE FROM order_client_tokens WHERE created_at < $1"
+        try:
+            result = await self.db.execute(query, older_than)
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при удалении токенов заказов: {e}")
+            raise
+
     async def get_by_id(self, order_id: int) -> Optional[Order]:
         """Получает заказ по ID"""
         query = """
@@ -98,8 +474,25 @@ class OrderRepository:
             logger.error(f"Ошибка при получении заказа по ID {order_id}: {e}")
             raise
 
-    async def get_all(self) -> List[Order]:
-        """Получает все заказы"""
+    async def get_by_ids(self, order_ids: List[int]) -> Dict[int, Order]:
+        """Получает заказы по списку ID одним запросом (отсутствующих ID в словаре нет)"""
+        query = """
+        SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+               total_price, status, notes, client_name, client_phone, created_at, updated_at
+        FROM orders
+        WHERE id = ANY($1::int[])
+        """
+        if not order_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(order_ids))
+            return {order.id: order for order in order_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении заказов по ID ({len(order_ids)} шт.): {e}")
+            raise
+
+    async def get_all(self, lazy: bool = False) -> List[Union[Order, RecordView]]:
+        """Получает все заказы (lazy=True - легкие представления строк без преобразования)"""
         query = """
         SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
                total_price, status, notes, client_name, client_phone, created_at, updated_at
@@ -108,11 +501,95 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.views(rows) if lazy else order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении всех заказов: {e}")
             raise
 
+    @staticmethod
+    def _build_export_filters(
+            start_date: datetime = None,
+            end_date: datetime = None,
+            master_id: int = None,
+            status: OrderStatus = None
+    ) -> Tuple[str, list]:
+        """Собирает WHERE для выгрузки заказов"""
+        conditions = []
+        params = []
+
+        if start_date:
+            params.append(start_date)
+            conditions.append(f"appointment_datetime >= ${len(params)}")
+        if end_date:
+            params.append(end_date)
+            conditions.append(f"appointment_datetime <= ${len(params)}")
+        if master_id:
+            params.append(master_id)
+            conditions.append(f"master_id = ${len(params)}")
+        if status:
+            params.append(status.value)
+            conditions.append(f"status = ${len(params)}")
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where_clause, params
+
+    async def iterate(
+            self,
+            start_date: datetime = None,
+            end_date: datetime = None,
+            master_id: int = None,
+            status: OrderStatus = None,
+            fetch_size: int = 1000
+    ) -> AsyncIterator[Order]:
+        """
+        Потоково отдает заказы через серверный курсор.
+        В памяти одновременно держится не больше fetch_size строк.
+        """
+        where_clause, params = self._build_export_filters(start_date, end_date, master_id, status)
+        query = f"""
+        SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+               total_price, status, notes, client_name, client_phone, created_at, updated_at
+        FROM orders
+        {where_clause}
+        ORDER BY appointment_datetime, id
+        """
+        try:
+            async with self.db.get_connection() as conn:
+                # Серверный курсор в PostgreSQL живет только внутри транзакции
+                async with conn.transaction():
+                    cursor = await conn.cursor(query, *params)
+                    # Пачками: конструктор модели подбирается один раз на пачку, а не на строку
+                    while rows := await cursor.fetch(fetch_size):
+                        for order in order_mapper.many(rows):
+                            yield order
+        except Exception as e:
+            logger.error(f"Ошибка при потоковом чтении заказов: {e}")
+            raise
+
+    async def copy_to_file(
+            self,
+            output: str,
+            start_date: datetime = None,
+            end_date: datetime = None,
+            master_id: int = None,
+            status: OrderStatus = None
+    ) -> str:
+        """Сырой дамп заказов в CSV через COPY (без построения объектов Order)"""
+        where_clause, params = self._build_export_filters(start_date, end_date, master_id, status)
+        query = f"""
+        SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
+               total_price, status, notes, client_name, client_phone, created_at, updated_at
+        FROM orders
+        {where_clause}
+        ORDER BY appointment_datetime, id
+        """
+        try:
+            async with self.db.get_connection() as conn:
+                return await conn.copy_from_query(query, *params, output=output, format='csv', header=True)
+        except Exception as e:
+            logger.error(f"Ошибка при выгрузке заказов в {output}: {e}")
+            raise
+
     async def get_by_user_id(self, user_id: int) -> List[Order]:
         """Получает заказы пользователя"""
         query = """
@@ -124,7 +601,7 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, user_id)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении заказов пользователя {user_id}: {e}")
             raise
@@ -140,7 +617,7 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, master_id)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении заказов мастера {master_id}: {e}")
             raise
@@ -156,13 +633,18 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, status.value)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении заказов по статусу {status.value}: {e}")
             raise
 
-    async def get_by_date_range(self, start_date: datetime, end_date: datetime) -> List[Order]:
-        """Получает заказы в диапазоне дат"""
+    async def get_by_date_range(
+            self,
+            start_date: datetime,
+            end_date: datetime,
+            lazy: bool = False
+    ) -> List[Union[Order, RecordView]]:
+        """Получает заказы в диапазоне дат (lazy=True - легкие представления строк без преобразования)"""
         query = """
         SELECT id, user_id, master_id, service_id, appointment_datetime, duration_minutes,
                total_price, status, notes, client_name, client_phone, created_at, updated_at
@@ -172,7 +654,7 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, start_date, end_date)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.views(rows) if lazy else order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении заказов в диапазоне дат {start_date} - {end_date}: {e}")
             raise
@@ -198,7 +680,7 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, user_id)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении предстоящих заказов пользователя {user_id}: {e}")
             raise
@@ -244,6 +726,83 @@ class OrderRepository:
             logger.error(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
             raise
 
+    async def update_status_many(
+            self,
+            order_ids: List[int],
+            status: OrderStatus,
+            from_statuses: List[OrderStatus] = None,
+            started: bool = False
+    ) -> int:
+        """
+        Обновляет статус нескольких заказов одним запросом; возвращает число обновленных.
+        from_statuses - менять только заказы в этих статусах, started - только
+        записи, время которых уже наступило.
+        """
+        query = "UPDATE orders SET status = $2 WHERE id = ANY($1::int[]) AND status <> $2"
+        args = [list(order_ids), status.value]
+        if from_statuses is not None:
+            args.append([s.value for s in from_statuses])
+            query += f" AND status = ANY(${len(args)}::varchar[])"
+        if started:
+            query += " AND appointment_datetime <= now()"
+        if not order_ids:
+            return 0
+        try:
+            result = await self.db.execute(query, *args)
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статуса заказов ({len(order_ids)} шт.): {e}")
+            raise
+
+    async def transition_past(
+            self,
+            from_statuses: List[OrderStatus],
+            status: OrderStatus,
+            until: datetime,
+            since: datetime,
+            limit: int,
+            ended: bool = True
+    ) -> int:
+        """
+        Переводит в status до limit заказов в from_statuses, записи которых
+        закончились к until (ended=False - начались, но еще идут), начиная
+        с since. Строки, заблокированные другими транзакциями (запись или
+        отмена прямо сейчас), пропускаются до следующего прохода.
+        """
+        if ended:
+            due = "appointment_datetime + INTERVAL '1 minute' * duration_minutes <= $3"
+        else:
+            due = "appointment_datetime + INTERVAL '1 minute' * duration_minutes > $3"
+        query = f"""
+        WITH due AS (
+            SELECT id, appointment_datetime
+            FROM orders
+            WHERE status = ANY($1::varchar[])
+            -- Ограничение по appointment_datetime отсекает лишние секции
+            AND appointment_datetime <= $3
+            AND appointment_datetime >= $4
+            AND {due}
+            ORDER BY appointment_datetime
+            LIMIT $5
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE orders o
+        SET status = $2
+        FROM due
+        WHERE o.id = due.id
+        AND o.appointment_datetime = due.appointment_datetime
+        AND o.appointment_datetime <= $3
+        AND o.appointment_datetime >= $4
+        """
+        try:
+            result = await self.db.execute(
+                query, [s.value for s in from_statuses], status.value, until, since, limit
+            )
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при переводе прошедших заказов в статус {status.value}: {e}")
+            raise
+
     async def delete(self, order_id: int) -> bool:
         """Удаляет заказ"""
         query = "DELETE FROM orders WHERE id = $1"
@@ -262,6 +821,10 @@ class OrderRepository:
             exclude_order_id: int = None
     ) -> bool:
         """Проверяет доступность мастера в указанное время"""
+        if exclude_order_id is None:
+            # Маски занятости: чтение строк дня по ключу вместо поиска пересечений
+            return await self.availability_repo.is_free(master_id, appointment_datetime, duration_minutes)
+
         end_time = appointment_datetime + timedelta(minutes=duration_minutes)
 
         # Базовый запрос для проверки пересечений
@@ -270,6 +833,9 @@ class OrderRepository:
         FROM orders
         WHERE master_id = $1
         AND status NOT IN ('cancelled', 'no_show')
+        -- Ограничение по appointment_datetime отсекает лишние секции (записи не длиннее суток)
+        AND appointment_datetime < $3
+        AND appointment_datetime > $2 - INTERVAL '1 day'
         AND (
             -- Новое время начинается во время существующей записи
             (appointment_datetime <= $2 AND appointment_datetime + INTERVAL '1 minute' * duration_minutes > $2)
@@ -313,7 +879,7 @@ class OrderRepository:
         """
         try:
             rows = await self.db.fetch(query, master_id, start_of_day, end_of_day)
-            return [self._row_to_order(row) for row in rows]
+            return order_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении расписания мастера {master_id} на {date.date()}: {e}")
             raise
@@ -325,55 +891,62 @@ class OrderRepository:
                appointment_datetime + INTERVAL '1 minute' * duration_minutes as end_time
         FROM orders
         WHERE master_id = $1
-        AND DATE(appointment_datetime) = $2
+        AND appointment_datetime >= $2
+        AND appointment_datetime < $3
         AND status NOT IN ('cancelled', 'no_show')
         ORDER BY appointment_datetime
         """
+        start_of_day = datetime.combine(date.date(), datetime.min.time())
+        end_of_day = start_of_day + timedelta(days=1)
         try:
-            rows = await self.db.fetch(query, master_id, date.date())
+            rows = await self.db.fetch(query, master_id, start_of_day, end_of_day)
             return [(row['appointment_datetime'], row['end_time']) for row in rows]
         except Exception as e:
             logger.error(f"Ошибка при получении занятых слотов мастера {master_id}: {e}")
             raise
 
+    @replica_read
     async def get_statistics(self, start_date: datetime = None, end_date: datetime = None) -> dict:
-        """Получает статистику по заказам"""
-        where_clause = ""
+        """
+        Получает статистику по заказам из дневного агрегата order_stats_daily.
+        Границы периода учитываются с точностью до дня (по дате создания заказа, включительно).
+        """
+        conditions = []
         params = []
 
-        if start_date and end_date:
-            where_clause = "WHERE created_at >= $1 AND created_at <= $2"
-            params = [start_date, end_date]
-        elif start_date:
-            where_clause = "WHERE created_at >= $1"
-            params = [start_date]
-        elif end_date:
-            where_clause = "WHERE created_at <= $1"
-            params = [end_date]
+        if start_date:
+            params.append(start_date.date() if isinstance(start_date, datetime) else start_date)
+            conditions.append(f"day >= ${len(params)}")
+        if end_date:
+            params.append(end_date.date() if isinstance(end_date, datetime) else end_date)
+            conditions.append(f"day <= ${len(params)}")
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
         query = f"""
         SELECT 
-            COUNT(*) as total_orders,
-            COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_orders,
-            COUNT(CASE WHEN status = 'cancelled' THEN 1 END) as cancelled_orders,
-            COUNT(CASE WHEN status = 'no_show' THEN 1 END) as no_show_orders,
-            SUM(CASE WHEN status = 'completed' THEN total_price ELSE 0 END) as total_revenue,
-            AVG(CASE WHEN status = 'completed' THEN total_price ELSE NULL END) as avg_order_value
-        FROM orders
+            COALESCE(SUM(orders_count), 0) as total_orders,
+            COALESCE(SUM(CASE WHEN status = 'completed' THEN orders_count END), 0) as completed_orders,
+            COALESCE(SUM(CASE WHEN status = 'cancelled' THEN orders_count END), 0) as cancelled_orders,
+            COALESCE(SUM(CASE WHEN status = 'no_show' THEN orders_count END), 0) as no_show_orders,
+            SUM(CASE WHEN status = 'completed' THEN revenue ELSE 0 END) as total_revenue
+        FROM order_stats_daily
         {where_clause}
         """
 
         try:
             row = await self.db.fetchrow(query, *params)
+            total_orders = int(row['total_orders'])
+            completed_orders = int(row['completed_orders'])
+            total_revenue = float(row['total_revenue']) if row['total_revenue'] else 0.0
             return {
-                'total_orders': row['total_orders'],
-                'completed_orders': row['completed_orders'],
-                'cancelled_orders': row['cancelled_orders'],
-                'no_show_orders': row['no_show_orders'],
-                'total_revenue': float(row['total_revenue']) if row['total_revenue'] else 0.0,
-                'avg_order_value': float(row['avg_order_value']) if row['avg_order_value'] else 0.0,
-                'completion_rate': (row['completed_orders'] / row['total_orders'] * 100) if row[
-                                                                                                'total_orders'] > 0 else 0.0
+                'total_orders': total_orders,
+                'completed_orders': completed_orders,
+                'cancelled_orders': int(row['cancelled_orders']),
+                'no_show_orders': int(row['no_show_orders']),
+                'total_revenue': total_revenue,
+                'avg_order_value': total_revenue / completed_orders if completed_orders > 0 else 0.0,
+                'completion_rate': (completed_orders / total_orders * 100) if total_orders > 0 else 0.0
             }
         except Exception as e:
             logger.error(f"Ошибка при получении статистики заказов: {e}")
@@ -381,18 +954,4 @@ class OrderRepository:
 
     def _row_to_order(self, row) -> Order:
         """Преобразует строку БД в объект Order"""
-        return Order(
-            id=row['id'],
-            user_id=row['user_id'],
-            master_id=row['master_id'],
-            service_id=row['service_id'],
-            appointment_datetime=row['appointment_datetime'],
-            duration_minutes=row['duration_minutes'],
-            total_price=Decimal(str(row['total_price'])),
-            status=OrderStatus(row['status']),
-            notes=row['notes'],
-            client_name=row['client_name'],
-            client_phone=row['client_phone'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        )
+        return order_mapper(row)
@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime
+from typing import List
+
+from src.config.Database import db
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderRepository:
+    """Репозиторий состояния напоминаний о записях"""
+
+    def __init__(self, database=None):
+        self.db = database or db
+
+    async def create_table(self):
+        """Создает таблицу отправленных напоминаний"""
+        query = """
+        CREATE TABLE IF NOT EXISTS order_reminders (
+            order_id INTEGER NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            claimed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            -- NULL - напоминание взято в отправку, но отправка еще не подтверждена
+            sent_at TIMESTAMP WITH TIME ZONE,
+            PRIMARY KEY (order_id, kind)
+        );
+
+        ALTER TABLE order_reminders ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE
+            DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE order_reminders ALTER COLUMN sent_at DROP DEFAULT;
+        """
+        try:
+            await self.db.execute(query)
+            logger.info("Таблица order_reminders создана или уже существует")
+        except Exception as e:
+            logger.error(f"Ошибка при создании таблицы order_reminders: {e}")
+            raise
+
+    async def get_upcoming(self, window_start: datetime, window_end: datetime,
+                           changed_since: datetime = None) -> List[dict]:
+        """
+        Активные записи с началом в окне [window_start, window_end)
+        вместе с Telegram ID клиента и уже отправленными напоминаниями.
+        changed_since ограничивает выборку записями, созданными или измененными после этого момента.
+        """
+        query = """
+        SELECT o.id AS order_id, o.appointment_datetime, c.telegram_id,
+               m.name AS master_name, s.name AS service_name,
+               ARRAY(SELECT r.kind FROM order_reminders r WHERE r.order_id = o.id) AS sent_kinds
+        FROM orders o
+        JOIN customers c ON c.id = o.user_id
+        JOIN masters m ON m.id = o.master_id
+        JOIN services s ON s.id = o.service_id
+        WHERE o.appointment_datetime >= $1
+        AND o.appointment_datetime < $2
+        AND o.status IN ('pending', 'confirmed')
+        AND c.telegram_id IS NOT NULL
+        AND ($3::timestamptz IS NULL OR o.updated_at >= $3)
+        ORDER BY o.appointment_datetime
+        """
+        try:
+            rows = await self.db.fetch(query, window_start, window_end, changed_since)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Ошибка при получении записей для напоминаний: {e}")
+            raise
+
+    async def claim(self, order_id: int, kind: str) -> bool:
+        """
+        Берет напоминание в отправку до фактической отправки; после нее
+        отметку подтверждает confirm. Возвращает False, если напоминание
+        уже отправлено или отправляется.
+        """
+        query = """
+        INSERT INTO order_reminders (order_id, kind)
+        VALUES ($1, $2)
+        ON CONFLICT (order_id, kind) DO NOTHING
+        """
+        try:
+            result = await self.db.execute(query, order_id, kind)
+            return result == "INSERT 0 1"
+        except Exception as e:
+            logger.error(f"Ошибка при отметке напоминания {kind} для заказа {order_id}: {e}")
+            raise
+
+    async def confirm(self, order_id: int, kind: str) -> bool:
+        """Подтверждает отправку взятого напоминания"""
+        query = "UPDATE order_reminders SET sent_at = CURRENT_TIMESTAMP WHERE order_id = $1 AND kind = $2"
+        try:
+            result = await self.db.execute(query, order_id, kind)
+            return result == "UPDATE 1"
+        except Exception as e:
+            logger.error(f"Ошибка при подтверждении напоминания {kind} для заказа {order_id}: {e}")
+            raise
+
+    async def release_unconfirmed(self) -> int:
+        """
+        Снимает отметки, отправка которых так и не была подтверждена
+        (процесс упал или остановился между claim и confirm).
+        """
+        query = "DELETE FROM order_reminders WHERE sent_at IS NULL"
+        try:
+            result = await self.db.execute(query)
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при снятии неподтвержденных напоминаний: {e}")
+            raise
+
+    async def release(self, order_id: int, kind: str) -> bool:
+        """Снимает отметку, если отправка не удалась, чтобы напоминание ушло повторно"""
+        query = "DELETE FROM order_reminders WHERE order_id = $1 AND kind = $2"
+        try:
+            result = await self.db.execute(query, order_id, kind)
+            return result == "DELETE 1"
+        except Exception as e:
+            logger.error(f"Ошибка при снятии отметки напоминания {kind} для заказа {order_id}: {e}")
+            raise
@@ -0,0 +1,235 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from src.config.Database import db
+from src.models.MasterSchedule import MasterSchedule, TimeRange
+from src.models.users.Master import Master
+from src.repository.MasterRepository import SYNC_WORKING_HOURS_QUERY, master_mapper
+from src.utils.dates import wall_clock
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleRepository:
+    """
+    Рабочие графики мастеров в нормализованном виде:
+    недельные интервалы (день недели + минуты от начала дня) и исключения по датам.
+    Колонки masters.working_* остаются для отображения, MasterRepository
+    переносит их сюда при создании/обновлении мастера.
+    """
+
+    def __init__(self, database=None):
+        self.db = database or db
+
+    async def create_table(self):
+        """Создает таблицы графиков и переносит графики из masters"""
+        query = """
+        CREATE TABLE IF NOT EXISTS master_working_hours (
+            master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
+            weekday SMALLINT NOT NULL CHECK (weekday BETWEEN 1 AND 7),
+            start_minute SMALLINT NOT NULL CHECK (start_minute BETWEEN 0 AND 1439),
+            end_minute SMALLINT NOT NULL CHECK (end_minute BETWEEN 1 AND 1440),
+            PRIMARY KEY (master_id, weekday, start_minute),
+            CHECK (start_minute < end_minute)
+        );
+
+        -- "Кто работает во вторник в 15:00": поиск по дню недели и диапазону минут
+        CREATE INDEX IF NOT EXISTS idx_master_working_hours_slot
+            ON master_working_hours(weekday, start_minute, end_minute);
+
+        CREATE TABLE IF NOT EXISTS master_schedule_exceptions (
+            id SERIAL PRIMARY KEY,
+            master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            -- NULL - выходной весь день, иначе рабочий интервал вместо недельного
+            start_minute SMALLINT CHECK (start_minute BETWEEN 0 AND 1439),
+            end_minute SMALLINT CHECK (end_minute BETWEEN 1 AND 1440),
+            reason VARCHAR(255),
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            CHECK ((start_minute IS NULL AND end_minute IS NULL) OR start_minute < end_minute)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_master_schedule_exceptions_day
+            ON master_schedule_exceptions(day, master_id);
+        CREATE INDEX IF NOT EXISTS idx_master_schedule_exceptions_master
+            ON master_schedule_exceptions(master_id, day);
+        """
+        missing_query = """
+        SELECT COALESCE(array_agg(m.id), '{}')
+        FROM masters m
+        WHERE NOT EXISTS (SELECT 1 FROM master_working_hours h WHERE h.master_id = m.id)
+        """
+        try:
+            await self.db.execute(query)
+            # Мастера без недельного графика получают его из masters.working_*
+            missing_ids = await self.db.fetchval(missing_query)
+            if missing_ids:
+                await self.db.execute(SYNC_WORKING_HOURS_QUERY, missing_ids)
+            logger.info(
+                f"Таблицы графиков мастеров созданы или уже существуют, "
+                f"графиков перенесено: {len(missing_ids)}"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при создании таблиц графиков мастеров: {e}")
+            raise
+
+    async def set_weekly_hours(self, master_id: int, weekly_hours: Dict[int, List[TimeRange]]):
+        """Заменяет недельный график мастера"""
+        rows = [
+            (master_id, weekday, start, end)
+            for weekday, ranges in weekly_hours.items()
+            for start, end in ranges
+        ]
+        try:
+            async with self.db.transaction() as conn:
+                await conn.execute("DELETE FROM master_working_hours WHERE master_id = $1", master_id)
+                if rows:
+                    await conn.executemany(
+                        """
+                        INSERT INTO master_working_hours (master_id, weekday, start_minute, end_minute)
+                        VALUES ($1, $2, $3, $4)
+                        """,
+                        rows
+                    )
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении графика мастера {master_id}: {e}")
+            raise
+
+    async def add_exception(
+            self,
+            master_id: int,
+            day: date,
+            hours: Optional[TimeRange] = None,
+            reason: Optional[str] = None
+    ) -> int:
+        """Добавляет исключение на дату: hours=None - выходной"""
+        query = """
+        INSERT INTO master_schedule_exceptions (master_id, day, start_minute, end_minute, reason)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING id
+        """
+        start, end = hours if hours else (None, None)
+        try:
+            return await self.db.fetchval(query, master_id, day, start, end, reason)
+        except Exception as e:
+            logger.error(f"Ошибка при добавлении исключения графика мастера {master_id} на {day}: {e}")
+            raise
+
+    async def remove_exceptions(self, master_id: int, day: date) -> int:
+        """Удаляет исключения мастера на дату - действует недельный график"""
+        query = "DELETE FROM master_schedule_exceptions WHERE master_id = $1 AND day = $2"
+        try:
+            result = await self.db.execute(query, master_id, day)
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при удалении исключений графика мастера {master_id} на {day}: {e}")
+            raise
+
+    async def get_schedule(self, master_id: int, start: date = None, end: date = None) -> MasterSchedule:
+        """График мастера с исключениями за период [start, end]"""
+        schedules = await self.get_schedules([master_id], start, end)
+        return schedules.get(master_id) or MasterSchedule(master_id=master_id)
+
+    async def get_schedules(
+            self,
+            master_ids: Iterable[int],
+            start: date = None,
+            end: date = None
+    ) -> Dict[int, MasterSchedule]:
+        """Графики нескольких мастеров двумя запросами (без исключений, если период не задан)"""
+        master_ids = list(master_ids)
+        if not master_ids:
+            return {}
+
+        hours_query = """
+        SELECT master_id, weekday, start_minute, end_minute
+        FROM master_working_hours
+        WHERE master_id = ANY($1::int[])
+        ORDER BY master_id, weekday, start_minute
+        """
+        exceptions_query = """
+        SELECT master_id, day, start_minute, end_minute
+        FROM master_schedule_exceptions
+        WHERE master_id = ANY($1::int[]) AND day BETWEEN $2 AND $3
+        ORDER BY master_id, day, start_minute NULLS FIRST
+        """
+        try:
+            schedules = {master_id: MasterSchedule(master_id=master_id) for master_id in master_ids}
+            for row in await self.db.fetch(hours_query, master_ids):
+                schedules[row['master_id']].weekly_hours.setdefault(row['weekday'], []).append(
+                    (row['start_minute'], row['end_minute'])
+                )
+
+            if start is not None:
+                end = end or start
+                for row in await self.db.fetch(exceptions_query, master_ids, start, end):
+                    day_hours = schedules[row['master_id']].exceptions.setdefault(row['day'], [])
+                    if row['start_minute'] is not None:
+                        day_hours.append((row['start_minute'], row['end_minute']))
+            return schedules
+        except Exception as e:
+            logger.error(f"Ошибка при получении графиков мастеров ({len(master_ids)} шт.): {e}")
+            raise
+
+    async def find_available_masters(
+            self,
+            service_id: int,
+            start: datetime,
+            duration_minutes: int
+    ) -> List[Master]:
+        """
+        Мастера, которые оказывают услугу, работают весь интервал
+        [start, start + duration) и не заняты другой записью.
+        """
+        query = """
+        SELECT m.id, m.telegram_id, m.username, m.name, m.phone, m.email, m.specialization,
+               m.experience_years, m.rating, m.is_active, m.working_hours_start,
+               m.working_hours_end, m.working_days, m.created_at, m.updated_at,
+               ARRAY(SELECT sm.service_id FROM master_services sm WHERE sm.master_id = m.id) AS service_ids
+        FROM masters m
+        INNER JOIN master_services ms ON ms.master_id = m.id AND ms.service_id = $1
+        WHERE m.is_active = TRUE
+        AND CASE
+            -- Исключение на дату полностью заменяет недельный график
+            WHEN EXISTS (SELECT 1 FROM master_schedule_exceptions e WHERE e.day = $4 AND e.master_id = m.id)
+            THEN EXISTS (
+                SELECT 1 FROM master_schedule_exceptions e
+                WHERE e.day = $4 AND e.master_id = m.id
+                AND e.start_minute <= $6 AND e.end_minute >= $7
+            )
+            ELSE EXISTS (
+                SELECT 1 FROM master_working_hours h
+                WHERE h.weekday = $5 AND h.master_id = m.id
+                AND h.start_minute <= $6 AND h.end_minute >= $7
+            )
+        END
+        AND NOT EXISTS (
+            SELECT 1 FROM orders o
+            WHERE o.master_id = m.id
+            AND o.status NOT IN ('cancelled', 'no_show')
+            -- Ограничение по appointment_datetime отсекает лишние секции (записи не длиннее суток)
+            AND o.appointment_datetime < $3
+            AND o.appointment_datetime > $2 - INTERVAL '1 day'
+            AND o.appointment_datetime + INTERVAL '1 minute' * o.duration_minutes > $2
+        )
+        ORDER BY m.rating DESC, m.name
+        """
+        local_start = wall_clock(start)
+        start_minute = local_start.hour * 60 + local_start.minute
+        end_minute = start_minute + duration_minutes
+        try:
+            rows = await self.db.fetch(
+                query,
+                service_id,
+                start,
+                start + timedelta(minutes=duration_minutes),
+                local_start.date(),
+                local_start.isoweekday(),
+                start_minute,
+                end_minute
+            )
+            return master_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при поиске свободных мастеров для услуги {service_id} на {start}: {e}")
+            raise
@@ -1,12 +1,16 @@
 import logging
-from typing import List, Optional
-from decimal import Decimal
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from src.config.Database import db
+from src.config.Database import db, replica_read
 from src.models.Service import Service
+from src.repository.CatalogSnapshotRepository import snapshot_fallback
+from src.utils.mapping import RowMapper
 
 logger = logging.getLogger(__name__)
 
+service_mapper = RowMapper(Service)
+
 
 class ServiceRepository:
     """Репозиторий для работы с услугами в PostgreSQL"""
@@ -33,6 +37,7 @@ class ServiceRepository:
         CREATE INDEX IF NOT EXISTS idx_services_category ON services(category);
         CREATE INDEX IF NOT EXISTS idx_services_is_active ON services(is_active);
         CREATE INDEX IF NOT EXISTS idx_services_name ON services(name);
+        CREATE INDEX IF NOT EXISTS idx_services_updated_at ON services(updated_at);
 
         -- Триггер для автоматического обновления updated_at
         CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -79,6 +84,8 @@ class ServiceRepository:
             logger.error(f"Ошибка при создании услуги: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("service_by_id")
     async def get_by_id(self, service_id: int) -> Optional[Service]:
         """Получает услугу по ID"""
         query = """
@@ -93,6 +100,26 @@ class ServiceRepository:
             logger.error(f"Ошибка при получении услуги по ID {service_id}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("services_by_ids")
+    async def get_by_ids(self, service_ids: List[int]) -> Dict[int, Service]:
+        """Получает услуги по списку ID одним запросом (отсутствующих ID в словаре нет)"""
+        query = """
+        SELECT id, name, description, category, subcategory, price, duration_minutes, is_active, created_at, updated_at
+        FROM services
+        WHERE id = ANY($1::int[])
+        """
+        if not service_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(service_ids))
+            return {service.id: service for service in service_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении услуг по ID ({len(service_ids)} шт.): {e}")
+            raise
+
+    @replica_read
+    @snapshot_fallback("all_services")
     async def get_all(self) -> List[Service]:
         """Получает все услуги"""
         query = """
@@ -102,11 +129,13 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query)
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении всех услуг: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("services_by_category")
     async def get_by_category(self, category: str) -> List[Service]:
         """Получает услуги по категории"""
         query = """
@@ -117,11 +146,13 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query, category)
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении услуг по категории {category}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("service_by_name")
     async def get_by_name(self, service: str) -> List[Service]:
         """Получает услуги по категории"""
         query = """
@@ -136,6 +167,8 @@ class ServiceRepository:
             logger.error(f"Ошибка при получении услуг по категории {service}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("active_services")
     async def get_active_services(self) -> List[Service]:
         """Получает только активные услуги"""
         query = """
@@ -146,11 +179,26 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query)
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении активных услуг: {e}")
             raise
 
+    async def get_changed_since(self, since: Optional[datetime]) -> List[Service]:
+        """Услуги, измененные начиная с since (включительно); None - все"""
+        query = """
+        SELECT id, name, description, category, subcategory, price, duration_minutes, is_active, created_at, updated_at
+        FROM services
+        WHERE $1::timestamptz IS NULL OR updated_at >= $1
+        ORDER BY updated_at
+        """
+        try:
+            rows = await self.db.fetch(query, since)
+            return service_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при получении услуг, измененных с {since}: {e}")
+            raise
+
     async def update(self, service: Service) -> Service:
         """Обновляет услугу"""
         query = """
@@ -187,6 +235,8 @@ class ServiceRepository:
             logger.error(f"Ошибка при удалении услуги {service_id}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("search_services_by_description")
     async def search_by_description(self, description: str) -> List[Service]:
         """Поиск услуг по описанию"""
         query = """
@@ -197,11 +247,13 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query, f"%{description}%")
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при поиске услуг по описанию {description}: {e}")
             raise
 
+    @replica_read
+    @snapshot_fallback("search_services_by_name")
     async def search_by_name(self, name: str) -> List[Service]:
         """Поиск услуг по названию"""
         query = """
@@ -212,7 +264,7 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query, f"%{name}%")
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при поиске услуг по названию {name}: {e}")
             raise
@@ -235,6 +287,8 @@ class ServiceRepository:
     #         logger.error(f"Ошибка при поиске услуг по названию {name}: {e}")
     #         raise
 
+    @replica_read
+    @snapshot_fallback("services_by_price_range")
     async def get_by_price_range(self, min_price: float, max_price: float) -> List[Service]:
         """Получает услуги в диапазоне цен"""
         query = """
@@ -245,23 +299,11 @@ class ServiceRepository:
         """
         try:
             rows = await self.db.fetch(query, min_price, max_price)
-            return [self._row_to_service(row) for row in rows]
+            return service_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении услуг в диапазоне цен {min_price}-{max_price}: {e}")
             raise
 
     def _row_to_service(self, row) -> Service:
         """Преобразует строку БД в объект Service"""
-        return Service(
-            id=row['id'],
-            name=row['name'],
-            description=row['description'],
-            category=row['category'],
-            subcategory=row['subcategory'],
-            price=Decimal(str(row['price'])),
-            duration_minutes=row['duration_minutes'],
-            is_active=row['is_active'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        )
-
+        return service_mapper(row)
@@ -1,11 +1,14 @@
 import logging
-from typing import Optional, List
+from typing import Dict, List, Optional
 
 from src.models.users.User import User
 from src.config.Database import db
+from src.utils.mapping import RowMapper
 
 logger = logging.getLogger(__name__)
 
+user_mapper = RowMapper(User)
+
 
 class UserRepository:
     """Репозиторий для работы с пользователями в PostgreSQL"""
@@ -23,6 +26,9 @@ class UserRepository:
             created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
         );
 
+        -- Пользователи, заблокировавшие бота, пропускаются при рассылках
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN NOT NULL DEFAULT FALSE;
+
         CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
         CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
         """
@@ -79,6 +85,38 @@ class UserRepository:
             logger.error(f"Ошибка при получении пользователя по Telegram ID {telegram_id}: {e}")
             raise
 
+    async def get_by_ids(self, user_ids: List[int]) -> Dict[int, User]:
+        """Получает пользователей по списку ID одним запросом (отсутствующих ID в словаре нет)"""
+        query = """
+        SELECT id, telegram_id, username, created_at
+        FROM users
+        WHERE id = ANY($1::int[])
+        """
+        if not user_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(user_ids))
+            return {user.id: user for user in user_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении пользователей по ID ({len(user_ids)} шт.): {e}")
+            raise
+
+    async def get_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, User]:
+        """Получает пользователей по списку Telegram ID (ключ словаря - telegram_id)"""
+        query = """
+        SELECT id, telegram_id, username, created_at
+        FROM users
+        WHERE telegram_id = ANY($1::bigint[])
+        """
+        if not telegram_ids:
+            return {}
+        try:
+            rows = await self.db.fetch(query, list(telegram_ids))
+            return {user.telegram_id: user for user in user_mapper.many(rows)}
+        except Exception as e:
+            logger.error(f"Ошибка при получении пользователей по Telegram ID ({len(telegram_ids)} шт.): {e}")
+            raise
+
     async def get_or_create(self, telegram_id: int, username: str = "") -> tuple[
         User, bool]:
         """
@@ -158,11 +196,52 @@ class UserRepository:
         """
         try:
             rows = await self.db.fetch(query, limit, offset)
-            return [self._row_to_user(row) for row in rows]
+            return user_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при получении списка пользователей: {e}")
             raise
 
+    async def get_after(self, last_id: int = 0, limit: int = 500) -> List[User]:
+        """
+        Следующая порция активных (не заблокировавших бота) пользователей после last_id.
+        Keyset-пагинация по первичному ключу: стоимость не растет с номером страницы, в отличие от OFFSET.
+        """
+        query = """
+        SELECT id, telegram_id, username, created_at
+        FROM users
+        WHERE id > $1 AND is_blocked = FALSE
+        ORDER BY id
+        LIMIT $2
+        """
+        try:
+            rows = await self.db.fetch(query, last_id, limit)
+            return user_mapper.many(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при получении пользователей после ID {last_id}: {e}")
+            raise
+
+    async def mark_blocked(self, telegram_ids: List[int]) -> int:
+        """Отмечает пользователей, заблокировавших бота"""
+        query = "UPDATE users SET is_blocked = TRUE WHERE telegram_id = ANY($1::bigint[])"
+        if not telegram_ids:
+            return 0
+        try:
+            result = await self.db.execute(query, list(telegram_ids))
+            return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"Ошибка при отметке заблокировавших бота ({len(telegram_ids)} шт.): {e}")
+            raise
+
+    async def mark_unblocked(self, telegram_id: int) -> bool:
+        """Снимает отметку блокировки (пользователь снова написал боту)"""
+        query = "UPDATE users SET is_blocked = FALSE WHERE telegram_id = $1 AND is_blocked"
+        try:
+            result = await self.db.execute(query, telegram_id)
+            return result == "UPDATE 1"
+        except Exception as e:
+            logger.error(f"Ошибка при снятии блокировки пользователя {telegram_id}: {e}")
+            raise
+
     async def count(self) -> int:
         """Возвращает общее количество пользователей"""
         query = "SELECT COUNT(*) FROM users"
@@ -183,7 +262,7 @@ class UserRepository:
         """
         try:
             rows = await self.db.fetch(query, f"%{username}%")
-            return [self._row_to_user(row) for row in rows]
+            return user_mapper.many(rows)
         except Exception as e:
             logger.error(f"Ошибка при поиске пользователей по username: {e}")
             raise
@@ -202,9 +281,4 @@ class UserRepository:
         """Преобразует строку из БД в объект User"""
         if not row:
             return None
-        return User(
-            id=row['id'],
-            telegram_id=row['telegram_id'],
-            username=row['username'],
-            created_at=row['created_at']
-        )
+        return user_mapper(row)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from src.models.Broadcast import Broadcast, BroadcastStatus
+from src.repository.BroadcastRepository import BroadcastRepository
+from src.repository.UserRepository import UserRepository
+from src.services.OutboundDispatcher import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SENT = "sent"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+class BroadcastService:
+    """
+    Массовая рассылка всем пользователям.
+    Получатели читаются порциями по users.id (keyset), отправка идет через
+    полосу массовых рассылок OutboundDispatcher с ограничением параллельности,
+    прогресс сохраняется после каждой порции - после падения рассылка
+    продолжается с последней сохраненной порции.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            broadcast_repository: BroadcastRepository = None,
+            user_repository: UserRepository = None,
+            batch_size: int = 200,
+            concurrency: int = 25,
+            max_retry_delay: float = 60
+    ):
+        self.bot = bot
+        self.broadcast_repo = broadcast_repository or BroadcastRepository()
+        self.user_repo = user_repository or UserRepository()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retry_delay = max_retry_delay
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def create(self, text: str) -> Broadcast:
+        """Создает рассылку и сразу запускает её"""
+        broadcast = await self.broadcast_repo.create(text)
+        self.start(broadcast)
+        return broadcast
+
+    def start(self, broadcast: Broadcast):
+        """Запускает (или продолжает) рассылку в фоне"""
+        if broadcast.id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast))
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+
+    async def resume_unfinished(self) -> int:
+        """Продолжает рассылки, прерванные остановкой или падением бота"""
+        broadcasts = await self.broadcast_repo.get_unfinished()
+        for broadcast in broadcasts:
+            logger.info(f"Продолжаем рассылку {broadcast.id} с пользователя {broadcast.last_user_id}")
+            self.start(broadcast)
+        return len(broadcasts)
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        """Останавливает рассылку без возможности продолжения"""
+        updated = await self.broadcast_repo.update_status(
+            broadcast_id, BroadcastStatus.CANCELLED, from_statuses=[BroadcastStatus.PENDING, BroadcastStatus.RUNNING]
+        )
+        task = self._tasks.get(broadcast_id)
+        if updated and task:
+            task.cancel()
+        return updated
+
+    async def stop(self):
+        """Прерывает все рассылки; статус running сохраняется, и после рестарта они продолжатся"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self, broadcast: Broadcast):
+        started = await self.broadcast_repo.update_status(
+            broadcast.id, BroadcastStatus.RUNNING, from_statuses=[BroadcastStatus.PENDING, BroadcastStatus.RUNNING]
+        )
+        if not started:
+            # Отменена (или завершена) до запуска задачи
+            logger.info(f"Рассылка {broadcast.id} не запущена: она уже отменена или завершена")
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_user_id = broadcast.last_user_id
+        total_sent = 0
+
+        try:
+            with bulk_sending():
+                while True:
+                    users = await self._retry(
+                        broadcast.id, lambda: self.user_repo.get_after(last_user_id, self.batch_size)
+                    )
+                    if not users:
+                        break
+
+                    results = await asyncio.gather(
+                        *(self._send(semaphore, user.telegram_id, broadcast.text) for user in users)
+                    )
+
+                    blocked_ids = [user.telegram_id for user, result in zip(users, results) if result == BLOCKED]
+                    await self._retry(broadcast.id, lambda: self.user_repo.mark_blocked(blocked_ids))
+
+                    last_user_id = users[-1].id
+                    # Порция уже отправлена: сохранение прогресса повторяется, а не отправка
+                    await self._retry(broadcast.id, lambda: self.broadcast_repo.checkpoint(
+                        broadcast.id,
+                        last_user_id,
+                        sent=results.count(SENT),
+                        failed=results.count(FAILED),
+                        blocked=len(blocked_ids)
+                    ))
+                    total_sent += results.count(SENT)
+
+            await self._retry(broadcast.id, lambda: self.broadcast_repo.update_status(
+                broadcast.id, BroadcastStatus.COMPLETED, from_statuses=[BroadcastStatus.RUNNING]
+            ))
+            logger.info(f"Рассылка {broadcast.id} завершена, отправлено за запуск: {total_sent}")
+        except asyncio.CancelledError:
+            logger.info(f"Рассылка {broadcast.id} прервана на пользователе {last_user_id}")
+            raise
+        except Exception as e:
+            # Статус остается running - рассылка продолжится при следующем запуске
+            logger.error(f"Ошибка рассылки {broadcast.id} на пользователе {last_user_id}: {e}")
+
+    async def _retry(self, broadcast_id: int, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Повторяет обращение к базе с растущей паузой (до max_retry_delay),
+        пока оно не пройдет: кратковременный сбой базы не должен оставлять
+        рассылку в статусе running без задачи до рестарта.
+        """
+        delay = 1.0
+        while True:
+            try:
+                return await operation()
+            except Exception as e:
+                logger.warning(f"Рассылка {broadcast_id}: ошибка базы, повтор через {delay:.0f} с: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    async def _send(self, semaphore: asyncio.Semaphore, telegram_id: int, text: str) -> str:
+        async with semaphore:
+            try:
+                # Текст администратора отправляется как есть: "<" в нем не должен ломать HTML-разметку
+                await self.bot.send_message(chat_id=telegram_id, text=text, parse_mode=None)
+                return SENT
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest as e:
+                logger.warning(f"Рассылка: не удалось отправить {telegram_id}: {e}")
+                return FAILED
+            except Exception as e:
+                logger.error(f"Рассылка: ошибка отправки {telegram_id}: {e}")
+                return FAILED
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.config.Database import DatabaseUnavailableError
+from src.models.CatalogSnapshot import CatalogSnapshot
+from src.repository.CatalogSnapshotRepository import (
+    CatalogSnapshotRepository,
+    catalog_snapshot_repo,
+    snapshot_reads_allowed
+)
+from src.repository.MasterRepository import MasterRepository
+from src.repository.ServiceRepository import ServiceRepository
+from src.utils.dates import advance_mark, sync_since
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+sync_rows_total = metrics.counter(
+    "catalog_sync_rows_total", "Строк, прочитанных инкрементальной синхронизацией", ("table",)
+)
+sync_changes_total = metrics.counter(
+    "catalog_sync_changes_total", "Изменившихся строк, примененных к кэшу процесса", ("table",)
+)
+
+
+class CatalogSnapshotService:
+    """
+    Держит снимок каталога в памяти процесса и на диске в актуальном
+    состоянии: раз в interval_seconds из базы читаются только строки
+    с updated_at не раньше отметки последней синхронизации, поэтому
+    обновление стоит O(изменений), а не чтения таблиц целиком. Файл
+    перезаписывается только если что-то изменилось. Пока база недоступна,
+    синхронизация пропускается и последний снимок остается как есть.
+    """
+
+    def __init__(
+            self,
+            service_repository: ServiceRepository = None,
+            master_repository: MasterRepository = None,
+            snapshot_repository: CatalogSnapshotRepository = None,
+            interval_seconds: float = 30
+    ):
+        self.service_repo = service_repository or ServiceRepository()
+        self.master_repo = master_repository or MasterRepository()
+        self.snapshot_repo = snapshot_repository or catalog_snapshot_repo
+        self.interval_seconds = interval_seconds
+        # Отметки синхронизации; берутся из снимка при первой синхронизации
+        self.services_mark: Optional[datetime] = None
+        self.masters_mark: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запускает фоновую синхронизацию снимка"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую синхронизацию"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Читает каталог из базы целиком и атомарно перезаписывает снимок"""
+        token = snapshot_reads_allowed.set(False)
+        try:
+            services = await self.service_repo.get_all()
+            masters = await self.master_repo.get_all()
+        finally:
+            snapshot_reads_allowed.reset(token)
+
+        snapshot = CatalogSnapshot(
+            services={service.id: service for service in services},
+            masters={master.id: master for master in masters},
+            created_at=datetime.now(timezone.utc)
+        )
+        await asyncio.to_thread(self.snapshot_repo.save, snapshot)
+        self.services_mark = snapshot.services_updated_at
+        self.masters_mark = snapshot.masters_updated_at
+        return snapshot
+
+    async def sync(self) -> CatalogSnapshot:
+        """
+        Догоняет снимок по изменениям в базе (при старте - снимок,
+        загруженный с диска). Без снимка каталог читается целиком.
+        """
+        snapshot = self.snapshot_repo.get()
+        if snapshot is None:
+            return await self.refresh()
+        if self.services_mark is None and self.masters_mark is None:
+            self.services_mark = snapshot.services_updated_at
+            self.masters_mark = snapshot.masters_updated_at
+
+        services = await self.service_repo.get_changed_since(sync_since(self.services_mark))
+        masters = await self.master_repo.get_changed_since(sync_since(self.masters_mark))
+        sync_rows_total.inc(len(services), table="services")
+        sync_rows_total.inc(len(masters), table="masters")
+        self.services_mark = advance_mark(self.services_mark, services)
+        self.masters_mark = advance_mark(self.masters_mark, masters)
+
+        # Строки из окна запаса в основном уже есть в снимке без изменений
+        services = [service for service in services if snapshot.services.get(service.id) != service]
+        masters = [master for master in masters if snapshot.masters.get(master.id) != master]
+        if not services and not masters:
+            return snapshot
+
+        sync_changes_total.inc(len(services), table="services")
+        sync_changes_total.inc(len(masters), table="masters")
+        logger.info(f"Снимок каталога обновлен: изменено услуг {len(services)}, мастеров {len(masters)}")
+        snapshot = snapshot.merge(services, masters, created_at=datetime.now(timezone.utc))
+        await asyncio.to_thread(self.snapshot_repo.save, snapshot)
+        return snapshot
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except DatabaseUnavailableError as e:
+                logger.warning(f"Снимок каталога не обновлен, база недоступна: {e}")
+            except Exception as e:
+                logger.error(f"Ошибка при синхронизации снимка каталога: {e}")
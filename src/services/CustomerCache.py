@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from src.config.Database import DatabaseUnavailableError
+from src.models.users.Customer import Customer
+from src.repository.CustomerRepository import CustomerRepository
+from src.utils.dates import advance_mark, sync_since
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+customer_cache_requests_total = metrics.counter(
+    "customer_cache_requests_total", "Обращений к кэшу клиентов", ("result",)
+)
+customer_sync_rows_total = metrics.counter(
+    "customer_sync_rows_total", "Строк клиентов, прочитанных инкрементальной синхронизацией"
+)
+
+
+class CustomerCache:
+    """
+    Клиенты в памяти процесса по telegram_id.
+
+    Кэш заполняется промахами (клиент читается из базы один раз) и своими
+    записями процесса (put), а изменения других процессов раз в
+    interval_seconds подтягиваются по updated_at - только строки после
+    отметки синхронизации и только для клиентов, которые уже есть в кэше.
+    Наружу отдаются копии: изменение объекта в хендлере до записи в базу
+    не портит кэш. Размер ограничен max_size, вытесняются давно не
+    использованные.
+    """
+
+    def __init__(
+            self,
+            customer_repository: CustomerRepository = None,
+            interval_seconds: float = 30,
+            max_size: int = 50000
+    ):
+        self.customer_repo = customer_repository or CustomerRepository()
+        self.interval_seconds = interval_seconds
+        self.max_size = max_size
+        self._customers: "OrderedDict[int, Customer]" = OrderedDict()
+        # Все, что изменилось до создания кэша, будет прочитано промахом
+        self.mark: Optional[datetime] = datetime.now(timezone.utc)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запускает фоновую синхронизацию"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую синхронизацию"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def get_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, Customer]:
+        """Клиенты по telegram_id (для DataLoader): из кэша, отсутствующие - одним запросом к базе"""
+        found = {}
+        missing = []
+        for telegram_id in telegram_ids:
+            customer = self._customers.get(telegram_id)
+            if customer is None:
+                missing.append(telegram_id)
+            else:
+                self._customers.move_to_end(telegram_id)
+                found[telegram_id] = replace(customer)
+        customer_cache_requests_total.inc(len(found), result="hit")
+        customer_cache_requests_total.inc(len(missing), result="miss")
+
+        if missing:
+            loaded = await self.customer_repo.get_by_telegram_ids(missing)
+            for customer in loaded.values():
+                self.put(customer)
+                found[customer.telegram_id] = replace(customer)
+        return found
+
+    def put(self, customer: Customer):
+        """Кладет актуальную версию клиента (после записи в базу или чтения из нее)"""
+        if customer.telegram_id is None:
+            return
+        self._customers[customer.telegram_id] = replace(customer)
+        self._customers.move_to_end(customer.telegram_id)
+        while len(self._customers) > self.max_size:
+            self._customers.popitem(last=False)
+
+    def evict(self, telegram_id: int):
+        self._customers.pop(telegram_id, None)
+
+    def apply(self, customers: Iterable[Customer]) -> int:
+        """Применяет изменения из базы к закэшированным клиентам; возвращает число обновленных"""
+        updated = 0
+        for customer in customers:
+            cached = self._customers.get(customer.telegram_id)
+            # Версию из put() новее прочитанной раньше нее синхронизации не затираем
+            if cached is None or cached == customer:
+                continue
+            if cached.updated_at is None or customer.updated_at >= cached.updated_at:
+                self._customers[customer.telegram_id] = customer
+                updated += 1
+        return updated
+
+    async def sync(self) -> int:
+        """Одна инкрементальная синхронизация: строки с updated_at после отметки"""
+        customers = await self.customer_repo.get_changed_since(sync_since(self.mark))
+        customer_sync_rows_total.inc(len(customers))
+        self.mark = advance_mark(self.mark, customers)
+        return self.apply(customers)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                updated = await self.sync()
+                if updated:
+                    logger.info(f"Кэш клиентов: обновлено {updated}")
+            except asyncio.CancelledError:
+                raise
+            except DatabaseUnavailableError as e:
+                logger.warning(f"Кэш клиентов не синхронизирован, база недоступна: {e}")
+            except Exception as e:
+                logger.error(f"Ошибка при синхронизации кэша клиентов: {e}")
+
+
+# Глобальный экземпляр
+customer_cache = CustomerCache()
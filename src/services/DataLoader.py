@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BatchLoadFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class DataLoader:
+    """
+    Загрузчик в стиле DataLoader: объединяет все load(), вызванные за один
+    проход цикла событий, в один пакетный запрос и запоминает результаты
+    на время жизни загрузчика (одного апдейта).
+
+    batch_load_fn получает список уникальных ключей и возвращает словарь
+    {ключ: значение}; отсутствующие ключи превращаются в None.
+    """
+
+    def __init__(self, batch_load_fn: BatchLoadFn, max_batch_size: int = 500):
+        self.batch_load_fn = batch_load_fn
+        self.max_batch_size = max_batch_size
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._scheduled = False
+
+    def load(self, key: Hashable) -> asyncio.Future:
+        """Возвращает future значения по ключу; запрос уходит в ближайшем пакете"""
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append(key)
+
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return future
+
+    def load_many(self, keys: Iterable[Hashable]) -> Awaitable[List[Optional[Any]]]:
+        """Загружает несколько ключей одним пакетом, сохраняя порядок"""
+        return asyncio.gather(*[self.load(key) for key in keys])
+
+    def prime(self, key: Hashable, value: Any):
+        """Кладет уже известное значение в кэш, если его там нет"""
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    def clear(self, key: Hashable):
+        """Сбрасывает кэш по ключу (например, после изменения сущности)"""
+        self._cache.pop(key, None)
+
+    def _dispatch(self):
+        self._scheduled = False
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch_size):
+            asyncio.ensure_future(self._run_batch(queue[start:start + self.max_batch_size]))
+
+    async def _run_batch(self, keys: List[Hashable]):
+        try:
+            results = await self.batch_load_fn(keys)
+        except Exception as e:
+            logger.error(f"Ошибка пакетной загрузки {len(keys)} ключей: {e}")
+            for key in keys:
+                # Ошибки не кэшируем: следующий load() повторит запрос
+                future = self._cache.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._cache.get(key)
+            if future is not None and not future.done():
+                future.set_result(results.get(key))
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from src.models.Service import Service
+from src.models.users.Customer import Customer
+from src.models.users.Master import Master
+from src.repository.CustomerRepository import CustomerRepository
+from src.repository.MasterRepository import MasterRepository
+from src.repository.OrderRepository import OrderRepository
+from src.repository.ServiceRepository import ServiceRepository
+from src.services.CustomerCache import CustomerCache, customer_cache as default_customer_cache
+from src.services.DataLoader import DataLoader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BookingContext:
+    """Данные, необходимые для оформления заказа"""
+    customer: Optional[Customer] = None
+    master: Optional[Master] = None
+    service: Optional[Service] = None
+
+
+class Loaders:
+    """
+    Набор загрузчиков одного апдейта.
+    Создается DataLoaderMiddleware и передается в хендлеры как `loaders`.
+    """
+
+    def __init__(self, master_repo: MasterRepository = None, service_repo: ServiceRepository = None,
+                 customer_repo: CustomerRepository = None, order_repo: OrderRepository = None,
+                 customer_cache: CustomerCache = None):
+        self.master_repo = master_repo or MasterRepository()
+        self.service_repo = service_repo or ServiceRepository()
+        self.customer_repo = customer_repo or CustomerRepository()
+        self.order_repo = order_repo or OrderRepository()
+        self.customer_cache = customer_cache or default_customer_cache
+
+        self.masters = DataLoader(self.master_repo.get_by_ids)
+        self.services = DataLoader(self.service_repo.get_by_ids)
+        self.customers = DataLoader(self.customer_repo.get_by_ids)
+        self.orders = DataLoader(self.order_repo.get_by_ids)
+        # Клиент по telegram_id нужен на каждой записи - читается через кэш процесса
+        self.customers_by_telegram_id = DataLoader(self.customer_cache.get_by_telegram_ids)
+
+    async def load_booking(self, telegram_id: int, master_id: int, service_id: int) -> BookingContext:
+        """Параллельно получает клиента, мастера и услугу"""
+        customer, master, service = await asyncio.gather(
+            self.customers_by_telegram_id.load(telegram_id),
+            self.masters.load(master_id),
+            self.services.load(service_id)
+        )
+        return BookingContext(customer=customer, master=master, service=service)
+
+    async def load_master_service(self, master_id: int, service_id: int) -> Tuple[Optional[Master], Optional[Service]]:
+        """Параллельно получает мастера и услугу"""
+        master, service = await asyncio.gather(self.masters.load(master_id), self.services.load(service_id))
+        return master, service
+
+    async def load_master_services(self, master: Master) -> List[Service]:
+        """Активные услуги мастера по уже загруженным service_ids, без повторного JOIN по мастеру"""
+        services = await self.services.load_many(master.service_ids)
+        active = [service for service in services if service and service.is_active]
+        return sorted(active, key=lambda service: (service.category, service.name))
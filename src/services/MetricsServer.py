@@ -0,0 +1,34 @@
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from src.utils.metrics import Registry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в формате Prometheus"""
+
+    def __init__(self, registry: Registry = None, host: str = "0.0.0.0", port: int = 9100):
+        self.registry = registry or metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
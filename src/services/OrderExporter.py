@@ -0,0 +1,82 @@
+import csv
+import json
+import logging
+from dataclasses import fields
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+from src.models.Order import Order, OrderStatus
+from src.repository.OrderRepository import OrderRepository
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "jsonl", "raw")
+
+ORDER_COLUMNS = [field.name for field in fields(Order)]
+
+
+def _to_plain(value):
+    """Приводит значение поля заказа к виду, пригодному для CSV/JSON"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class OrderExporter:
+    """Выгрузка заказов в файл с постоянным потреблением памяти"""
+
+    def __init__(self, order_repository: OrderRepository = None, fetch_size: int = 1000):
+        self.order_repo = order_repository or OrderRepository()
+        self.fetch_size = fetch_size
+
+    async def export(
+            self,
+            output: str,
+            export_format: str = "csv",
+            start_date: datetime = None,
+            end_date: datetime = None,
+            master_id: int = None,
+            status: OrderStatus = None
+    ) -> int:
+        """Выгружает заказы в файл, возвращает количество выгруженных строк"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+
+        filters = dict(start_date=start_date, end_date=end_date, master_id=master_id, status=status)
+
+        if export_format == "raw":
+            # COPY пишет файл напрямую из протокола, строки не попадают в Python-объекты
+            result = await self.order_repo.copy_to_file(output, **filters)
+            count = int(result.split()[-1]) if result else 0
+        else:
+            with open(output, "w", newline="", encoding="utf-8") as file:
+                if export_format == "csv":
+                    count = await self._write_csv(file, filters)
+                else:
+                    count = await self._write_jsonl(file, filters)
+
+        logger.info(f"Выгружено заказов: {count} -> {output} ({export_format})")
+        return count
+
+    async def _write_csv(self, file, filters: dict) -> int:
+        writer = csv.writer(file)
+        writer.writerow(ORDER_COLUMNS)
+        count = 0
+        async for order in self.order_repo.iterate(fetch_size=self.fetch_size, **filters):
+            writer.writerow([_to_plain(getattr(order, column)) for column in ORDER_COLUMNS])
+            count += 1
+        return count
+
+    async def _write_jsonl(self, file, filters: dict) -> int:
+        count = 0
+        async for order in self.order_repo.iterate(fetch_size=self.fetch_size, **filters):
+            record = {column: _to_plain(getattr(order, column)) for column in ORDER_COLUMNS}
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write("\n")
+            count += 1
+        return count
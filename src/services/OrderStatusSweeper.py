@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from src.models.Order import OrderStatus
+from src.repository.OrderRepository import OrderRepository
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+order_status_sweeps_total = metrics.counter(
+    "order_status_sweeps_total", "Заказов, переведенных в новый статус по времени записи", ("status",)
+)
+
+# Нижняя граница полного прохода - раньше нее записей нет
+SWEEP_FROM_START = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class Transition(NamedTuple):
+    from_statuses: List[OrderStatus]
+    status: OrderStatus
+    # True - запись закончилась (с запасом grace), False - началась, но еще идет
+    ended: bool
+
+
+# Шага подтверждения записи в боте нет: заказы создаются pending, и не отмененная
+# запись считается состоявшейся. no_show ставит администратор (/no_show).
+# Порядок важен только для логов: переходы не пересекаются по условиям
+TRANSITIONS = (
+    Transition([OrderStatus.PENDING, OrderStatus.CONFIRMED], OrderStatus.IN_PROGRESS, ended=False),
+    Transition(
+        [OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS], OrderStatus.COMPLETED, ended=True
+    ),
+)
+
+
+class OrderStatusSweeper:
+    """
+    Фоновый перевод прошедших заказов по статусам: активные (pending,
+    confirmed) становятся in_progress с начала записи и completed после
+    ее окончания с запасом grace. Переводы идут пачками по batch_size
+    строк одним UPDATE с FOR UPDATE SKIP LOCKED, поэтому заказы, которые
+    прямо сейчас создаются или отменяются, не ждут проход, а доходят
+    до следующего. Смотрятся только записи за lookback_days - старые
+    секции не читаются; первый проход после запуска идет без ограничения,
+    чтобы подобрать заказы, пропущенные, пока бот стоял дольше lookback_days.
+    Дневная статистика заказов обновляется триггером на orders.
+    """
+
+    def __init__(
+            self,
+            order_repository: OrderRepository = None,
+            interval_seconds: float = 300,
+            batch_size: int = 500,
+            grace: timedelta = timedelta(minutes=30),
+            lookback_days: int = 7
+    ):
+        self.order_repo = order_repository or OrderRepository()
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.grace = grace
+        self.lookback_days = lookback_days
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запускает фоновый перевод статусов"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновый перевод статусов"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _sweep(self, transition: Transition, until: datetime, since: datetime) -> int:
+        """Переводит все подходящие заказы пачками, каждая пачка - отдельная короткая транзакция"""
+        total = 0
+        while True:
+            moved = await self.order_repo.transition_past(
+                transition.from_statuses, transition.status, until, since, self.batch_size, transition.ended
+            )
+            total += moved
+            if moved < self.batch_size:
+                return total
+            # Между пачками даем поработать хендлерам
+            await asyncio.sleep(0)
+
+    async def run_once(self, now: datetime = None, full: bool = False) -> Dict[OrderStatus, int]:
+        """
+        Один проход по всем переходам; возвращает число переведенных заказов по статусам.
+        full - без ограничения lookback_days (все секции).
+        """
+        now = now or datetime.now(timezone.utc)
+        since = SWEEP_FROM_START if full else now - timedelta(days=self.lookback_days)
+        counts = {}
+        for transition in TRANSITIONS:
+            until = now - self.grace if transition.ended else now
+            moved = await self._sweep(transition, until, since)
+            if moved:
+                order_status_sweeps_total.inc(moved, status=transition.status.value)
+                counts[transition.status] = counts.get(transition.status, 0) + moved
+        if counts:
+            logger.info(
+                "Статусы заказов обновлены: "
+                + ", ".join(f"{status.value} {count}" for status, count in counts.items())
+            )
+        return counts
+
+    async def _run(self):
+        full = True
+        while True:
+            try:
+                await self.run_once(full=full)
+                # Полный проход повторяется, пока не пройдет успешно
+                full = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении статусов прошедших заказов: {e}")
+            await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from src.utils.metrics import metrics
+from src.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Полосы приоритета: интерактивные ответы всегда обслуживаются раньше массовых рассылок
+INTERACTIVE = 0
+BULK = 1
+LANE_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+queue_depth = metrics.gauge("outbound_queue_depth", "Запросов в очереди на отправку", ("lane",))
+sent_total = metrics.counter("outbound_requests_total", "Отправленных через очередь запросов", ("lane",))
+wait_seconds_total = metrics.counter("outbound_wait_seconds_total", "Суммарное ожидание в очереди, с", ("lane",))
+retry_after_total = metrics.counter("outbound_retry_after_total", "Ответов 429 (retry_after) от Telegram", ("lane",))
+
+
+@contextmanager
+def bulk_sending():
+    """Все отправки внутри блока идут по полосе массовых рассылок"""
+    token = send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+ChatId = Union[int, str]
+
+
+@dataclass
+class _Waiter:
+    chat_id: ChatId
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class OutboundDispatcher(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, через которую проходят все исходящие запросы с chat_id
+    (message.answer, edit_text, send_photo и т.д.).
+
+    Лимиты Telegram соблюдаются ведрами токенов: общее (~30 сообщений/с),
+    на личный чат (1/с) и на группу (20/мин). Ответ 429 приостанавливает
+    чат на retry_after секунд, после чего запрос повторяется.
+    """
+
+    # Сколько ожидающих в полосе просматривать за один проход выдачи
+    SCAN_LIMIT = 1000
+    # Как часто выбрасывать ведра неактивных чатов, с
+    EVICT_INTERVAL = 60.0
+
+    def __init__(
+            self,
+            global_rate: float = 30,
+            private_rate: float = 1,
+            private_burst: float = 3,
+            group_per_minute: float = 20,
+            group_burst: float = 5,
+            max_retries: int = 3
+    ):
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_per_minute / 60
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[ChatId, TokenBucket] = {}
+        self._lanes: Dict[int, Deque[_Waiter]] = {INTERACTIVE: deque(), BULK: deque()}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._evicted_at = time.monotonic()
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery и т.п. под лимиты сообщений не попадают
+            return await make_request(bot, method)
+
+        lane = send_priority.get()
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, lane)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                retry_after_total.inc(lane=LANE_NAMES[lane])
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood control в чате {chat_id}: пауза {e.retry_after} с (попытка {attempt})")
+                self._chat_bucket(chat_id, time.monotonic()).pause(time.monotonic(), e.retry_after)
+
+    async def acquire(self, chat_id: ChatId, lane: int = INTERACTIVE):
+        """Ждет разрешения на отправку в чат"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append(_Waiter(chat_id, future, time.monotonic()))
+        queue_depth.set(len(self._lanes[lane]), lane=LANE_NAMES[lane])
+        self._wake.set()
+        await future
+
+    def stats(self) -> Dict[str, int]:
+        """Глубина очередей по полосам"""
+        return {LANE_NAMES[lane]: len(queue) for lane, queue in self._lanes.items()}
+
+    def _ensure_worker(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Останавливает выдачу разрешений"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _chat_bucket(self, chat_id: ChatId, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, self.group_burst, now)
+            else:
+                bucket = TokenBucket(self.private_rate, self.private_burst, now)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _grant_one(self, now: float) -> Tuple[bool, Optional[float]]:
+        """Выдает разрешение одному ожидающему. Возвращает (выдано, через сколько пробовать снова)"""
+        if not any(self._lanes.values()):
+            return False, None
+
+        global_wait = self.global_bucket.wait_time(now)
+        if global_wait > 0:
+            return False, global_wait
+
+        min_wait = None
+        for lane in (INTERACTIVE, BULK):
+            queue = self._lanes[lane]
+            index = 0
+            while index < len(queue) and index < self.SCAN_LIMIT:
+                waiter = queue[index]
+                if waiter.future.done():
+                    # Отправитель отменил ожидание
+                    del queue[index]
+                    continue
+
+                bucket = self._chat_bucket(waiter.chat_id, now)
+                wait = bucket.wait_time(now)
+                if wait == 0:
+                    bucket.consume(now)
+                    self.global_bucket.consume(now)
+                    del queue[index]
+                    waiter.future.set_result(None)
+
+                    lane_name = LANE_NAMES[lane]
+                    sent_total.inc(lane=lane_name)
+                    wait_seconds_total.inc(now - waiter.enqueued_at, lane=lane_name)
+                    queue_depth.set(len(queue), lane=lane_name)
+                    return True, 0.0
+
+                min_wait = wait if min_wait is None else min(min_wait, wait)
+                index += 1
+            queue_depth.set(len(queue), lane=LANE_NAMES[lane])
+
+        return False, min_wait
+
+    def _evict_idle_buckets(self, now: float):
+        if now - self._evicted_at < self.EVICT_INTERVAL:
+            return
+        self._evicted_at = now
+        idle = [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.is_full(now)]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
+
+    async def _run(self):
+        granted_in_row = 0
+        while True:
+            now = time.monotonic()
+            granted, retry_in = self._grant_one(now)
+            if granted:
+                granted_in_row += 1
+                # Не монополизируем цикл событий при длинной очереди
+                if granted_in_row % 100 == 0:
+                    await asyncio.sleep(0)
+                continue
+
+            granted_in_row = 0
+            self._evict_idle_buckets(now)
+            self._wake.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), retry_in)
+
+
+# Глобальный экземпляр
+outbound_dispatcher = OutboundDispatcher()
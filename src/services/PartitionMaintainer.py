@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from src.repository.OrderRepository import OrderRepository
+from src.utils.dates import add_months, month_start
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintainer:
+    """
+    Фоновое обслуживание секций заказов: заранее создает будущие месяцы
+    и, если задан archive_after_months, архивирует старые секции.
+    """
+
+    def __init__(
+            self,
+            order_repository: OrderRepository = None,
+            interval_seconds: float = 6 * 3600,
+            months_ahead: int = 3,
+            archive_after_months: Optional[int] = None,
+            archive_dir: str = "archive"
+    ):
+        self.order_repo = order_repository or OrderRepository()
+        self.interval_seconds = interval_seconds
+        self.months_ahead = months_ahead
+        self.archive_after_months = archive_after_months
+        self.archive_dir = archive_dir
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запускает фоновую задачу обслуживания"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую задачу"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run_once(self):
+        """Один проход обслуживания секций"""
+        await self.order_repo.ensure_partitions(self.months_ahead)
+
+        # Токены идемпотентности нужны только на время повторных нажатий
+        await self.order_repo.purge_client_tokens(datetime.now(timezone.utc) - timedelta(days=1))
+
+        if self.archive_after_months:
+            cutoff = add_months(month_start(datetime.now(timezone.utc)), -self.archive_after_months)
+            archived = await self.order_repo.archive_partitions(cutoff, self.archive_dir)
+            if archived:
+                logger.info(f"Заархивировано секций заказов: {len(archived)}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания секций заказов: {e}")
+            await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,306 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+
+from src.models.Order import OrderStatus
+from src.repository.OrderRepository import OrderRepository
+from src.repository.ReminderRepository import ReminderRepository
+from src.services.OutboundDispatcher import bulk_sending
+from src.utils.dates import wall_clock
+from src.utils.messages import REMINDER_MESSAGES, ALL_SERVICES
+
+logger = logging.getLogger(__name__)
+
+# За сколько до записи отправляется напоминание каждого вида
+REMINDER_OFFSETS = {
+    '24h': timedelta(hours=24),
+    '2h': timedelta(hours=2),
+}
+
+
+@dataclass(order=True)
+class ReminderEntry:
+    fire_at: datetime
+    seq: int
+    order_id: int = field(compare=False)
+    kind: str = field(compare=False)
+    appointment_datetime: datetime = field(compare=False)
+    telegram_id: int = field(compare=False)
+    master_name: str = field(compare=False, default="")
+    service_name: str = field(compare=False, default="")
+    cancelled: bool = field(compare=False, default=False)
+
+
+class ReminderQueue:
+    """
+    Очередь напоминаний на двоичной куче по времени срабатывания.
+    Вставка и извлечение - O(log n); замена ранее запланированного
+    напоминания - O(1) с ленивым удалением из кучи.
+    """
+
+    def __init__(self):
+        self._heap: List[ReminderEntry] = []
+        self._entries: Dict[Tuple[int, str], ReminderEntry] = {}
+        self._seq = itertools.count()
+        self._cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        return key in self._entries
+
+    def get(self, order_id: int, kind: str) -> Optional[ReminderEntry]:
+        return self._entries.get((order_id, kind))
+
+    def push(self, entry: ReminderEntry):
+        """Добавляет напоминание, заменяя ранее запланированное для той же записи и вида"""
+        self._discard(entry.order_id, entry.kind)
+        entry.seq = next(self._seq)
+        self._entries[(entry.order_id, entry.kind)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _discard(self, order_id: int, kind: str):
+        """Снимает запланированное напоминание; из кучи оно удаляется лениво"""
+        entry = self._entries.pop((order_id, kind), None)
+        if entry:
+            entry.cancelled = True
+            self._cancelled += 1
+
+        # Если отмененных записей в куче больше половины - перестраиваем её
+        if self._cancelled > len(self._heap) // 2 and self._cancelled > 1024:
+            self._heap = [entry for entry in self._heap if not entry.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def next_fire_at(self) -> Optional[datetime]:
+        """Время ближайшего срабатывания"""
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        return self._heap[0].fire_at if self._heap else None
+
+    def pop_due(self, now: datetime, limit: int = 100) -> List[ReminderEntry]:
+        """Извлекает напоминания, время которых наступило"""
+        due = []
+        while len(due) < limit:
+            fire_at = self.next_fire_at()
+            if fire_at is None or fire_at > now:
+                break
+            entry = heapq.heappop(self._heap)
+            del self._entries[(entry.order_id, entry.kind)]
+            due.append(entry)
+        return due
+
+
+class ReminderScheduler:
+    """
+    Напоминания клиентам о записи за 24 и за 2 часа.
+    Записи подгружаются окнами, ставятся в очередь по времени срабатывания,
+    а факт отправки сохраняется в order_reminders, поэтому после рестарта
+    напоминания не дублируются и не теряются. Напоминание отмечается
+    до отправки и подтверждается после нее; неподтвержденные отметки
+    (падение между ними) снимаются при запуске, и такие напоминания
+    уходят снова - в худшем случае клиент получит его дважды, но не
+    останется без него.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            reminder_repository: ReminderRepository = None,
+            order_repository: OrderRepository = None,
+            window: timedelta = timedelta(minutes=10),
+            retry_delay: timedelta = timedelta(seconds=30)
+    ):
+        self.bot = bot
+        self.reminder_repo = reminder_repository or ReminderRepository()
+        self.order_repo = order_repository or OrderRepository()
+        self.window = window
+        self.retry_delay = retry_delay
+        self.queue = ReminderQueue()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._loaded_until: Optional[datetime] = None
+        self._last_load: Optional[datetime] = None
+
+    def start(self):
+        """Запускает загрузку окон и отправку напоминаний"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._load_loop()),
+                asyncio.create_task(self._fire_loop()),
+            ]
+
+    async def stop(self):
+        """Останавливает фоновые задачи"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def load_window(self, now: datetime = None) -> int:
+        """
+        Подгружает очередное окно записей. Первый раз читается весь горизонт
+        (ближайшие сутки), дальше - только новый отрезок горизонта и записи,
+        созданные или измененные с прошлой загрузки.
+        """
+        now = now or datetime.now(timezone.utc)
+        horizon = now + max(REMINDER_OFFSETS.values()) + 2 * self.window
+
+        if self._loaded_until is None:
+            # Отметки, оставшиеся от прерванных отправок прошлого запуска
+            released = await self.reminder_repo.release_unconfirmed()
+            if released:
+                logger.warning(f"Неподтвержденных напоминаний возвращено в очередь: {released}")
+            rows = await self.reminder_repo.get_upcoming(now, horizon)
+        else:
+            rows = await self.reminder_repo.get_upcoming(max(now, self._loaded_until), horizon)
+            # Перекрытие на одно окно страхует от гонки с транзакциями, закоммиченными позже
+            rows += await self.reminder_repo.get_upcoming(
+                now, self._loaded_until, changed_since=self._last_load - self.window
+            )
+        self._loaded_until = horizon
+        self._last_load = now
+
+        scheduled = 0
+        for row in rows:
+            scheduled += self._schedule(row, now)
+        if scheduled:
+            self._wakeup.set()
+        return scheduled
+
+    def _schedule(self, row: dict, now: datetime) -> int:
+        appointment = row['appointment_datetime']
+        sent = set(row['sent_kinds'] or [])
+        scheduled = 0
+        missed_kind = None
+        has_upcoming = False
+
+        # От более раннего напоминания к более позднему
+        for kind, offset in sorted(REMINDER_OFFSETS.items(), key=lambda item: -item[1]):
+            if kind in sent:
+                # Более позднее уже ушло - более ранние пропущенные не нужны
+                missed_kind = None
+                continue
+            fire_at = appointment - offset
+            if fire_at <= now:
+                # Пропущено (запись создана позже или бот был выключен)
+                missed_kind = kind
+                continue
+
+            has_upcoming = True
+            existing = self.queue.get(row['order_id'], kind)
+            if existing and existing.fire_at == fire_at:
+                continue
+            self.queue.push(self._entry(row, kind, fire_at))
+            scheduled += 1
+
+        # Пропущенное отправляем, только если впереди не осталось более позднего напоминания
+        if missed_kind and not has_upcoming and now < appointment \
+                and (row['order_id'], missed_kind) not in self.queue:
+            self.queue.push(self._entry(row, missed_kind, now))
+            scheduled += 1
+        return scheduled
+
+    @staticmethod
+    def _entry(row: dict, kind: str, fire_at: datetime) -> ReminderEntry:
+        return ReminderEntry(
+            fire_at=fire_at,
+            seq=0,
+            order_id=row['order_id'],
+            kind=kind,
+            appointment_datetime=row['appointment_datetime'],
+            telegram_id=row['telegram_id'],
+            master_name=row['master_name'],
+            service_name=row['service_name']
+        )
+
+    async def _load_loop(self):
+        while True:
+            try:
+                scheduled = await self.load_window()
+                if scheduled:
+                    logger.info(f"Запланировано напоминаний: {scheduled}, в очереди: {len(self.queue)}")
+            except Exception as e:
+                logger.error(f"Ошибка загрузки напоминаний: {e}")
+            await asyncio.sleep(self.window.total_seconds())
+
+    async def _fire_loop(self):
+        while True:
+            next_fire_at = self.queue.next_fire_at()
+            now = datetime.now(timezone.utc)
+            if next_fire_at is None or next_fire_at > now:
+                timeout = (next_fire_at - now).total_seconds() if next_fire_at else None
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+
+            due = self.queue.pop_due(now)
+            try:
+                await self._deliver_batch(due)
+            except Exception as e:
+                # Необработанные напоминания возвращаются в очередь и повторяются после паузы:
+                # инкрементальная загрузка окон их бы уже не перечитала
+                logger.error(f"Ошибка отправки напоминаний, в очередь возвращено {len(due)}: {e}")
+                self._retry(due)
+                await asyncio.sleep(self.retry_delay.total_seconds())
+
+    def _retry(self, entries: List[ReminderEntry]):
+        retry_at = datetime.now(timezone.utc) + self.retry_delay
+        for entry in entries:
+            if (entry.order_id, entry.kind) in self.queue or retry_at >= entry.appointment_datetime:
+                continue
+            entry.fire_at = retry_at
+            entry.cancelled = False
+            self.queue.push(entry)
+
+    async def _deliver_batch(self, entries: List[ReminderEntry]):
+        """Обработанные напоминания удаляются из entries: после ошибки в списке остаются необработанные"""
+        # Одним запросом проверяем, что записи все еще активны и не перенесены
+        orders = await self.order_repo.get_by_ids([entry.order_id for entry in entries])
+        while entries:
+            entry = entries[0]
+            order = orders.get(entry.order_id)
+            if order and order.status in (OrderStatus.PENDING, OrderStatus.CONFIRMED) \
+                    and order.appointment_datetime == entry.appointment_datetime:
+                await self._deliver(entry)
+            entries.pop(0)
+
+    async def _deliver(self, entry: ReminderEntry):
+        if not await self.reminder_repo.claim(entry.order_id, entry.kind):
+            return
+
+        text = REMINDER_MESSAGES[entry.kind].format(
+            master_name=entry.master_name,
+            service_name=ALL_SERVICES.get(entry.service_name, entry.service_name),
+            datetime=wall_clock(entry.appointment_datetime).strftime("%d.%m.%Y в %H:%M")
+        )
+        try:
+            # Лимиты и повтор после 429 обеспечивает OutboundDispatcher, напоминания идут полосой рассылок
+            with bulk_sending():
+                await self.bot.send_message(chat_id=entry.telegram_id, text=text, parse_mode="HTML")
+        except TelegramForbiddenError:
+            # Клиент заблокировал бота - повторять бессмысленно, отметку оставляем
+            logger.info(f"Клиент заказа {entry.order_id} заблокировал бота, напоминание пропущено")
+            await self.reminder_repo.confirm(entry.order_id, entry.kind)
+        except Exception as e:
+            logger.error(f"Не удалось отправить напоминание {entry.kind} по заказу {entry.order_id}: {e}")
+            await self.reminder_repo.release(entry.order_id, entry.kind)
+            # Повторим через окно, если запись к тому времени еще не началась
+            entry.fire_at = datetime.now(timezone.utc) + self.window
+            if entry.fire_at < entry.appointment_datetime:
+                self.queue.push(entry)
+        else:
+            await self.reminder_repo.confirm(entry.order_id, entry.kind)
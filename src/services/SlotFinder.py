@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from src.models.MasterSchedule import MasterSchedule
+from src.models.users.Master import Master
+from src.repository.AvailabilityRepository import AvailabilityRepository
+from src.repository.MasterRepository import MasterRepository
+from src.repository.ScheduleRepository import ScheduleRepository
+from src.repository.ServiceRepository import ServiceRepository
+from src.utils.availability import CELL_MINUTES, cells_mask, ranges_mask
+from src.utils.dates import wall_clock
+
+logger = logging.getLogger(__name__)
+
+# Маска занятости мастера за день: (master_id, день) -> биты занятых ячеек
+BusyDays = Dict[Tuple[int, date], int]
+
+
+@dataclass(slots=True)
+class Slot:
+    """Свободное окно мастера под услугу"""
+    master: Master
+    start: datetime
+    end: datetime
+
+
+class SlotFinder:
+    """
+    Поиск ближайших свободных окон по услуге среди всех мастеров.
+    Мастера, графики и маски занятости (master_availability) читаются
+    тремя запросами на весь период, окна собираются в памяти: по каждому
+    мастеру - ленивый генератор окон по времени, генераторы сливаются через
+    heapq.merge до первых limit окон. Свободное окно - то, что пройдет
+    проверку маской при записи (create_in_slot).
+    """
+
+    def __init__(
+            self,
+            master_repository: MasterRepository = None,
+            schedule_repository: ScheduleRepository = None,
+            availability_repository: AvailabilityRepository = None,
+            service_repository: ServiceRepository = None,
+            step_minutes: int = 15
+    ):
+        self.master_repo = master_repository or MasterRepository()
+        self.schedule_repo = schedule_repository or ScheduleRepository()
+        self.availability_repo = availability_repository or AvailabilityRepository()
+        self.service_repo = service_repository or ServiceRepository()
+        self.step_minutes = step_minutes
+
+    async def find_earliest(
+            self,
+            service_id: int,
+            start: datetime = None,
+            days: int = 14,
+            limit: int = 5,
+            per_master: int = 1
+    ) -> List[Slot]:
+        """
+        Первые limit окон за [start, start + days) по времени, при равном
+        времени - по рейтингу мастера. per_master ограничивает число окон
+        одного мастера, чтобы в выдаче были разные мастера.
+        """
+        start = wall_clock(start or datetime.now())
+        end = start + timedelta(days=days)
+
+        service = await self.service_repo.get_by_id(service_id)
+        if not service:
+            return []
+        masters = await self.master_repo.get_by_service(service_id)
+        if not masters:
+            return []
+
+        master_ids = [master.id for master in masters]
+        schedules, busy = await asyncio.gather(
+            self.schedule_repo.get_schedules(master_ids, start.date(), end.date()),
+            self.availability_repo.get_days(master_ids, start.date(), end.date())
+        )
+        return self.earliest_slots(
+            masters, schedules, busy, service.duration_minutes, start, end, limit, per_master
+        )
+
+    def earliest_slots(
+            self,
+            masters: Sequence[Master],
+            schedules: Dict[int, MasterSchedule],
+            busy: BusyDays,
+            duration_minutes: int,
+            start: datetime,
+            end: datetime,
+            limit: int,
+            per_master: int = 1
+    ) -> List[Slot]:
+        """Слияние окон всех мастеров; мастера уже отсортированы по рейтингу"""
+        streams = []
+        for rank, master in enumerate(masters):
+            schedule = schedules.get(master.id)
+            if not schedule:
+                continue
+            windows = self._master_windows(master.id, schedule, busy, duration_minutes, start, end)
+            # Ключ (время, место в рейтинге): при равном времени первым идет мастер с большим рейтингом
+            streams.append(zip(
+                itertools.islice(windows, per_master), itertools.repeat(rank), itertools.repeat(master)
+            ))
+
+        duration = timedelta(minutes=duration_minutes)
+        return [
+            Slot(master=master, start=window_start, end=window_start + duration)
+            for window_start, _, master in itertools.islice(
+                heapq.merge(*streams, key=lambda item: item[:2]), limit
+            )
+        ]
+
+    def _master_windows(
+            self,
+            master_id: int,
+            schedule: MasterSchedule,
+            busy: BusyDays,
+            duration_minutes: int,
+            start: datetime,
+            end: datetime
+    ) -> Iterator[datetime]:
+        """Начала свободных окон мастера по возрастанию, с шагом step_minutes"""
+        duration = timedelta(minutes=duration_minutes)
+        step = timedelta(minutes=self.step_minutes)
+        days = (end.date() - start.date()).days + 1
+
+        for day, intervals in schedule.working_days(start.date(), days):
+            midnight = datetime.combine(day, datetime.min.time())
+            # Свободные ячейки дня: рабочие и не занятые записями
+            free = ranges_mask(intervals) & ~busy.get((master_id, day), 0)
+            for range_start, range_end in intervals:
+                window_end = min(midnight + timedelta(minutes=range_end), end)
+                candidate = self._align(max(midnight + timedelta(minutes=range_start), start), midnight)
+
+                while candidate + duration <= window_end:
+                    minute = int((candidate - midnight).total_seconds()) // 60
+                    # Частично занятая ячейка считается занятой, как в маске
+                    needed = cells_mask(minute // CELL_MINUTES, -(-(minute + duration_minutes) // CELL_MINUTES))
+                    if free & needed == needed:
+                        yield candidate
+                    candidate += step
+
+    def _align(self, moment: datetime, midnight: datetime) -> datetime:
+        """Округляет момент вверх до сетки step_minutes от начала дня"""
+        step_seconds = self.step_minutes * 60
+        seconds = (moment - midnight).total_seconds()
+        aligned = -(-seconds // step_seconds) * step_seconds
+        return midnight + timedelta(seconds=aligned)
+
+
+# Глобальный экземпляр
+slot_finder = SlotFinder()
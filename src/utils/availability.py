@@ -0,0 +1,42 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable
+
+from src.models.MasterSchedule import TimeRange
+from src.utils.dates import wall_clock
+
+# Сутки мастера делятся на ячейки по CELL_MINUTES; ячейка i - бит i маски
+CELL_MINUTES = 5
+CELLS_PER_DAY = 24 * 60 // CELL_MINUTES
+
+
+def cells_mask(first_cell: int, last_cell: int) -> int:
+    """Маска ячеек [first_cell, last_cell)"""
+    if last_cell <= first_cell:
+        return 0
+    return ((1 << (last_cell - first_cell)) - 1) << first_cell
+
+
+def interval_masks(start: datetime, duration_minutes: int) -> Dict[date, int]:
+    """Маски ячеек интервала по дням (запись может переходить через полночь)"""
+    start = wall_clock(start)
+    end = start + timedelta(minutes=duration_minutes)
+    masks: Dict[date, int] = {}
+    day = start.date()
+    while True:
+        midnight = datetime.combine(day, datetime.min.time())
+        first_cell = max(0, int((start - midnight).total_seconds() // (CELL_MINUTES * 60)))
+        # Частично занятая ячейка считается занятой
+        last_cell = min(CELLS_PER_DAY, -int(-(end - midnight).total_seconds() // (CELL_MINUTES * 60)))
+        if last_cell > first_cell:
+            masks[day] = cells_mask(first_cell, last_cell)
+        day += timedelta(days=1)
+        if datetime.combine(day, datetime.min.time()) >= end:
+            return masks
+
+
+def ranges_mask(ranges: Iterable[TimeRange]) -> int:
+    """Маска рабочих интервалов дня (минуты от начала дня)"""
+    mask = 0
+    for start_minute, end_minute in ranges:
+        mask |= cells_mask(-(-start_minute // CELL_MINUTES), end_minute // CELL_MINUTES)
+    return mask
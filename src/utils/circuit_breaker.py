@@ -0,0 +1,54 @@
+import logging
+import time
+from typing import Optional
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+circuit_open = metrics.gauge("circuit_breaker_open", "Автомат разомкнут (1) или замкнут (0)", ("name",))
+circuit_trips_total = metrics.counter("circuit_breaker_trips_total", "Размыканий автомата", ("name",))
+
+
+class CircuitBreaker:
+    """
+    Автомат для внешней зависимости: после failure_threshold сбоев подряд
+    размыкается, и вызовы сразу получают отказ вместо ожидания таймаутов.
+    Замыкает автомат тот, кто проверяет восстановление (reset).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        circuit_open.set(0, name=name)
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def record_success(self):
+        if not self.is_open:
+            self.failures = 0
+
+    def record_failure(self) -> bool:
+        """Учитывает сбой; True - автомат только что разомкнулся"""
+        if self.is_open:
+            return False
+        self.failures += 1
+        if self.failures < self.failure_threshold:
+            return False
+        self.opened_at = time.monotonic()
+        circuit_open.set(1, name=self.name)
+        circuit_trips_total.inc(name=self.name)
+        logger.error(f"Автомат {self.name} разомкнут после {self.failures} сбоев подряд")
+        return True
+
+    def reset(self):
+        """Замыкает автомат после успешной проверки"""
+        if self.is_open:
+            logger.info(f"Автомат {self.name} замкнут через {time.monotonic() - self.opened_at:.0f} с")
+        self.failures = 0
+        self.opened_at = None
+        circuit_open.set(0, name=self.name)
@@ -0,0 +1,60 @@
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+# updated_at ставится в начале транзакции, а видна строка после фиксации:
+# запас назад по отметке не дает потерять изменения из долгих транзакций
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def month_start(value: datetime) -> datetime:
+    """Начало месяца (UTC) для момента времени"""
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Сдвигает начало месяца на указанное количество месяцев"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def wall_clock(value: datetime) -> datetime:
+    """
+    Время "по часам салона" без часового пояса.
+    Бот создает записи с наивным локальным временем хоста, и asyncpg при
+    записи в timestamptz тоже считает наивное время локальным (astimezone),
+    а читает уже с поясом UTC. Поэтому время с поясом приводится к
+    локальному поясу хоста - так сравнение верно на хосте в любом поясе.
+    """
+    if value.tzinfo:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def host_timezone() -> str:
+    """
+    Имя локального пояса хоста для SQL - те же часы салона, что и wall_clock:
+    переменная TZ (она же задает пояс Python), иначе ссылка /etc/localtime.
+    Если имя не определить, считается UTC.
+    """
+    name = os.getenv("TZ", "").lstrip(":")
+    if not name:
+        path = os.path.realpath("/etc/localtime")
+        name = path.split("zoneinfo/", 1)[1] if "zoneinfo/" in path else "UTC"
+    # Имя подставляется в текст SQL-функций
+    return name if re.fullmatch(r"[A-Za-z0-9_+\-/]+", name) else "UTC"
+
+
+def sync_since(high_water_mark: Optional[datetime]) -> Optional[datetime]:
+    """С какого момента читать изменения после отметки синхронизации (None - все строки)"""
+    return high_water_mark - SYNC_OVERLAP if high_water_mark else None
+
+
+def advance_mark(high_water_mark: Optional[datetime], rows: Iterable) -> Optional[datetime]:
+    """Новая отметка синхронизации: самый поздний updated_at среди прочитанных строк и прежней отметки"""
+    marks = [row.updated_at for row in rows if row.updated_at]
+    if high_water_mark:
+        marks.append(high_water_mark)
+    return max(marks, default=None)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import suppress
+from typing import Optional
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Префикс имени задачи апдейта, его проставляет HandlerLabelMiddleware
+HANDLER_TASK_PREFIX = "handler:"
+
+loop_lag = metrics.histogram(
+    "event_loop_lag_seconds", "Опоздание пробуждения цикла событий, с", (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+loop_stalls_total = metrics.counter(
+    "event_loop_stalls_total", "Блокировок цикла событий дольше порога", ("handler",)
+)
+
+
+def task_handler_label(task: Optional[asyncio.Task]) -> str:
+    """Имя хендлера, который выполняется в задаче, или '-' для прочих задач"""
+    if task is None:
+        return "-"
+    name = task.get_name()
+    return name[len(HANDLER_TASK_PREFIX):] if name.startswith(HANDLER_TASK_PREFIX) else "-"
+
+
+class LoopWatchdog:
+    """
+    Сторож цикла событий.
+
+    Корутина-пульс просыпается каждые interval секунд и пишет в метрику,
+    на сколько опоздало пробуждение. Поток-сторож следит за пульсом: если
+    его нет дольше threshold, цикл кем-то заблокирован - снимаем стек
+    главного потока и имя выполняющейся задачи и пишем в лог (один раз на блокировку).
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1, stack_depth: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_depth = stack_depth
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Запускает пульс и поток-сторож для текущего цикла событий"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Сторож цикла событий запущен, порог {self.threshold * 1000:.0f} мс")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            loop_lag.observe(max(0.0, time.monotonic() - self._beat - self.interval))
+
+    def _watch(self):
+        while not self._stop_event.wait(self.threshold / 2):
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold or self._reported_beat == beat:
+                continue
+            self._reported_beat = beat
+            self._report(blocked_for)
+
+    def _report(self, blocked_for: float):
+        task = asyncio.current_task(self._loop)
+        handler = task_handler_label(task)
+        loop_stalls_total.inc(handler=handler)
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=self.stack_depth)) if frame else ""
+        task_name = task.get_name() if task else "-"
+        logger.warning(
+            f"Цикл событий заблокирован уже {blocked_for * 1000:.0f} мс "
+            f"(хендлер {handler}, задача {task_name}), стек:\n{stack}"
+        )
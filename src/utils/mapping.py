@@ -0,0 +1,112 @@
+from dataclasses import fields
+from datetime import time
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+Columns = Tuple[str, ...]
+
+
+def format_hhmm(value: Optional[time]) -> Optional[str]:
+    """time -> "ЧЧ:ММ" без strftime"""
+    if value is None:
+        return None
+    return f"{value.hour:02d}:{value.minute:02d}"
+
+
+class RecordView:
+    """
+    Легкое представление строки результата: хранит только сам Record,
+    поля читаются по позиции и преобразуются при обращении, а не при создании.
+    Подходит для больших выборок, из которых читается несколько полей.
+    """
+
+    __slots__ = ("_row",)
+
+    _mapper: "RowMapper" = None
+
+    def __init__(self, row):
+        self._row = row
+
+    def to_model(self):
+        """Полноценная модель для этой строки"""
+        return self._mapper(self._row)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {dict(self._row.items())}>"
+
+
+class RowMapper(Generic[T]):
+    """
+    Преобразует asyncpg.Record в модель по позициям колонок.
+
+    Функция-конструктор генерируется один раз на каждый набор колонок
+    (то есть на каждый запрос) и затем переиспользуется: обращение к полям
+    идет по индексу, а преобразования вызываются только для полей из converters.
+    Колонки, которых нет среди полей модели, пропускаются.
+    """
+
+    def __init__(self, model: Type[T], converters: Dict[str, Callable[[Any], Any]] = None):
+        self.model = model
+        self.converters = converters or {}
+        self._field_names = [field.name for field in fields(model)]
+        self._builders: Dict[Columns, Callable[[Any], T]] = {}
+        self._views: Dict[Columns, Type[RecordView]] = {}
+
+    def __call__(self, row) -> T:
+        return self._builder(tuple(row.keys()))(row)
+
+    def many(self, rows) -> List[T]:
+        """Преобразует список строк одного запроса"""
+        if not rows:
+            return []
+        build = self._builder(tuple(rows[0].keys()))
+        return [build(row) for row in rows]
+
+    def views(self, rows) -> List[RecordView]:
+        """Ленивые представления строк без преобразования полей"""
+        if not rows:
+            return []
+        view_class = self._view_class(tuple(rows[0].keys()))
+        return [view_class(row) for row in rows]
+
+    def _positions(self, columns: Columns) -> List[Tuple[str, int]]:
+        index = {name: position for position, name in enumerate(columns)}
+        return [(name, index[name]) for name in self._field_names if name in index]
+
+    def _builder(self, columns: Columns) -> Callable[[Any], T]:
+        builder = self._builders.get(columns)
+        if builder is None:
+            builder = self._builders[columns] = self._compile(columns)
+        return builder
+
+    def _compile(self, columns: Columns) -> Callable[[Any], T]:
+        namespace = {"_model": self.model}
+        arguments = []
+        for name, position in self._positions(columns):
+            if name in self.converters:
+                namespace[f"_convert_{name}"] = self.converters[name]
+                arguments.append(f"{name}=_convert_{name}(r[{position}])")
+            else:
+                arguments.append(f"{name}=r[{position}]")
+
+        source = f"def _build(r):\n    return _model({', '.join(arguments)})\n"
+        exec(compile(source, f"<RowMapper {self.model.__name__}>", "exec"), namespace)
+        return namespace["_build"]
+
+    def _view_class(self, columns: Columns) -> Type[RecordView]:
+        view_class = self._views.get(columns)
+        if view_class is not None:
+            return view_class
+
+        attributes: Dict[str, Any] = {"__slots__": (), "_mapper": self}
+        for name, position in self._positions(columns):
+            converter = self.converters.get(name)
+            if converter is None:
+                attributes[name] = property(lambda view, i=position: view._row[i])
+            else:
+                attributes[name] = property(lambda view, i=position, c=converter: c(view._row[i]))
+
+        view_class = type(f"{self.model.__name__}View", (RecordView,), attributes)
+        self._views[columns] = view_class
+        return view_class
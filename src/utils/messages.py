@@ -24,6 +24,7 @@ MENU = {
 SERVICES = [
     # ("Забронировать услугу","ORDER"),
     ("Выбрать мастера","MASTERS"),
+    ("Ближайшее время","EARLIEST"),
     ("Узнать об услуге", "INFO")
 ]
 
@@ -397,4 +398,34 @@ ORDER_CONFIRMATION_MESSAGE = """
 <b>Дата и время:</b> {datetime}
 <b>Цена:</b> {price}₽
 <b>Длительность:</b> {duration} минут
-"""
\ No newline at end of file
+"""
+
+REMINDER_MESSAGES = {
+    '24h': """
+⏰ Напоминаем о записи на завтра!
+
+<b>Мастер:</b> {master_name}
+<b>Услуга:</b> {service_name}
+<b>Дата и время:</b> {datetime}
+""",
+    '2h': """
+⏰ Ваша запись совсем скоро!
+
+<b>Мастер:</b> {master_name}
+<b>Услуга:</b> {service_name}
+<b>Дата и время:</b> {datetime}
+""",
+}
+
+# Выбранное окно заняли, пока клиент оформлял запись
+SLOT_TAKEN_MESSAGE = (
+    "😔 Это время уже заняли, пока вы оформляли запись. "
+    "Пожалуйста, выберите другое свободное окно."
+)
+
+# База недоступна: каталог показывается из снимка, запись временно не принимается
+DATABASE_UNAVAILABLE_MESSAGE = (
+    "😔 Сейчас мы не можем принять запись из-за технических работ. "
+    "Каталог услуг и мастеров по-прежнему доступен, а записаться можно будет через несколько минут - "
+    "просто повторите последнее действие."
+)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SlowUpdateProfiler:
+    """
+    Сэмплирующий профилировщик для самых медленных апдейтов.
+
+    Фоновый поток раз в interval секунд снимает стек главного потока и
+    приписывает его задаче asyncio, которая сейчас выполняется, если эта
+    задача - отслеживаемый апдейт. Когда апдейт медленнее percentile
+    последних window апдейтов, его стеки сохраняются в output_dir в
+    свернутом формате (flamegraph.pl, speedscope).
+    Учитывается только время на процессоре: ожидание БД и Telegram видно в метриках.
+    """
+
+    def __init__(
+            self,
+            interval: float = 0.005,
+            percentile: float = 0.99,
+            window: int = 1000,
+            min_updates: int = 100,
+            output_dir: str = "profiles"
+    ):
+        self.interval = interval
+        self.percentile = percentile
+        self.min_updates = min_updates
+        self.output_dir = output_dir
+        self._durations: Deque[float] = deque(maxlen=window)
+        self._samples: Dict[asyncio.Task, Counter] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Запускает поток сэмплирования для текущего цикла событий"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="slow-update-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Профилирование медленных апдейтов включено, профили пишутся в {self.output_dir}")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def begin(self, task: asyncio.Task):
+        """Начинает собирать стеки для задачи апдейта"""
+        with self._lock:
+            self._samples[task] = Counter()
+
+    def end(self, task: asyncio.Task, duration: float, label: str):
+        """Завершает сбор; сохраняет профиль, если апдейт попал в медленный хвост"""
+        with self._lock:
+            samples = self._samples.pop(task, None)
+
+        threshold = self._threshold()
+        self._durations.append(duration)
+        if threshold is None or duration < threshold or not samples:
+            return
+
+        # Запись файла - блокирующая операция, выносим из цикла событий
+        self._loop.run_in_executor(None, self._write, label, duration, samples)
+
+    def _threshold(self) -> Optional[float]:
+        if len(self._durations) < self.min_updates:
+            return None
+        ordered = sorted(self._durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    def _sample_loop(self):
+        while not self._stop_event.wait(self.interval):
+            task = asyncio.current_task(self._loop)
+            if task is None:
+                continue
+            with self._lock:
+                samples = self._samples.get(task)
+                if samples is None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    samples[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _write(self, label: str, duration: float, samples: Counter):
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = f"{int(time.time() * 1000)}_{label}_{int(duration * 1000)}ms.folded"
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w") as file:
+            for stack, count in samples.most_common():
+                file.write(f"{stack} {count}\n")
+        logger.warning(f"Медленный апдейт {label}: {duration * 1000:.0f} мс, профиль сохранен в {path}")
+
+
+# Глобальный экземпляр
+slow_update_profiler = SlowUpdateProfiler()
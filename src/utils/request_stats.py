@@ -0,0 +1,33 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class UpdateStats:
+    """Счетчики одного апдейта: кто его обработал и сколько он стоил базе"""
+    router: str = "-"
+    handler: str = "-"
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+current_update_stats: ContextVar[Optional[UpdateStats]] = ContextVar("current_update_stats", default=None)
+
+
+@contextmanager
+def track_query():
+    """Учитывает запрос к БД в статистике текущего апдейта (если он есть)"""
+    stats = current_update_stats.get()
+    if stats is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
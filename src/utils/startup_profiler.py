@@ -0,0 +1,79 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Модули проекта показываются поштучно, сторонние пакеты - суммой по пакету верхнего уровня
+PROJECT_PREFIXES = ("main", "manage", "src")
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass(slots=True)
+class ImportCost:
+    """Строка вывода python -X importtime: время в секундах"""
+    module: str
+    self_time: float
+    cumulative: float
+    depth: int
+
+    @property
+    def is_project(self) -> bool:
+        return self.module.split(".")[0] in PROJECT_PREFIXES
+
+
+def parse_importtime(output: str) -> List[ImportCost]:
+    """Разбирает stderr python -X importtime"""
+    costs = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            costs.append(ImportCost(module, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return costs
+
+
+def measure_imports(module: str = "main", env: Optional[Dict[str, str]] = None) -> List[ImportCost]:
+    """Импортирует модуль в отдельном процессе под -X importtime (чистый кэш sys.modules)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился ошибкой:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def group_imports(costs: Iterable[ImportCost]) -> List[Tuple[str, float]]:
+    """Собственное время импорта: модули проекта поштучно, сторонние - по пакетам, по убыванию"""
+    totals: Dict[str, float] = defaultdict(float)
+    for cost in costs:
+        name = cost.module if cost.is_project else cost.module.split(".")[0]
+        totals[name] += cost.self_time
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def project_import_time(costs: Iterable[ImportCost]) -> float:
+    """Собственное время импорта модулей проекта без сторонних зависимостей, с"""
+    return sum(cost.self_time for cost in costs if cost.is_project)
+
+
+def format_report(import_costs: List[ImportCost], init_costs: Dict[str, float], top: int = 20) -> str:
+    """Текстовый отчет о стоимости запуска: импорты и шаги инициализации"""
+    total = max((cost.cumulative for cost in import_costs if cost.depth == 0), default=0.0)
+    lines = [
+        f"Импорт: всего {total * 1000:.1f} мс, код проекта {project_import_time(import_costs) * 1000:.1f} мс",
+        f"{'мс':>9}  модуль / пакет",
+    ]
+    lines += [f"{seconds * 1000:9.1f}  {name}" for name, seconds in group_imports(import_costs)[:top]]
+    if init_costs:
+        lines.append(f"Инициализация: всего {sum(init_costs.values()) * 1000:.1f} мс")
+        lines += [
+            f"{seconds * 1000:9.1f}  {name}"
+            for name, seconds in sorted(init_costs.items(), key=lambda item: item[1], reverse=True)
+        ]
+    return "\n".join(lines)
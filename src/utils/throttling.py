@@ -0,0 +1,90 @@
+import time
+from typing import Dict
+
+from src.utils.rate_limit import TokenBucket
+
+
+class MemoryThrottleStorage:
+    """
+    Ведра токенов пользователей в памяти процесса.
+    Ведро, которое успело наполниться, ничем не отличается от нового,
+    поэтому такие ведра периодически выбрасываются - память занимают только активные.
+    """
+
+    # Как часто выбрасывать наполнившиеся ведра, с
+    EVICT_INTERVAL = 60.0
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._evicted_at = time.monotonic()
+
+    async def hit(self, key: str, rate: float, capacity: float) -> float:
+        """Забирает токен; возвращает 0 или сколько секунд ждать до следующего"""
+        now = time.monotonic()
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity, now)
+        if bucket.consume(now):
+            return 0.0
+        return bucket.wait_time(now)
+
+    def _evict(self, now: float):
+        if now - self._evicted_at < self.EVICT_INTERVAL:
+            return
+        self._evicted_at = now
+        idle = [key for key, bucket in self._buckets.items() if bucket.is_full(now)]
+        for key in idle:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def close(self):
+        """Закрывать нечего - метод для единого интерфейса с RedisThrottleStorage"""
+
+
+class RedisThrottleStorage:
+    """
+    Ведра токенов в Redis - общий лимит для нескольких процессов бота.
+    Требует пакет redis; ключи сами истекают после полного наполнения ведра.
+    """
+
+    # Пополнение и списание токена одной атомарной операцией
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = "throttle:"):
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError("Для общего хранилища лимитов нужен пакет redis (pip install redis)") from e
+
+        self.prefix = prefix
+        self.redis = Redis.from_url(url)
+        self._script = self.redis.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, rate: float, capacity: float) -> float:
+        """Забирает токен; возвращает 0 или сколько секунд ждать до следующего"""
+        wait = await self._script(keys=[self.prefix + key], args=[rate, capacity, time.time()])
+        return float(wait)
+
+    async def close(self):
+        await self.redis.aclose()
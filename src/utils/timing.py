@@ -0,0 +1,16 @@
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def log_duration(name: str):
+    """Логирует длительность выполнения блока (в том числе с await внутри)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"{name}: {elapsed_ms:.1f} мс")